@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import AttendanceSession, ClassroomRoster, FinalizeJob
 
-# Register your models here.
+admin.site.register(AttendanceSession)
+admin.site.register(ClassroomRoster)
+admin.site.register(FinalizeJob)
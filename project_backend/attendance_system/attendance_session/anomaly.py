@@ -0,0 +1,133 @@
+# attendance_session/anomaly.py
+"""
+Streaming proxy-attendance detector.
+
+One phone handing the token to dozens of classmates within seconds usually
+means someone is marking friends who are not in the room. PassAnalyzer looks at
+every new pass as it happens and keeps a fixed amount of state per session
+index (no edge history):
+
+    out_degree   passes sent
+    sends        requests those passes arrived in
+    mean gap     EWMA of the time between a node's consecutive sends
+    fast gaps    sends less than FAST_GAP seconds after the previous one
+    burst        sends inside the current BURST_WINDOW, and the largest burst seen
+
+Timing uses server arrival time, so the passes of one batched request are one
+send: an app that queued handovers while offline uploads them together, and
+counting them one by one would look like a burst of zero-second gaps. They
+still all count toward out_degree.
+
+A node is flagged the moment it crosses a limit in ATTENDANCE_SESSIONS['ANOMALY'],
+so finalize only reads the flags. Flags are advisory: attendance is saved as
+computed and the teacher gets the list with the summary. The teacher's own
+passes are never flagged.
+"""
+from array import array
+
+from .engine import pack_array, unpack_array
+
+DEFAULTS = {
+    "MAX_OUT_DEGREE": 12,   # Distinct classmates one device may pass to
+    "BURST_WINDOW": 10,     # Seconds
+    "BURST_PASSES": 6,      # Sends inside one window that count as a burst
+    "FAST_GAP": 1.0,        # Seconds; quicker than a phone-to-phone handover
+    "RAPID_PASSES": 5,      # Fast gaps before a node is flagged
+    "GAP_SMOOTHING": 0.3,   # EWMA weight of the newest gap
+}
+
+# Per-index arrays of PassAnalyzer
+COUNTERS = (
+    "out_degree", "sends", "last_pass", "mean_gap", "fast_gaps", "window_start", "window_count", "max_burst",
+)
+
+
+class PassAnalyzer:
+    """Per-index counters of one session; observe() is O(1) per send."""
+    def __init__(self, size, teacher_index, limits=None):
+        self.limits = dict(DEFAULTS, **(limits or {}))
+        self.teacher_index = teacher_index
+        self.out_degree = array('I', bytes(4 * size))
+        self.sends = array('I', bytes(4 * size))
+        self.last_pass = array('f', bytes(4 * size))
+        self.mean_gap = array('f', bytes(4 * size))
+        self.fast_gaps = array('H', bytes(2 * size))
+        self.window_start = array('f', bytes(4 * size))
+        self.window_count = array('H', bytes(2 * size))
+        self.max_burst = array('H', bytes(2 * size))
+        # Flagged index -> reasons, in the order they were raised
+        self.flags = {}
+
+    def observe(self, sender, when, passes=1):
+        """
+        Account one send of `passes` new passes by `sender` at `when`
+        (seconds since session start).
+        """
+        if sender == self.teacher_index or passes < 1:
+            return
+        limits = self.limits
+        before = self.out_degree[sender]
+        count = self.out_degree[sender] = before + passes
+        sends = self.sends[sender] = self.sends[sender] + 1
+
+        if sends > 1:
+            gap = when - self.last_pass[sender]
+            if sends == 2:
+                self.mean_gap[sender] = gap
+            else:
+                weight = limits["GAP_SMOOTHING"]
+                self.mean_gap[sender] += weight * (gap - self.mean_gap[sender])
+            if gap < limits["FAST_GAP"] and self.fast_gaps[sender] < 0xFFFF:
+                self.fast_gaps[sender] += 1
+                if self.fast_gaps[sender] == limits["RAPID_PASSES"]:
+                    self._flag(sender, "rapid")
+        self.last_pass[sender] = when
+
+        # Fixed windows opened by the first send after the previous one expired
+        if sends == 1 or when - self.window_start[sender] > limits["BURST_WINDOW"]:
+            self.window_start[sender] = when
+            self.window_count[sender] = 0
+        if self.window_count[sender] < 0xFFFF:
+            self.window_count[sender] += 1
+        burst = self.window_count[sender]
+        if burst > self.max_burst[sender]:
+            self.max_burst[sender] = burst
+        if burst == limits["BURST_PASSES"]:
+            self._flag(sender, "burst")
+
+        if before <= limits["MAX_OUT_DEGREE"] < count:
+            self._flag(sender, "fan_out")
+
+    def _flag(self, i, reason):
+        reasons = self.flags.setdefault(i, [])
+        if reason not in reasons:
+            reasons.append(reason)
+
+    def to_state(self):
+        """JSON-safe counters and flags (session handoff, see SessionObject.to_state)."""
+        return {
+            "limits": self.limits,
+            "counters": {name: pack_array(getattr(self, name)) for name in COUNTERS},
+            "flags": [[i, reasons] for i, reasons in self.flags.items()],
+        }
+
+    @classmethod
+    def from_state(cls, size, teacher_index, state):
+        analyzer = cls(size, teacher_index, state["limits"])
+        for name in COUNTERS:
+            setattr(analyzer, name, unpack_array(state["counters"][name], size))
+        analyzer.flags = {i: list(reasons) for i, reasons in state["flags"]}
+        return analyzer
+
+    def report(self, uids):
+        """Flagged nodes with their counters, for the finalize response."""
+        return [
+            {
+                "uid": uids[i],
+                "reasons": reasons,
+                "out_degree": self.out_degree[i],
+                "max_burst": self.max_burst[i],
+                "mean_gap": round(self.mean_gap[i], 2),
+            }
+            for i, reasons in self.flags.items()
+        ]
@@ -1,6 +1,14 @@
+import threading
+
 from django.apps import AppConfig
 
 
 class AttendanceSessionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance_session'
+
+    def ready(self):
+        from . import diagnostics, warmup  # warmup registers the roster cache invalidation signals
+        diagnostics.start_tracing()
+        if warmup.warmup_setting("ON_READY"):
+            threading.Thread(target=warmup.warm_worker, name="warmup", daemon=True).start()
@@ -0,0 +1,79 @@
+# attendance_session/bitmap.py
+"""
+Packed attendance vectors: 2 bits per enrolled student, 4 students per byte.
+
+Student i lives in byte i // 4 at bit offset (i % 4) * 2. Rosters are stored
+alongside as a sorted uint64 array of Student pks so a student's position is
+one binary search.
+"""
+import sys
+from array import array
+from bisect import bisect_left
+from hashlib import sha1
+from itertools import chain
+
+STATUSES = ("ABSENT", "PRESENT", "LATE", "PENDING")   # code -> status
+CODES = {status: code for code, status in enumerate(STATUSES)}
+
+# byte value -> statuses of the 4 students packed in it
+_BYTE_TABLE = [tuple(STATUSES[(b >> shift) & 3] for shift in (0, 2, 4, 6)) for b in range(256)]
+
+
+# ---------------------------
+# Status vectors
+# ---------------------------
+def pack_statuses(statuses):
+    """Pack an ordered sequence of status strings into bytes."""
+    statuses = list(statuses)
+    data = bytearray((len(statuses) + 3) // 4)
+    for i, status in enumerate(statuses):
+        data[i >> 2] |= CODES[status] << ((i & 3) << 1)
+    return bytes(data)
+
+
+def unpack_statuses(blob, count):
+    """Decode the first `count` statuses of a packed vector."""
+    return list(chain.from_iterable(_BYTE_TABLE[b] for b in blob))[:count]
+
+
+def status_at(blob, i):
+    """Status of the student at roster position i."""
+    return STATUSES[(blob[i >> 2] >> ((i & 3) << 1)) & 3]
+
+
+def set_status(blob, i, status):
+    """Return a copy of `blob` with position i set to `status`."""
+    data = bytearray(blob)
+    shift = (i & 3) << 1
+    data[i >> 2] = (data[i >> 2] & ~(3 << shift) & 0xFF) | (CODES[status] << shift)
+    return bytes(data)
+
+
+# ---------------------------
+# Rosters
+# ---------------------------
+def pack_ids(ids):
+    """Sorted uint64 little-endian array of student pks."""
+    packed = array('Q', sorted(ids))
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ids(blob):
+    ids = array('Q')
+    ids.frombytes(bytes(blob))
+    if sys.byteorder != "little":
+        ids.byteswap()
+    return ids
+
+
+def roster_digest(packed_ids):
+    """Content hash used to reuse an identical roster version."""
+    return sha1(packed_ids).hexdigest()
+
+
+def position(ids, student_id):
+    """Index of student_id in a sorted roster array, or None."""
+    i = bisect_left(ids, student_id)
+    return i if i < len(ids) and ids[i] == student_id else None
@@ -0,0 +1,259 @@
+# attendance_session/diagnostics.py
+"""
+Memory diagnostics for live sessions.
+
+- session_memory() walks one SessionObject (union-find arrays, index maps,
+  exception list, seen edges, request ids, detector...) and returns its size
+  per attribute. Data shared with the cached roster (usernames, parsed keys)
+  is included, so the total is what the session keeps alive.
+- With MEMORY['TRACEMALLOC'] set (frames per allocation), tracemalloc runs
+  from AppConfig.ready and top_allocators() reports the largest allocation
+  sites of the process.
+- With MEMORY['SNAPSHOT_INTERVAL'] set, every worker takes a snapshot on a
+  daemon thread (started by warmup.warm_worker): RSS, session totals, stale
+  sessions and the allocation sites that grew since the previous snapshot.
+  The last MEMORY['KEEP'] stay in memory for the diagnostics endpoint and each
+  is appended to SNAPSHOT_DIR/memory-<pid>.jsonl for `manage.py memory_report`.
+
+A session alive for more than MEMORY['STALE_AFTER'] seconds was most likely
+never finalized (a lecture is much shorter); it is listed as stale.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from types import ModuleType
+
+from django.utils import timezone
+
+from .session_manager import session_setting
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource     # Not available on Windows
+except ImportError:
+    resource = None
+
+DEFAULTS = {
+    "TRACEMALLOC": 0,           # Frames kept per traced allocation (0 = tracemalloc off)
+    "TOP": 15,                  # Allocation sites reported
+    "SNAPSHOT_INTERVAL": None,  # Seconds between periodic snapshots (None = off)
+    "SNAPSHOT_DIR": None,       # Where each worker appends its snapshots (None = memory only)
+    "KEEP": 48,                 # Snapshots kept in memory per worker
+    "STALE_AFTER": 4 * 60 * 60, # Seconds after which a live session is reported as stale
+}
+
+# Leaf objects: their getsizeof already covers their payload
+ATOMIC = (str, bytes, bytearray, int, float, bool, type(None), array)
+
+
+def memory_setting(name):
+    return (session_setting("MEMORY") or {}).get(name, DEFAULTS[name])
+
+
+# ---------------------------
+# Object sizes
+# ---------------------------
+def _children(obj):
+    if isinstance(obj, dict):
+        items = list(obj.items())
+        return [k for k, _ in items] + [v for _, v in items]
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return list(obj)
+    children = []
+    if hasattr(obj, "__dict__"):
+        children.append(obj.__dict__)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            children.append(getattr(obj, slot))
+    return children
+
+
+def deep_sizeof(obj, seen):
+    """Bytes reachable from `obj`, skipping ids in `seen` (which is updated)."""
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or callable(obj) or isinstance(obj, ModuleType):
+            continue    # Functions, classes and bound methods (the forest's clock) are not session data
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if not isinstance(obj, ATOMIC):
+            try:
+                stack.extend(_children(obj))
+            except RuntimeError:
+                pass    # Mutated by a request while walking it: the size is a slight underestimate
+    return total
+
+
+def session_memory(session, idle_seconds=None):
+    """Size of one session, per attribute."""
+    seen = {id(session)}
+    components = {name: deep_sizeof(value, seen) for name, value in list(vars(session).items())}
+    age = session.elapsed()
+    return {
+        "classroom_id": session.classroom_id,
+        "session_id": session.session_id,
+        "nodes": len(session),
+        "exceptions": len(session.exception_list),
+        "passes": len(session.seen_edges),
+        "bytes": sys.getsizeof(session) + sys.getsizeof(vars(session)) + sum(components.values()),
+        "components": dict(sorted(components.items(), key=lambda kv: -kv[1])),
+        "age_seconds": int(age),
+        "idle_seconds": None if idle_seconds is None else int(idle_seconds),
+        "stale": age > memory_setting("STALE_AFTER"),
+    }
+
+
+def sessions_memory():
+    """session_memory() of every live session of this process, largest first."""
+    from .views import sessions  # views imports this module
+    report = [session_memory(session, sessions.idle_seconds(cid)) for cid, session in sessions.items()]
+    return sorted(report, key=lambda s: -s["bytes"])
+
+
+# ---------------------------
+# Process
+# ---------------------------
+def process_memory():
+    """Resident and peak resident bytes of this process (None where the OS does not say)."""
+    rss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024   # KiB on Linux, bytes on macOS
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+    return {
+        "pid": os.getpid(),
+        "rss": rss,
+        "peak_rss": peak,
+        "tracemalloc": {"current": traced[0], "peak": traced[1]} if traced else None,
+    }
+
+
+def start_tracing():
+    """Start tracemalloc when MEMORY['TRACEMALLOC'] asks for it (AppConfig.ready)."""
+    frames = memory_setting("TRACEMALLOC")
+    if frames and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),   # Imported code objects
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def top_allocators(limit=None, baseline=None, snapshot=None):
+    """
+    Largest allocation sites (file:line) of the process, or, against a `baseline`
+    snapshot, the sites that grew most since. None when tracemalloc is off.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = snapshot or _snapshot()
+    limit = limit or memory_setting("TOP")
+    if baseline is not None:
+        stats = [s for s in snapshot.compare_to(baseline, "lineno") if s.size_diff > 0][:limit]
+    else:
+        stats = snapshot.statistics("lineno")[:limit]
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "bytes": stat.size,
+            "blocks": stat.count,
+            **({"growth": stat.size_diff} if baseline is not None else {}),
+        }
+        for stat in stats
+    ]
+
+
+# ---------------------------
+# Periodic snapshots
+# ---------------------------
+class MemorySnapshots:
+    """Recent memory snapshots of this worker, taken on a daemon thread."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=memory_setting("KEEP"))
+        self._baseline = None   # tracemalloc snapshot of the previous take
+        self._thread = None
+        self._stop = threading.Event()
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def take(self):
+        """Take one snapshot: process, session totals, stale sessions, allocation growth."""
+        report = sessions_memory()
+        snapshot = _snapshot() if tracemalloc.is_tracing() else None
+        entry = {
+            "at": timezone.now().isoformat(),
+            **process_memory(),
+            "sessions": len(report),
+            "nodes": sum(s["nodes"] for s in report),
+            "session_bytes": sum(s["bytes"] for s in report),
+            "largest": [{k: s[k] for k in ("classroom_id", "nodes", "bytes", "age_seconds")} for s in report[:5]],
+            "stale": [{k: s[k] for k in ("classroom_id", "session_id", "nodes", "age_seconds")} for s in report if s["stale"]],
+            "growth": top_allocators(baseline=self._baseline, snapshot=snapshot) if self._baseline else None,
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self._baseline = snapshot
+        self._write(entry)
+        return entry
+
+    def _write(self, entry):
+        directory = memory_setting("SNAPSHOT_DIR")
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"memory-{entry['pid']}.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    # ---------------------------
+    # Background thread
+    # ---------------------------
+    def start(self):
+        """Start the snapshot thread (once per process)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-snapshots", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                entry = self.take()
+                logger.debug(
+                    "Memory snapshot: rss=%s sessions=%s session_bytes=%s (%.0f ms)",
+                    entry["rss"], entry["sessions"], entry["session_bytes"], (time.monotonic() - started) * 1000,
+                )
+            except Exception:
+                logger.exception("Memory snapshot failed")
+            if self._stop.wait(memory_setting("SNAPSHOT_INTERVAL")):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+
+memory_snapshots = MemorySnapshots()
@@ -0,0 +1,491 @@
+# attendance_session/engine.py
+import base64
+import functools
+import secrets
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+
+# Client request ids remembered per session for idempotent retries
+MAX_REQUEST_IDS = 4096
+
+# joined_at of an index that never reached the teacher's group
+NOT_JOINED = float("inf")
+
+
+class SessionClosed(Exception):
+    """The session was handed to another worker (or closed) while a request still held it."""
+
+
+# ---------------------------
+# Handoff state (routing.py): plain JSON, arrays as little-endian base64
+# ---------------------------
+ARRAY_TYPECODES = "BHIQf"
+
+
+def pack_array(values, typecode=None):
+    """[typecode, base64 bytes] of an array (or of any ints/floats, with `typecode`)."""
+    values = array(typecode or values.typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return [values.typecode, base64.b64encode(values.tobytes()).decode()]
+
+
+def unpack_array(packed, size=None):
+    """Inverse of pack_array; ValueError on an unknown typecode or a length other than `size`."""
+    typecode, data = packed
+    if typecode not in ARRAY_TYPECODES:
+        raise ValueError(f"Unexpected array typecode {typecode!r}")
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+    if sys.byteorder != "little":
+        values.byteswap()
+    if size is not None and len(values) != size:
+        raise ValueError(f"Expected {size} values, got {len(values)}")
+    return values
+
+
+def _exclusive(method):
+    """Run a SessionObject method that changes the session under its lock; refuse once it is closed."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            if self.closed:
+                raise SessionClosed(self.closed)
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# ---------------------------
+# Node & Disjoint Set (Union-Find) Objects
+# ---------------------------
+class Node:
+    """
+    Represents a student or teacher in the attendance session using union-find for token passing.
+    Kept as the reference implementation for replay_traces; live sessions use DisjointSet.
+    """
+    def __init__(self, uid):
+        self.uid = uid          # Unique identifier of student/teacher
+        self.parent = self      # Initially, parent is self (disjoint set root)
+        self.rank = 0           # Rank for union by rank optimization
+
+    def find(self):
+        """Find the ultimate parent of this node (with path compression)."""
+        if self.parent != self:
+            self.parent = self.parent.find()
+        return self.parent
+    def union(self, other):
+        """
+        Union two nodes so teacher always remains root if involved.
+        Returns True if two different groups were merged.
+        """
+        root1 = self.find()
+        root2 = other.find()
+        if root1 is root2:
+            return False  # Already in the same group
+
+        # Always make teacher the root if one is teacher
+        if 'T' in root1.uid:  # teacher UID prefix
+            root2.parent = root1
+            return True
+        if 'T' in root2.uid:
+            root1.parent = root2
+            return True
+
+        # Normal union by rank for students
+        if root1.rank > root2.rank:
+            root2.parent = root1
+        else:
+            root1.parent = root2
+            if root1.rank == root2.rank:
+                root2.rank += 1
+        return True
+
+
+class DisjointSet:
+    """
+    Union-find over dense indices 0..n-1, as used by live sessions.
+
+    Same semantics as Node.union (the teacher's group always keeps the teacher
+    as root, students use union by rank), but parents live in a uint32 array
+    and "is this root the teacher" is a flag lookup instead of a UID string test.
+    Matches the replay interface: (uids, teacher_index), union(a, b), connected_to_teacher(i).
+
+    joined_at[i] is the `clock()` reading at which i first became connected to the
+    teacher. Student groups keep their member list at the root, so when a whole
+    group reaches the teacher every member is stamped at once; a node is stamped
+    exactly once and merging lists moves the smaller into the larger.
+    """
+    def __init__(self, uids, teacher_index, clock=None):
+        n = len(uids)
+        self.parent = array('I', range(n))
+        self.rank = bytearray(n)
+        self.is_teacher = bytearray(n)
+        self.is_teacher[teacher_index] = 1
+        self.teacher_index = teacher_index
+        self.clock = clock
+        self.joined_at = array('f', [NOT_JOINED]) * n
+        self.joined_at[teacher_index] = 0.0
+        # Root -> indices of its group, only for student groups of two or more
+        self.members = {}
+
+    def find(self, i):
+        """Root of i, with path halving."""
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b, when=None):
+        """
+        Union the groups of a and b. Returns True if two different groups were merged.
+        A group joining the teacher is stamped with `when` (default: clock()).
+        """
+        root1 = self.find(a)
+        root2 = self.find(b)
+        if root1 == root2:
+            return False  # Already in the same group
+
+        # Always make teacher the root if one is teacher
+        if self.is_teacher[root1]:
+            self.parent[root2] = root1
+            self._join(root2, when)
+            return True
+        if self.is_teacher[root2]:
+            self.parent[root1] = root2
+            self._join(root1, when)
+            return True
+
+        # Normal union by rank for students
+        rank = self.rank
+        if rank[root1] > rank[root2]:
+            self.parent[root2] = root1
+            self._absorb(root1, root2)
+        else:
+            self.parent[root1] = root2
+            self._absorb(root2, root1)
+            if rank[root1] == rank[root2] and rank[root2] < 255:
+                rank[root2] += 1
+        return True
+
+    def _absorb(self, root, child):
+        """Move the member list of `child` into the group now rooted at `root`."""
+        members = self.members
+        big = members.pop(root, None) or array('I', (root,))
+        small = members.pop(child, None) or array('I', (child,))
+        if len(big) < len(small):
+            big, small = small, big
+        big.extend(small)
+        members[root] = big
+
+    def _join(self, root, when):
+        """Stamp every member of the student group rooted at `root` as joined."""
+        if when is None:
+            when = self.clock() if self.clock else 0.0
+        joined_at = self.joined_at
+        for i in self.members.pop(root, (root,)):
+            joined_at[i] = when
+
+    def connected_to_teacher(self, i):
+        return self.find(i) == self.teacher_index
+
+    def to_state(self):
+        return {
+            "parent": pack_array(self.parent),
+            "rank": pack_array(self.rank, "B"),
+            "joined_at": pack_array(self.joined_at),
+            "members": [[root, pack_array(group)] for root, group in self.members.items()],
+        }
+
+    @classmethod
+    def from_state(cls, uids, teacher_index, state, clock=None):
+        forest = cls(uids, teacher_index, clock)
+        n = len(uids)
+        forest.parent = unpack_array(state["parent"], n)
+        forest.rank = bytearray(unpack_array(state["rank"], n).tobytes())
+        forest.joined_at = unpack_array(state["joined_at"], n)
+        forest.members = {root: unpack_array(group) for root, group in state["members"]}
+        if any(i >= n for i in forest.parent):
+            raise ValueError("Parent index out of range")
+        return forest
+
+
+class SessionObject:
+    """
+    Represents an active attendance session for a classroom.
+
+    Every participant has a session-scoped index (its position in `uids`, teacher last).
+    Clients that received `uids` and `epoch` from the start/status endpoints can pass
+    tokens as integer pairs; UID-based calls are translated once at the edge.
+    """
+    def __init__(self, classroom_id, teacher_uid, student_uids, session_id=None, started_at=None, capture=False):
+        self.classroom_id = classroom_id
+        self.session_id = session_id    # AttendanceSession row of this lecture
+        self.started_at = started_at    # Lecture time, matched against absence proposals
+        self.teacher_uid = teacher_uid
+        self.teacher_user_id = None     # auth User of the teacher who started it (activate)
+        # Dense index per UID (roster order, teacher last)
+        self.uids = [uid for uid in dict.fromkeys(student_uids) if uid != teacher_uid] + [teacher_uid]
+        self.index = {uid: i for i, uid in enumerate(self.uids)}
+        self.teacher_index = self.index[teacher_uid]
+        # Changes every time a session starts, so stale index maps are rejected
+        self.epoch = secrets.randbits(31)
+        # Join times are seconds since the session started
+        self.opened = time.monotonic()
+        self.forest = DisjointSet(self.uids, self.teacher_index, clock=self.elapsed)
+        # Students without devices (exception list), in the order they were reported;
+        # the version changes on every addition so readers can tell the list is unchanged
+        self.exception_list = {}
+        self.exception_version = 0
+        # Roster usernames by UID, attached at start so exception lists need no DB lookup
+        self.usernames = {}
+        # Parsed device public keys by index (signatures.KeyRing), attached at start
+        self.keyring = None
+        # Streaming proxy detector (anomaly.PassAnalyzer), attached at start
+        self.analyzer = None
+        # Captured edge stream as flat uint32 pairs: [from0, to0, from1, to1, ...]; None unless tracing
+        self.edges = array('I') if capture else None
+        # Idempotency: packed (from_index << 32 | to_index) of every pass seen,
+        # and the result of each client-supplied request id (oldest evicted first)
+        self.seen_edges = set()
+        self.request_results = OrderedDict()
+        # Held by every change and by a handoff (routing.py); `closed` says why the session stopped taking them
+        self.lock = threading.RLock()
+        self.closed = None
+
+    def __len__(self):
+        return len(self.uids)
+
+    def budget_size(self):
+        """What the session costs against MAX_NODES: its nodes plus every pass it remembers."""
+        return len(self.uids) + len(self.seen_edges)
+
+    def to_state(self):
+        """
+        Everything a new owner needs, as JSON-safe values (routing.py handoff).
+        Not included: the device keys (rebuilt from the roster), the lock and `closed`.
+        Join times and the detector's clock are relative to `opened`, so only the elapsed time travels.
+        """
+        return {
+            "classroom_id": self.classroom_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "teacher_uid": self.teacher_uid,
+            "teacher_user_id": self.teacher_user_id,
+            "uids": self.uids,
+            "epoch": self.epoch,
+            "elapsed": self.elapsed(),
+            "forest": self.forest.to_state(),
+            "exception_list": list(self.exception_list),
+            "exception_version": self.exception_version,
+            "usernames": self.usernames,
+            "analyzer": self.analyzer.to_state() if self.analyzer is not None else None,
+            "edges": pack_array(self.edges) if self.edges is not None else None,
+            "seen_edges": pack_array(sorted(self.seen_edges), "Q"),
+            "request_results": list(self.request_results.items()),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a session from to_state(); raises ValueError (or KeyError / TypeError) on a malformed state."""
+        from .anomaly import PassAnalyzer    # anomaly imports the array helpers above
+        uids = state["uids"]
+        session = cls(
+            state["classroom_id"], state["teacher_uid"], uids[:-1],
+            session_id=state["session_id"],
+            started_at=datetime.fromisoformat(state["started_at"]) if state["started_at"] else None,
+            capture=state["edges"] is not None,
+        )
+        if session.uids != uids:
+            raise ValueError("Roster does not match the session indices")
+        session.teacher_user_id = state["teacher_user_id"]
+        session.epoch = state["epoch"]
+        session.opened = time.monotonic() - state["elapsed"]
+        session.forest = DisjointSet.from_state(uids, session.teacher_index, state["forest"], clock=session.elapsed)
+        session.exception_list = dict.fromkeys(state["exception_list"])
+        session.exception_version = state["exception_version"]
+        session.usernames = state["usernames"]
+        if state["analyzer"] is not None:
+            session.analyzer = PassAnalyzer.from_state(len(uids), session.teacher_index, state["analyzer"])
+        if state["edges"] is not None:
+            session.edges = unpack_array(state["edges"])
+        session.seen_edges = set(unpack_array(state["seen_edges"]))
+        session.request_results = OrderedDict((key, result) for key, result in state["request_results"])
+        return session
+
+    def close(self, reason):
+        """Refuse further changes (SessionClosed); waits for a change in progress to finish."""
+        with self.lock:
+            self.closed = reason
+
+    def activate(self, session_id, started_at, teacher_user_id=None):
+        """Tie a pre-built (dormant) session to its lecture row; join times count from now."""
+        self.session_id = session_id
+        self.started_at = started_at
+        self.teacher_user_id = teacher_user_id
+        self.opened = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.opened
+
+    def _union(self, a, b, when=None):
+        """Union two indices and record the edge when capturing a trace."""
+        if self.edges is not None:
+            self.edges.append(a)
+            self.edges.append(b)
+        return self.forest.union(a, b, when)
+
+    def root_uid(self, uid):
+        """UID at the root of this participant's group (debugging)."""
+        return self.uids[self.forest.find(self.index[uid])]
+
+    # ---------------------------
+    # Token Passing Logic
+    # ---------------------------
+    def _remember(self, request_id, result):
+        if request_id is not None:
+            self.request_results[request_id] = result
+            if len(self.request_results) > MAX_REQUEST_IDS:
+                self.request_results.popitem(last=False)
+        return result
+
+    def _pass(self, a, b, observe=True):
+        key = a << 32 | b
+        if key in self.seen_edges:
+            return {"duplicate": True, "new_edge": False, "merged": False}
+        self.seen_edges.add(key)
+        if observe and self.analyzer is not None:
+            self.analyzer.observe(a, self.elapsed())
+        return {"duplicate": False, "new_edge": True, "merged": self._union(a, b)}
+
+    @_exclusive
+    def pass_token(self, from_uid, to_uid, request_id=None):
+        """
+        Merge sender and receiver nodes to form a linked group.
+        Simulates student A passing token to B.
+
+        Retries are absorbed before the union-find is touched: a repeated
+        request id or an already seen (from, to) pair returns duplicate=True.
+        Returns {"duplicate", "new_edge", "merged"}.
+        """
+        if request_id is not None and request_id in self.request_results:
+            return dict(self.request_results[request_id], duplicate=True)
+
+        from_index = self.index.get(from_uid)
+        to_index = self.index.get(to_uid)
+        if from_index is None or to_index is None:
+            raise ValueError("Invalid from_uid or to_uid")
+        return self._remember(request_id, self._pass(from_index, to_index))
+
+    @_exclusive
+    def pass_indices(self, epoch, pairs, request_id=None):
+        """
+        Apply token passes sent as a flat list of session indices [from0, to0, from1, to1, ...].
+        The detector sees one send per sender with all of its new passes.
+        Returns counts {"duplicate", "new_edges", "merged"}.
+        """
+        if epoch != self.epoch:
+            raise ValueError("Stale session epoch, refresh the session index")
+        if request_id is not None and request_id in self.request_results:
+            return dict(self.request_results[request_id], duplicate=True)
+        self.validate_pairs(pairs)
+
+        new_edges = merged = 0
+        sent = {}
+        for k in range(0, len(pairs), 2):
+            result = self._pass(pairs[k], pairs[k + 1], observe=False)
+            if result["new_edge"]:
+                new_edges += 1
+                sent[pairs[k]] = sent.get(pairs[k], 0) + 1
+            merged += result["merged"]
+        if self.analyzer is not None and sent:
+            when = self.elapsed()
+            for sender, passes in sent.items():
+                self.analyzer.observe(sender, when, passes)
+        return self._remember(request_id, {"duplicate": False, "new_edges": new_edges, "merged": merged})
+
+    def validate_pairs(self, pairs):
+        """Raise ValueError unless `pairs` is a flat list of valid index pairs."""
+        if len(pairs) % 2:
+            raise ValueError("pairs must contain an even number of indices")
+        size = len(self.uids)
+        if any(type(i) is not int or not 0 <= i < size for i in pairs):
+            raise ValueError("Index out of range")
+
+    @_exclusive
+    def mark_present(self, uid):
+        """
+        Teacher links a student directly to the teacher node.
+        The teacher vouches for the student, so they count as joined at the start (never late).
+        """
+        if uid not in self.index:
+            raise ValueError("Invalid student UID")
+        self._union(self.index[uid], self.teacher_index, when=0.0)
+
+    # ---------------------------
+    # Exception Handling
+    # ---------------------------
+    @_exclusive
+    def add_exception(self, student_uid):
+        """Add a student to exception list (no device). Returns False if already listed."""
+        if student_uid not in self.index:
+            raise ValueError("Invalid student UID")
+        if student_uid in self.exception_list:
+            return False
+        self.exception_list[student_uid] = None
+        self.exception_version += 1
+        return True
+
+    def get_exception_list(self):
+        """Return the current exception list (in reporting order)."""
+        return list(self.exception_list)
+
+    def exception_etag(self):
+        """Validator of the exception list; changes when the session restarts or the list grows."""
+        return f'"exc-{self.epoch}-{self.exception_version}"'
+
+    # ---------------------------
+    # Finalize Attendance
+    # ---------------------------
+    def finalize_attendance(self, present_uids_from_exception=[]):
+        """
+        Mark attendance at session end.
+        - Students in exception list marked present by teacher are linked to teacher node.
+        - Any node whose ultimate parent is teacher → present; otherwise → absent.
+        """
+        self._mark_exceptions(present_uids_from_exception)
+
+        # Every index whose root is the teacher is present
+        find = self.forest.find
+        teacher = self.teacher_index
+        return {uid: find(i) == teacher for i, uid in enumerate(self.uids) if i != teacher}
+
+    @_exclusive
+    def finalize_statuses(self, present_uids_from_exception=(), late_after=None):
+        """
+        Like finalize_attendance, but returns {uid: "PRESENT" | "LATE" | "ABSENT"}:
+        students who reached the teacher's group more than `late_after` seconds
+        into the session are LATE (None = nobody is late).
+        """
+        self._mark_exceptions(present_uids_from_exception)
+
+        # Classified straight from the join times; the teacher is the last index
+        limit = NOT_JOINED if late_after is None else late_after
+        return {
+            uid: "ABSENT" if joined == NOT_JOINED else "PRESENT" if joined <= limit else "LATE"
+            for uid, joined in zip(self.uids[:-1], self.forest.joined_at)
+        }
+
+    def flagged(self):
+        """Participants the proxy detector flagged during the session (see anomaly.py)."""
+        return self.analyzer.report(self.uids) if self.analyzer is not None else []
+
+    def _mark_exceptions(self, present_uids_from_exception):
+        """Link present exception students to teacher."""
+        for uid in present_uids_from_exception:
+            if uid in self.exception_list:
+                self.mark_present(uid)
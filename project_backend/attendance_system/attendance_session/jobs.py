@@ -0,0 +1,134 @@
+# attendance_session/jobs.py
+"""
+DB-backed queue that persists finalized sessions off the request path.
+
+FinalizeSessionView snapshots the union-find result and enqueues one
+FinalizeJob per AttendanceSession; `manage.py run_finalize_worker` claims
+and writes them with retries and exponential backoff.
+
+At the end of a period many classrooms finalize within seconds, so the worker
+waits FINALIZE_BATCH_WINDOW seconds once work shows up and then writes every
+claimed job in a single transaction.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from user.models import Classroom
+from .models import FinalizeJob
+from .session_manager import session_setting
+from .storage import save_attendance, save_attendance_batch
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Producer
+# ---------------------------
+def enqueue_finalize(classroom_id, session_id, statuses):
+    """
+    Queue persistence of {uid: status} for a session.
+    Idempotent per session: a repeated finalize returns the existing job.
+    """
+    try:
+        job, _ = FinalizeJob.objects.get_or_create(
+            session_id=session_id,
+            defaults={
+                "classroom_id": classroom_id,
+                "statuses": statuses,
+                "available_at": timezone.now(),
+            },
+        )
+    except IntegrityError:
+        job = FinalizeJob.objects.get(session_id=session_id)
+    return job
+
+
+# ---------------------------
+# Consumer
+# ---------------------------
+def _due():
+    stale = timezone.now() - timedelta(seconds=session_setting("FINALIZE_LEASE"))
+    return Q(status="QUEUED", available_at__lte=timezone.now()) | Q(status="RUNNING", updated_at__lt=stale)
+
+
+def claim_jobs(limit=10):
+    """
+    Atomically move up to `limit` due jobs to RUNNING and return them.
+    RUNNING jobs whose lease expired (crashed worker) are claimed again.
+    """
+    now = timezone.now()
+    due = _due()
+    candidates = FinalizeJob.objects.filter(due).values_list("id", "status")[:limit]
+
+    claimed = []
+    for job_id, current in candidates:
+        # Conditional update: only one worker wins each job, on every database backend
+        won = FinalizeJob.objects.filter(id=job_id, status=current).filter(due).update(
+            status="RUNNING", attempts=F("attempts") + 1, updated_at=now
+        )
+        if won:
+            claimed.append(job_id)
+    return list(FinalizeJob.objects.filter(id__in=claimed))
+
+
+def run_job(job):
+    """Persist one claimed job; on failure schedule a retry or give up after FINALIZE_MAX_ATTEMPTS."""
+    try:
+        classroom = Classroom.objects.get(id=job.classroom_id)
+        save_attendance(classroom, job.statuses, job.session_id)
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts >= session_setting("FINALIZE_MAX_ATTEMPTS"):
+            job.status = "FAILED"
+            job.finished_at = timezone.now()
+        else:
+            job.status = "QUEUED"
+            job.available_at = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        job.save(update_fields=["status", "last_error", "available_at", "finished_at", "updated_at"])
+        logger.error("Finalize job %s attempt %s failed: %s", job.id, job.attempts, e)
+        return False
+
+    job.status = "DONE"
+    job.last_error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "last_error", "finished_at", "updated_at"])
+    return True
+
+
+def run_batch(jobs):
+    """
+    Persist claimed jobs together (one student lookup, one bulk_create, one transaction).
+    If the batch fails, jobs are retried one by one so a single bad job cannot block the rest.
+    """
+    if not jobs:
+        return
+    try:
+        save_attendance_batch([(job.classroom_id, job.session_id, job.statuses) for job in jobs])
+    except Exception as e:
+        logger.warning("Batch of %d finalize jobs failed (%s), retrying individually", len(jobs), e)
+        for job in jobs:
+            run_job(job)
+        return
+    FinalizeJob.objects.filter(id__in=[job.id for job in jobs]).update(
+        status="DONE", last_error="", finished_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+def process_jobs(limit=100, window=None):
+    """
+    Claim and persist one batch of jobs. Returns how many were processed.
+    When work is pending, wait `window` seconds first so finalizes from the same bell share a batch.
+    """
+    window = session_setting("FINALIZE_BATCH_WINDOW") if window is None else window
+    if window and not FinalizeJob.objects.filter(_due()).exists():
+        return 0
+    if window:
+        time.sleep(window)
+    jobs = claim_jobs(limit)
+    run_batch(jobs)
+    return len(jobs)
@@ -0,0 +1,78 @@
+# attendance_session/management/commands/bench_anomaly.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance_session.anomaly import PassAnalyzer
+from attendance_session.engine import SessionObject
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-pass overhead of the streaming proxy detector, and what it flags in a simulated "
+        "lecture where a few devices fan the token out to many classmates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=500)
+        parser.add_argument("--passes", type=int, default=20000)
+        parser.add_argument("--proxies", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        n = options["students"]
+        uids = [f"S{i:05d}" for i in range(n)]
+
+        # Random passes between classmates (mostly new edges)
+        pairs = []
+        for _ in range(options["passes"]):
+            a, b = rng.sample(range(n), 2)
+            pairs += [a, b]
+        count = len(pairs) // 2
+
+        def run(with_analyzer):
+            session = SessionObject(1, "T001", uids)
+            if with_analyzer:
+                session.analyzer = PassAnalyzer(len(session), session.teacher_index)
+            start = time.perf_counter()
+            for k in range(0, len(pairs), 2):
+                session._pass(pairs[k], pairs[k + 1])
+            return (time.perf_counter() - start) / count
+
+        base = min(run(False) for _ in range(3))
+        analyzed = min(run(True) for _ in range(3))
+        self.stdout.write(f"Passes: {count} over {n} students")
+        self.stdout.write(f"  without detector: {base * 1e6:8.2f} us/pass")
+        self.stdout.write(f"  with detector:    {analyzed * 1e6:8.2f} us/pass  (+{(analyzed - base) * 1e6:.2f} us)")
+
+        # Simulated lecture: a chain of handovers every few seconds, plus proxy devices
+        # that each pass to 20 classmates a fraction of a second apart
+        session = SessionObject(1, "T001", uids)
+        session.analyzer = analyzer = PassAnalyzer(len(session), session.teacher_index)
+        proxies = set(rng.sample(range(n), options["proxies"]))
+        clock = 0.0
+        order = list(range(n))
+        rng.shuffle(order)
+        previous = session.teacher_index
+        for i in order:
+            clock += rng.uniform(2, 8)
+            analyzer.observe(previous, clock)
+            previous = i
+            if i in proxies:
+                for j in rng.sample(range(n), 20):
+                    clock += rng.uniform(0.1, 0.6)
+                    analyzer.observe(i, clock)
+
+        start = time.perf_counter()
+        report = session.flagged()
+        elapsed = time.perf_counter() - start
+        caught = {uids.index(entry["uid"]) for entry in report}
+        self.stdout.write(
+            f"Simulated lecture: {len(proxies)} proxies, {len(report)} flagged "
+            f"({len(caught & proxies)} true, {len(caught - proxies)} false) "
+            f"in {elapsed * 1e6:.0f} us at finalize"
+        )
+        for entry in report:
+            self.stdout.write(f"  {entry}")
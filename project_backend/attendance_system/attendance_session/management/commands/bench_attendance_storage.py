@@ -0,0 +1,180 @@
+# attendance_session/management/commands/bench_attendance_storage.py
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from attendance_session.bitmap import (
+    STATUSES, pack_ids, pack_statuses, position, roster_digest, status_at, unpack_ids, unpack_statuses,
+)
+
+# Same columns and indexes Django creates for AttendanceRecord
+ROW_SCHEMA = """
+CREATE TABLE record (
+    id integer PRIMARY KEY AUTOINCREMENT, date date NOT NULL, status varchar(10) NOT NULL,
+    timestamp datetime NOT NULL, classroom_id bigint NOT NULL, student_id bigint NOT NULL, session_id bigint NULL
+);
+CREATE INDEX record_classroom ON record (classroom_id);
+CREATE INDEX record_student ON record (student_id);
+CREATE INDEX record_session ON record (session_id);
+CREATE INDEX record_session_student ON record (session_id, student_id);
+"""
+
+# Packed layout: one vector per session plus deduplicated roster versions
+BITMAP_SCHEMA = """
+CREATE TABLE roster (
+    id integer PRIMARY KEY AUTOINCREMENT, classroom_id bigint NOT NULL, version integer NOT NULL,
+    student_ids blob NOT NULL, size integer NOT NULL, digest varchar(40) NOT NULL
+);
+CREATE INDEX roster_classroom_digest ON roster (classroom_id, digest);
+CREATE TABLE session (
+    id integer PRIMARY KEY AUTOINCREMENT, classroom_id bigint NOT NULL, roster_id bigint NULL,
+    status_vector blob NULL
+);
+CREATE INDEX session_classroom ON session (classroom_id);
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare row-per-student AttendanceRecord storage with packed per-session status vectors: "
+        "on-disk size and per-student / per-lecture query time (synthetic data, temporary SQLite files)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classrooms", type=int, default=50)
+        parser.add_argument("--students", type=int, default=60, help="Students per classroom")
+        parser.add_argument("--lectures", type=int, default=100, help="Lectures per classroom")
+        parser.add_argument("--queries", type=int, default=300)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        classrooms = options["classrooms"]
+        per_class = options["students"]
+        lectures = options["lectures"]
+
+        # Each classroom gets its own students; a third of students also sit in the next classroom
+        rosters = {}
+        for c in range(classrooms):
+            own = list(range(c * per_class + 1, (c + 1) * per_class + 1))
+            borrowed = own[: per_class // 3]
+            rosters[c] = sorted(set(own) | {s + per_class for s in borrowed if c + 1 < classrooms})
+        student_classrooms = {}
+        for c, students in rosters.items():
+            for s in students:
+                student_classrooms.setdefault(s, []).append(c)
+        weights = [10, 85, 3, 2]  # ABSENT, PRESENT, LATE, PENDING
+        statuses = {
+            (c, k): rng.choices(STATUSES, weights, k=len(rosters[c]))
+            for c in rosters for k in range(lectures)
+        }
+
+        with tempfile.TemporaryDirectory() as tmp:
+            rows_db, rows_size, rows_write = self._build_rows(os.path.join(tmp, "rows.sqlite3"), rosters, statuses, lectures)
+            bits_db, bits_size, bits_write = self._build_bitmap(os.path.join(tmp, "bits.sqlite3"), rosters, statuses, lectures)
+
+            students = rng.sample(sorted(student_classrooms), min(options["queries"], len(student_classrooms)))
+            sessions = [rng.randrange(1, classrooms * lectures + 1) for _ in range(options["queries"])]
+
+            row_student = self._time(lambda s: rows_db.execute(
+                "SELECT status FROM record WHERE student_id = ?", (s,)).fetchall(), students)
+            bit_student = self._time(lambda s: self._bitmap_student(bits_db, s, student_classrooms[s]), students)
+            row_lecture = self._time(lambda k: rows_db.execute(
+                "SELECT student_id, status FROM record WHERE session_id = ?", (k,)).fetchall(), sessions)
+            bit_lecture = self._time(lambda k: self._bitmap_lecture(bits_db, k), sessions)
+
+            # Sanity check: both layouts decode to the same history
+            for s in students[:20]:
+                row_hist = sorted(r[0] for r in rows_db.execute("SELECT status FROM record WHERE student_id = ?", (s,)))
+                assert row_hist == sorted(self._bitmap_student(bits_db, s, student_classrooms[s])), s
+            rows_db.close()
+            bits_db.close()
+
+        records = sum(len(v) for v in statuses.values())
+        self.stdout.write(f"{classrooms} classrooms, {len(student_classrooms)} students, {records} attendance marks")
+        self.stdout.write(f"{'':24}{'rows':>14}{'bitmap':>14}{'ratio':>10}")
+        self._line("on-disk size (KiB)", rows_size / 1024, bits_size / 1024)
+        self._line("bytes per mark", rows_size / records, bits_size / records)
+        self._line("bulk load (s)", rows_write, bits_write)
+        self._line("per-student query (us)", row_student * 1e6, bit_student * 1e6)
+        self._line("per-lecture query (us)", row_lecture * 1e6, bit_lecture * 1e6)
+
+    def _line(self, label, rows, bits):
+        self.stdout.write(f"{label:24}{rows:14.2f}{bits:14.2f}{rows / bits if bits else 0:9.1f}x")
+
+    def _time(self, fn, args):
+        start = time.perf_counter()
+        for arg in args:
+            fn(arg)
+        return (time.perf_counter() - start) / max(len(args), 1)
+
+    def _size(self, db):
+        db.execute("VACUUM")
+        return db.execute("PRAGMA page_count").fetchone()[0] * db.execute("PRAGMA page_size").fetchone()[0]
+
+    def _build_rows(self, path, rosters, statuses, lectures):
+        db = sqlite3.connect(path)
+        db.executescript(ROW_SCHEMA)
+        start = time.perf_counter()
+        base = datetime(2025, 1, 6, 9, 0)
+        session_id = 0
+        with db:
+            for c, students in rosters.items():
+                for k in range(lectures):
+                    session_id += 1
+                    when = base + timedelta(days=k, hours=c % 8)
+                    db.executemany(
+                        "INSERT INTO record (date, status, timestamp, classroom_id, student_id, session_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(when.date().isoformat(), st, when.isoformat(" "), c, s, session_id)
+                         for s, st in zip(students, statuses[c, k])],
+                    )
+        elapsed = time.perf_counter() - start
+        return db, self._size(db), elapsed
+
+    def _build_bitmap(self, path, rosters, statuses, lectures):
+        db = sqlite3.connect(path)
+        db.executescript(BITMAP_SCHEMA)
+        start = time.perf_counter()
+        with db:
+            for c, students in rosters.items():
+                packed = pack_ids(students)
+                roster_id = db.execute(
+                    "INSERT INTO roster (classroom_id, version, student_ids, size, digest) VALUES (?, 1, ?, ?, ?)",
+                    (c, packed, len(students), roster_digest(packed)),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO session (classroom_id, roster_id, status_vector) VALUES (?, ?, ?)",
+                    [(c, roster_id, pack_statuses(statuses[c, k])) for k in range(lectures)],
+                )
+        elapsed = time.perf_counter() - start
+        return db, self._size(db), elapsed
+
+    def _bitmap_student(self, db, student_id, classroom_ids):
+        marks = []
+        rosters = {}
+        rows = db.execute(
+            "SELECT s.roster_id, s.status_vector, r.student_ids FROM session s JOIN roster r ON r.id = s.roster_id "
+            f"WHERE s.classroom_id IN ({','.join('?' * len(classroom_ids))})",
+            classroom_ids,
+        )
+        for roster_id, vector, ids in rows:
+            i = rosters.get(roster_id)
+            if i is None:
+                i = rosters[roster_id] = position(unpack_ids(ids), student_id)
+            if i is not None:
+                marks.append(status_at(vector, i))
+        return marks
+
+    def _bitmap_lecture(self, db, session_id):
+        vector, ids = db.execute(
+            "SELECT s.status_vector, r.student_ids FROM session s JOIN roster r ON r.id = s.roster_id WHERE s.id = ?",
+            (session_id,),
+        ).fetchone()
+        ids = unpack_ids(ids)
+        return list(zip(ids, unpack_statuses(vector, len(ids))))
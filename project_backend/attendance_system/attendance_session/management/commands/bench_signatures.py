@@ -0,0 +1,93 @@
+# attendance_session/management/commands/bench_signatures.py
+import base64
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance_session.engine import SessionObject
+from attendance_session.signatures import KeyRing, backend, load_public_key, pass_message
+
+
+class Command(BaseCommand):
+    help = (
+        "Cost per token pass of device-signature checks: parsing the stored key on every pass, "
+        "keys cached per session, and batched verification on the verify pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=200)
+        parser.add_argument("--passes", type=int, default=4000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if backend() is None:
+            raise CommandError("Install cryptography (or pycryptodome) to verify signatures")
+        try:
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+        except ImportError:
+            raise CommandError("Generating test keys needs the cryptography package")
+
+        rng = random.Random(options["seed"])
+        n = options["students"]
+        uids = [f"S{i:05d}" for i in range(n)]
+        private = {uid: Ed25519PrivateKey.generate() for uid in uids}
+        auth_keys = {
+            uid: base64.b64encode(key.public_key().public_bytes(
+                serialization.Encoding.Raw, serialization.PublicFormat.Raw
+            )).decode()
+            for uid, key in private.items()
+        }
+        pem_keys = {
+            uid: key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode()
+            for uid, key in private.items()
+        }
+        session = SessionObject(1, "T001", uids)
+
+        pairs, signatures = [], []
+        for _ in range(options["passes"]):
+            a, b = rng.sample(range(n), 2)
+            pairs += [a, b]
+            signatures.append(private[uids[b]].sign(pass_message(session.epoch, a, b)))
+        count = len(signatures)
+
+        # Naive: parse the receiver's stored key on every pass
+        start = time.perf_counter()
+        for k in range(count):
+            a, b = pairs[2 * k], pairs[2 * k + 1]
+            assert load_public_key(auth_keys[uids[b]])(pass_message(session.epoch, a, b), signatures[k])
+        naive = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        for k in range(count):
+            a, b = pairs[2 * k], pairs[2 * k + 1]
+            assert load_public_key(pem_keys[uids[b]])(pass_message(session.epoch, a, b), signatures[k])
+        naive_pem = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        keyring = KeyRing.for_session(session, auth_keys)
+        parse = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for k in range(count):
+            assert keyring.verify_pass(session.epoch, pairs[2 * k], pairs[2 * k + 1], signatures[k])
+        cached = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        assert all(keyring.verify_batch(session.epoch, pairs, signatures))
+        batched = (time.perf_counter() - start) / count
+
+        forged = list(signatures)
+        forged[0] = bytes(64)
+        if keyring.verify_batch(session.epoch, pairs, forged)[0]:
+            raise CommandError("Forged signature accepted")
+
+        self.stdout.write(f"backend: {backend()}, {n} students, {count} signed passes")
+        self.stdout.write(f"key parsing at session start: {parse * 1e3:.2f} ms total")
+        self.stdout.write(f"per pass, parse PEM + verify: {naive_pem * 1e6:8.1f} us")
+        self.stdout.write(f"per pass, parse raw + verify: {naive * 1e6:8.1f} us")
+        self.stdout.write(f"per pass, cached keys:        {cached * 1e6:8.1f} us")
+        self.stdout.write(f"per pass, batched on pool:    {batched * 1e6:8.1f} us")
@@ -0,0 +1,73 @@
+# attendance_session/management/commands/bench_startup.py
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance_session.warmup import cached_roster, load_roster
+
+# What a worker does before it can answer its first request
+BOOT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+PROJECT_PACKAGES = ("attendance_session", "user", "attendance_system")
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker boot time (django.setup + URLconf, in fresh interpreters) against a budget, "
+        "the slowest project imports, and optionally cold vs warmed roster loading for a classroom."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--budget", type=float, default=1500, help="Milliseconds allowed for a worker boot")
+        parser.add_argument("--classroom", type=int, help="Classroom id whose roster load to time")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "attendance_system.settings"))
+        cwd = str(settings.BASE_DIR)
+
+        times = []
+        for _ in range(options["runs"]):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", BOOT], env=env, cwd=cwd, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+        boot = statistics.median(times)
+        self.stdout.write(f"Worker boot: median {boot:.0f} ms over {len(times)} runs (budget {options['budget']:.0f} ms)")
+
+        # -X importtime writes "import time: self | cumulative | module" lines to stderr
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", BOOT], env=env, cwd=cwd,
+                             check=True, capture_output=True, text=True).stderr
+        own = []
+        for line in out.splitlines():
+            parts = line.split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            module = parts[2].strip()
+            if module.split(".")[0] in PROJECT_PACKAGES:
+                own.append((int(parts[1]), int(parts[0].split(":")[1]), module))
+        self.stdout.write("Slowest project imports (cumulative / self, ms):")
+        for cumulative, self_us, module in sorted(own, reverse=True)[:10]:
+            self.stdout.write(f"  {cumulative / 1000:7.1f} {self_us / 1000:7.1f}  {module}")
+
+        if options["classroom"] is not None:
+            classroom_id = options["classroom"]
+            start = time.perf_counter()
+            roster = load_roster(classroom_id)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            cached_roster(classroom_id)
+            warm = time.perf_counter() - start
+            self.stdout.write(
+                f"Roster of classroom {classroom_id} ({len(roster.uids)} students): "
+                f"cold {cold * 1000:.1f} ms, warmed {warm * 1000:.1f} ms"
+            )
+
+        if boot > options["budget"]:
+            raise CommandError(f"Worker boot {boot:.0f} ms is over the {options['budget']:.0f} ms budget")
@@ -0,0 +1,108 @@
+# attendance_session/management/commands/memory_report.py
+import glob
+import json
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance_session.diagnostics import memory_setting
+
+
+def _mb(value):
+    return "n/a" if value is None else f"{value / (1 << 20):.1f} MB"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the memory snapshots workers append to ATTENDANCE_SESSIONS['MEMORY']['SNAPSHOT_DIR']: "
+        "RSS and session memory per worker, stale (never finalized) sessions and the allocation sites that grew. "
+        "Live sessions are per worker, so this reads the snapshots instead of inspecting its own process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Snapshot directory (default MEMORY['SNAPSHOT_DIR'])")
+        parser.add_argument("--last", type=int, default=0, help="Only the last N snapshots of each worker")
+        parser.add_argument("--top", type=int, default=10, help="Growing allocation sites listed per worker")
+        parser.add_argument("--prune", action="store_true", help="Delete the snapshot files of exited workers")
+
+    def handle(self, *args, **options):
+        directory = options["dir"] or memory_setting("SNAPSHOT_DIR")
+        if not directory or not os.path.isdir(directory):
+            raise CommandError(
+                f"No snapshot directory ({directory}); set MEMORY['SNAPSHOT_DIR'] and MEMORY['SNAPSHOT_INTERVAL']"
+            )
+        paths = sorted(glob.glob(os.path.join(directory, "memory-*.jsonl")))
+        if not paths:
+            self.stdout.write(f"No snapshots in {directory} yet")
+            return
+
+        fleet_rss = fleet_sessions = 0
+        for path in paths:
+            entries = []
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue    # Line cut short by a worker that died mid-write
+            if options["last"]:
+                entries = entries[-options["last"]:]
+            if not entries:
+                continue
+
+            first, last = entries[0], entries[-1]
+            alive = _alive(last["pid"])
+            self.stdout.write(
+                f"Worker {last['pid']} ({'running' if alive else 'exited'}): "
+                f"{len(entries)} snapshots, {first['at']} .. {last['at']}"
+            )
+            rss_growth = (last["rss"] - first["rss"]) if last["rss"] is not None and first["rss"] is not None else None
+            self.stdout.write(
+                f"  RSS {_mb(last['rss'])} (peak {_mb(last['peak_rss'])}, "
+                f"{'n/a' if rss_growth is None else f'{rss_growth / (1 << 20):+.1f} MB'} over the window)"
+            )
+            per_node = last["session_bytes"] / last["nodes"] if last["nodes"] else 0
+            busiest = max(entries, key=lambda e: e["session_bytes"])
+            self.stdout.write(
+                f"  Sessions: {last['sessions']} live, {last['nodes']} nodes, {_mb(last['session_bytes'])} "
+                f"({per_node:.0f} B/node); busiest {_mb(busiest['session_bytes'])} "
+                f"with {busiest['sessions']} sessions at {busiest['at']}"
+            )
+            for s in last["largest"]:
+                self.stdout.write(
+                    f"    classroom {s['classroom_id']}: {s['nodes']} nodes, {_mb(s['bytes'])}, up {s['age_seconds']} s"
+                )
+            for s in last["stale"]:
+                self.stdout.write(self.style.WARNING(
+                    f"  Stale: classroom {s['classroom_id']} (session {s['session_id']}, {s['nodes']} nodes) "
+                    f"live for {s['age_seconds'] // 60} min, never finalized"
+                ))
+
+            growth = Counter()
+            for entry in entries:
+                for site in entry.get("growth") or ():
+                    growth[site["site"]] += site["growth"]
+            if growth:
+                self.stdout.write("  Allocation sites that grew most (tracemalloc):")
+                for site, size in growth.most_common(options["top"]):
+                    self.stdout.write(f"    {size / 1024:+10.1f} KiB  {site}")
+
+            if alive:
+                fleet_rss += last["rss"] or 0
+                fleet_sessions += last["sessions"]
+            elif options["prune"]:
+                os.remove(path)
+                self.stdout.write(f"  Removed {os.path.basename(path)}")
+
+        self.stdout.write(f"Running workers: {_mb(fleet_rss)} RSS in total, {fleet_sessions} live sessions")
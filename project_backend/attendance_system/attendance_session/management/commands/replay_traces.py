@@ -0,0 +1,80 @@
+# attendance_session/management/commands/replay_traces.py
+import glob
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from attendance_session.session_manager import session_setting
+from attendance_session.engine import DisjointSet
+from attendance_session.trace import NodeUnionFind, read_trace, replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay captured session traces against one or more union-find implementations, "
+        "check every implementation yields the same attendance map, and time them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="*",
+            help="Trace files or directories (default: ATTENDANCE_SESSIONS['TRACE_DIR'])",
+        )
+        parser.add_argument(
+            "--impl", action="append", default=[],
+            help="Dotted path of an implementation class to compare with the reference (repeatable)",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per trace (best is reported)")
+
+    def handle(self, *args, **options):
+        paths = self._collect(options["paths"] or [session_setting("TRACE_DIR") or ""])
+        if not paths:
+            raise CommandError("No trace files found")
+
+        impls = [("reference", NodeUnionFind), ("engine", DisjointSet)]
+        for dotted in options["impl"]:
+            try:
+                impls.append((dotted, import_string(dotted)))
+            except ImportError as e:
+                raise CommandError(f"Cannot import {dotted}: {e}")
+
+        totals = {name: 0.0 for name, _ in impls}
+        mismatches = 0
+        for path in paths:
+            uids, teacher_index, edges = read_trace(path)
+            expected = None
+            line = [f"{os.path.basename(path)}: {len(uids)} nodes, {len(edges) // 2} edges"]
+            for name, impl_class in impls:
+                best = float("inf")
+                for _ in range(max(options["repeat"], 1)):
+                    start = time.perf_counter()
+                    result = replay(impl_class, uids, teacher_index, edges)
+                    best = min(best, time.perf_counter() - start)
+                totals[name] += best
+                if expected is None:
+                    expected = result
+                elif result != expected:
+                    mismatches += 1
+                    diff = sorted(uid for uid in expected if expected[uid] != result.get(uid))
+                    line.append(f"  {name}: MISMATCH on {len(diff)} students, e.g. {diff[:5]}")
+                    continue
+                line.append(f"  {name}: {best * 1e3:.3f} ms")
+            self.stdout.write("\n".join(line))
+
+        self.stdout.write("Totals (best of each trace):")
+        for name, total in totals.items():
+            self.stdout.write(f"  {name}: {total * 1e3:.3f} ms")
+        if mismatches:
+            raise CommandError(f"{mismatches} attendance map mismatch(es)")
+        self.stdout.write(self.style.SUCCESS(f"{len(paths)} trace(s) replayed, all implementations agree"))
+
+    def _collect(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, "*.trace"))))
+            elif os.path.isfile(path):
+                files.append(path)
+        return files
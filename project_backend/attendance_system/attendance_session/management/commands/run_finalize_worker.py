@@ -0,0 +1,51 @@
+# attendance_session/management/commands/run_finalize_worker.py
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from attendance_session.jobs import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Persist queued session finalizations (FinalizeJob) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker threads")
+        parser.add_argument("--batch", type=int, default=100, help="Jobs claimed and written per transaction")
+        parser.add_argument(
+            "--window", type=float, default=None,
+            help="Seconds to collect finalizations before writing (default: FINALIZE_BATCH_WINDOW)",
+        )
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        processed = [0] * options["workers"]
+
+        def work(n):
+            try:
+                while not stop.is_set():
+                    count = process_jobs(options["batch"], options["window"])
+                    processed[n] += count
+                    if not count:
+                        if options["once"]:
+                            return
+                        stop.wait(options["poll"])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, args=(n,), daemon=True) for n in range(options["workers"])]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Finalize worker running with {len(threads)} thread(s)")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f"Processed {sum(processed)} finalize job(s)"))
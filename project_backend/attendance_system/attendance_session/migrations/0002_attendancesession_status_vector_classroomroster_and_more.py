@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_session', '0001_initial'),
+        ('user', '0007_attendancerecord_session_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesession',
+            name='status_vector',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ClassroomRoster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('student_ids', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('digest', models.CharField(max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rosters', to='user.classroom')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancesession',
+            name='roster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='attendance_session.classroomroster'),
+        ),
+        migrations.AddIndex(
+            model_name='classroomroster',
+            index=models.Index(fields=['classroom', 'digest'], name='attendance__classro_cd008c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='classroomroster',
+            unique_together={('classroom', 'version')},
+        ),
+    ]
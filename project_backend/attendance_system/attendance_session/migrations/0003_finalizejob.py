@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_session', '0002_attendancesession_status_vector_classroomroster_and_more'),
+        ('user', '0007_attendancerecord_session_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinalizeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statuses', models.JSONField()),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='finalize_jobs', to='user.classroom')),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='finalize_job', to='attendance_session.attendancesession')),
+            ],
+            options={
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='attendance__status_e8a6e2_idx')],
+            },
+        ),
+    ]
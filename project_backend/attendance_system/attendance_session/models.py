@@ -1,3 +1,79 @@
 from django.db import models
 
-# Create your models here.
+
+class ClassroomRoster(models.Model):
+    """
+    A versioned snapshot of a classroom's enrolled students.
+    Packed attendance vectors are positional, so each one points at the roster it was written against.
+    """
+    classroom = models.ForeignKey("user.Classroom", on_delete=models.CASCADE, related_name="rosters")
+    version = models.PositiveIntegerField()
+    student_ids = models.BinaryField()                 # Sorted uint64 Student pks (see bitmap.pack_ids)
+    size = models.PositiveIntegerField()
+    digest = models.CharField(max_length=40)           # sha1 of student_ids, to reuse identical rosters
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('classroom', 'version')
+        indexes = [
+            models.Index(fields=['classroom', 'digest']),
+        ]
+
+    def __str__(self):
+        return f"{self.classroom.code} roster v{self.version} ({self.size} students)"
+
+
+class AttendanceSession(models.Model):
+    """One lecture: created when the teacher starts a session, closed at finalize."""
+    classroom = models.ForeignKey("user.Classroom", on_delete=models.CASCADE, related_name="attendance_sessions")
+    teacher = models.ForeignKey("user.Teacher", on_delete=models.SET_NULL, null=True, blank=True, related_name="attendance_sessions")
+    started_at = models.DateTimeField(auto_now_add=True)
+    finalized_at = models.DateTimeField(null=True, blank=True)   # None while the session is live
+    total_students = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    # Compact storage: 2-bit status per roster position (see bitmap.py)
+    roster = models.ForeignKey(ClassroomRoster, on_delete=models.PROTECT, null=True, blank=True, related_name="sessions")
+    status_vector = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['classroom', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.classroom.code} | {self.started_at} | {'finalized' if self.finalized_at else 'live'}"
+
+
+class FinalizeJob(models.Model):
+    """
+    Background persistence of a finalized session (see jobs.py).
+    One job per AttendanceSession, which doubles as the idempotency key.
+    """
+    STATUS_CHOICES = (
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    )
+
+    session = models.OneToOneField(AttendanceSession, on_delete=models.CASCADE, related_name="finalize_job")
+    classroom = models.ForeignKey("user.Classroom", on_delete=models.CASCADE, related_name="finalize_jobs")
+    statuses = models.JSONField()                      # Snapshot {uid: status} taken at finalize
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    available_at = models.DateTimeField()              # Earliest time a worker may (re)try the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"Finalize session {self.session_id} | {self.status} | attempt {self.attempts}"
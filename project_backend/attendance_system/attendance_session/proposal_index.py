@@ -0,0 +1,104 @@
+# attendance_session/proposal_index.py
+"""
+Absence proposals applied at finalize time.
+
+A lecture finalized after a proposal was approved (or while it is pending)
+must not record the student as plain ABSENT. For every finalize (or batch of
+finalizes) the relevant proposals are loaded in one query into a per-student
+sorted-endpoint index, and each absent student is classified by a stab query
+at the lecture's start time.
+"""
+from bisect import bisect_right
+
+from django.utils import timezone
+
+from user.models import AbsenceProposal
+
+# Proposal status -> attendance status of an absent student covered by it (strongest first)
+APPLIED = {"APPROVED": "PRESENT", "PENDING": "PENDING"}
+
+
+class ProposalIntervalIndex:
+    """
+    Intervals per student, sorted by start, with a running maximum of the ends.
+
+    stab(uid, t) walks back from the last interval starting at or before t
+    and stops as soon as no earlier interval can reach t, so a lookup is a
+    binary search plus the intervals that actually overlap.
+    """
+    def __init__(self, rows):
+        grouped = {}
+        for uid, start, end, tag in rows:
+            grouped.setdefault(uid, []).append((start, end, tag))
+
+        self._students = {}
+        for uid, intervals in grouped.items():
+            intervals.sort(key=lambda iv: iv[0])
+            max_end, reach = [], None
+            for _, end, _ in intervals:
+                reach = end if reach is None or end > reach else reach
+                max_end.append(reach)
+            self._students[uid] = (
+                [iv[0] for iv in intervals],
+                [iv[1] for iv in intervals],
+                [iv[2] for iv in intervals],
+                max_end,
+            )
+
+    def __len__(self):
+        return sum(len(entry[0]) for entry in self._students.values())
+
+    def stab(self, uid, when):
+        """Tags of every interval of `uid` that contains `when`."""
+        entry = self._students.get(uid)
+        if entry is None:
+            return []
+        starts, ends, tags, max_end = entry
+        found = []
+        i = bisect_right(starts, when) - 1
+        while i >= 0 and max_end[i] >= when:
+            if ends[i] >= when:
+                found.append(tags[i])
+            i -= 1
+        return found
+
+    @classmethod
+    def load(cls, uids, start, end):
+        """Approved and pending proposals of `uids` overlapping [start, end], in one query."""
+        rows = AbsenceProposal.objects.filter(
+            student__uid__in=list(uids),
+            status__in=list(APPLIED),
+            start_datetime__lte=end,
+            end_datetime__gte=start,
+        ).values_list("student__uid", "start_datetime", "end_datetime", "status")
+        return cls(rows)
+
+
+def apply_proposals(snapshots):
+    """
+    Reclassify absent students of finalized snapshots in place.
+
+    `snapshots` are (started_at, {uid: status}) pairs; an ABSENT student becomes
+    PRESENT under an approved proposal covering the lecture start, or PENDING
+    under a pending one. Returns how many statuses were changed.
+    """
+    absent = {uid for _, statuses in snapshots for uid, st in statuses.items() if st == "ABSENT"}
+    if not absent:
+        return 0
+    times = [started_at or timezone.now() for started_at, _ in snapshots]
+    index = ProposalIntervalIndex.load(absent, min(times), max(times))
+    if not len(index):
+        return 0
+
+    changed = 0
+    for when, (_, statuses) in zip(times, snapshots):
+        for uid, st in statuses.items():
+            if st != "ABSENT":
+                continue
+            tags = index.stab(uid, when)
+            for proposal_status, applied in APPLIED.items():
+                if proposal_status in tags:
+                    statuses[uid] = applied
+                    changed += 1
+                    break
+    return changed
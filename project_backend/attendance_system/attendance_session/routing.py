@@ -0,0 +1,542 @@
+# attendance_session/routing.py
+"""
+Classroom ownership across worker processes.
+
+Sessions live in process memory, so with several gunicorn workers a token pass
+may land on a worker that does not hold the classroom's SessionObject. With
+ATTENDANCE_SESSIONS['ROUTING'] set, every worker binds a Unix socket in
+ROUTING['SOCKET_DIR'] and the set of sockets there is the worker set. A
+consistent-hash ring over it gives each classroom one owner:
+
+- ClassroomRoutingMiddleware forwards the requests that touch a live session
+  (ROUTED_PATH: start, exceptions, mark-present, finalize, pass-token,
+  exception and the session status endpoints) to the owner over its socket;
+  the owner runs them through its own WSGI stack and sends the response back.
+  Reports and exports only read the database and are served where they land,
+  so the streamed CSV export is never buffered by a forward.
+- Endpoints spanning several classrooms fan out instead: batch finalize sends
+  each owner its share, the active-sessions and memory reports merge every
+  worker's answer (Router.gather).
+- An owner that refuses connections has crashed: its socket is removed, and
+  only once the ring no longer lists it is the request routed again. An owner
+  that accepts but does not answer gets the client a 502/504; the request is
+  never run a second time locally.
+- When a worker joins or leaves, only the classrooms whose owner changed move:
+  the monitor thread hands their live sessions off (SessionObject.to_state as
+  JSON, taken under the session lock; device keys rebuilt from the roster) to
+  the new owner; requests never
+  do handoffs themselves. Until then the old owner keeps serving the sessions
+  it holds. A stopping worker hands off everything it holds
+  (gunicorn.conf.py: worker_exit); a crashed worker's sessions are lost, as before.
+
+Forwarded requests are marked in the WSGI environ (ROUTED_KEY), which no client
+header can set, and the owner authenticates forwarded requests exactly like
+direct ones. The socket directory defaults to $XDG_RUNTIME_DIR/attendance-workers
+(else BASE_DIR/run/attendance-workers); a worker refuses to start unless the
+directory is owned by its user with mode 0700, so no other local user can
+connect. Nothing received over a socket is unpickled.
+"""
+import bisect
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+
+from .engine import SessionObject
+from .session_manager import session_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "SOCKET_DIR": None,         # None = $XDG_RUNTIME_DIR/attendance-workers, else BASE_DIR/run/attendance-workers
+    "REPLICAS": 64,             # Ring points per worker; more = more even split
+    "TIMEOUT": 10,              # Seconds to wait for the owner's response
+    "CHECK_INTERVAL": 5,        # Seconds between membership checks without traffic
+}
+
+# Endpoints that read or change a live session, by classroom id
+ROUTED_PATH = re.compile(
+    r"^/session/(?:(?:teacher|student)/classroom/(\d+)/"
+    r"(?:start|exceptions|mark-present|finalize|pass-token|exception|session)/"
+    r"|session/status/(\d+)/)$"
+)
+# Environ keys set by serve_request only (not HTTP_* headers, so clients cannot send them)
+ROUTED_KEY = "attendance.routed_by"
+FANOUT_KEY = "attendance.fanout"    # Part of a request already throttled by the worker that fanned it out
+# Header of the previous marker; stripped so old clients or proxies cannot confuse anything downstream
+LEGACY_ROUTED_HEADER = "HTTP_X_ATTENDANCE_ROUTED"
+WORKER_HEADER = "X-Attendance-Worker"   # Added to forwarded responses: which worker served them
+# CGI variables passed to the owner besides the HTTP_* headers
+CGI_KEYS = {
+    "REQUEST_METHOD", "PATH_INFO", "QUERY_STRING", "SCRIPT_NAME", "CONTENT_TYPE",
+    "REMOTE_ADDR", "SERVER_NAME", "SERVER_PORT", "SERVER_PROTOCOL",
+}
+# Hop-by-hop / recomputed headers that are not copied between the processes
+SKIP_HEADERS = {"HTTP_ACCEPT_ENCODING", "HTTP_CONNECTION", "HTTP_KEEP_ALIVE", "HTTP_TRANSFER_ENCODING"}
+SKIP_RESPONSE_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+FRAME = struct.Struct("!II")    # header length, body length
+
+
+def routing_setting(name):
+    return (session_setting("ROUTING") or {}).get(name, DEFAULTS[name])
+
+
+def socket_dir():
+    directory = routing_setting("SOCKET_DIR")
+    if directory:
+        return directory
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    return os.path.join(runtime or os.path.join(settings.BASE_DIR, "run"), "attendance-workers")
+
+
+def check_socket_dir(directory):
+    """Raise ImproperlyConfigured unless `directory` is a real directory of this user with mode 0700."""
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) != 0o700:
+        raise ImproperlyConfigured(
+            f"Routing socket directory {directory} must be a directory owned by uid {os.getuid()} with mode 0700 "
+            f"(found uid {st.st_uid}, mode {stat.filemode(st.st_mode)})"
+        )
+
+
+def routed_classroom(path):
+    """Classroom id of a request that must run on the classroom's owner, else None."""
+    match = ROUTED_PATH.match(path)
+    return int(match.group(1) or match.group(2)) if match else None
+
+
+def _point(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring: each member owns the arcs ending at its REPLICAS points."""
+    def __init__(self, members, replicas):
+        self.members = tuple(sorted(members))
+        points = sorted((_point(f"{member}#{i}"), member) for member in self.members for i in range(replicas))
+        self._hashes = [h for h, _ in points]
+        self._owners = [m for _, m in points]
+
+    def owner(self, key):
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _point(str(key))) % len(self._hashes)
+        return self._owners[i]
+
+
+class OwnerUnavailable(Exception):
+    """The owner could not serve a forwarded request; `status` is what the client gets."""
+    def __init__(self, message, status=503):
+        super().__init__(message)
+        self.status = status
+
+
+class OwnerLeft(OwnerUnavailable):
+    """The owner had crashed and is no longer in the ring: nothing was sent, route the request again."""
+
+
+# ---------------------------
+# Wire format: FRAME + JSON header + raw body
+# ---------------------------
+def _send(sock, header, body=b""):
+    data = json.dumps(header).encode()
+    sock.sendall(FRAME.pack(len(data), len(body)) + data + body)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("peer closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock):
+    header_len, body_len = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    return json.loads(_recv_exact(sock, header_len)), _recv_exact(sock, body_len)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            header, body = _recv(self.request)
+            if header["kind"] == "request":
+                _send(self.request, *self.server.router.serve_request(header, body))
+            elif header["kind"] == "handoff":
+                ok = self.server.router.receive_session(header["classroom_id"], body, header.get("keyed", True))
+                _send(self.request, {"ok": ok})
+        except Exception:
+            logger.exception("Routed request failed")
+        finally:
+            connections.close_all()  # DB connections are per-thread
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+# ---------------------------
+# Router
+# ---------------------------
+class Router:
+    """This worker's place in the ring; inactive until start()."""
+    def __init__(self, sessions=None):
+        self.name = None
+        self.ring = None
+        self._sessions = sessions   # SessionManager; the views' one unless given (tests)
+        self._server = None
+        self._app = None            # WSGI handler running forwarded requests
+        self._listing_mtime = None
+        self._unbalanced = False    # Ring changed since the last rebalance
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def active(self):
+        return self.name is not None
+
+    @property
+    def sessions(self):
+        if self._sessions is None:
+            from .views import sessions  # views imports this module (through the scheduler)
+            self._sessions = sessions
+        return self._sessions
+
+    def socket_path(self, name):
+        return os.path.join(socket_dir(), f"{name}.sock")
+
+    def start(self, name=None):
+        """Bind this worker's socket and join the ring."""
+        if self.active or session_setting("ROUTING") is None:
+            return
+        directory = socket_dir()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_socket_dir(directory)
+        name = name or f"worker-{os.getpid()}"
+        path = self.socket_path(name)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = _Server(path, _Handler)
+        self._server.router = self
+        threading.Thread(target=self._server.serve_forever, name="router-server", daemon=True).start()
+        self.name = name
+        self._stop.clear()
+        self._listing_mtime = None
+        self.refresh()
+        threading.Thread(target=self._monitor, name="router-monitor", daemon=True).start()
+        logger.info("%s joined the classroom ring (%d workers)", name, len(self.ring.members))
+
+    def _monitor(self):
+        """Membership checks and session handoffs; woken early when a request sees the ring change."""
+        while True:
+            self._wake.wait(routing_setting("CHECK_INTERVAL"))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh()
+                if self._unbalanced:
+                    self._unbalanced = False
+                    self.rebalance()
+            except Exception:
+                logger.exception("Ring refresh failed")
+            finally:
+                connections.close_all()  # DB connections are per-thread
+
+    def refresh(self):
+        """Rebuild the ring when the socket directory changed. Cheap enough for the request path."""
+        directory = socket_dir()
+        mtime = os.stat(directory).st_mtime_ns
+        if mtime == self._listing_mtime:
+            return
+        with self._lock:
+            self._listing_mtime = mtime
+            members = [entry[:-5] for entry in os.listdir(directory) if entry.endswith(".sock")]
+            if self.ring is not None and tuple(sorted(members)) == self.ring.members:
+                return
+            self.ring = HashRing(members, routing_setting("REPLICAS"))
+            self._unbalanced = True
+        logger.info("Classroom ring rebuilt: %d workers", len(self.ring.members))
+        self._wake.set()    # Hand off moved sessions on the monitor thread
+
+    def owner(self, classroom_id):
+        self.refresh()
+        return self.ring.owner(classroom_id)
+
+    def owns(self, classroom_id):
+        return not self.active or self.owner(classroom_id) in (self.name, None)
+
+    def route(self, classroom_id):
+        """Worker that must serve `classroom_id`, or None for this one (including sessions not handed off yet)."""
+        if not self.active or classroom_id in self.sessions:
+            return None
+        owner = self.owner(classroom_id)
+        return None if owner in (None, self.name) else owner
+
+    def fans_out(self, request):
+        """True when a multi-classroom endpoint should also ask the other workers."""
+        return self.active and not request.META.get(ROUTED_KEY)
+
+    def forget(self, member):
+        """
+        Remove the socket of a worker that refuses connections (crashed).
+        Returns True once the ring no longer lists it.
+        """
+        try:
+            os.unlink(self.socket_path(member))
+            logger.info("Removed stale worker socket %s", member)
+        except FileNotFoundError:
+            pass    # Another worker removed it first
+        except OSError as e:
+            logger.error("Could not remove the socket of %s: %s", member, e)
+        self.refresh()
+        return member not in self.ring.members
+
+    def _connect(self, member):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(routing_setting("TIMEOUT"))
+        try:
+            sock.connect(self.socket_path(member))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    # ---------------------------
+    # Request forwarding
+    # ---------------------------
+    def _meta(self, request):
+        meta = {
+            key: value for key, value in request.META.items()
+            if (key in CGI_KEYS or key.startswith("HTTP_")) and key not in SKIP_HEADERS and isinstance(value, str)
+        }
+        meta["wsgi.url_scheme"] = request.scheme
+        return meta
+
+    def _exchange(self, member, meta, body):
+        """One request / response round trip with `member`. Raises OwnerLeft or OwnerUnavailable."""
+        try:
+            sock = self._connect(member)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Nothing was sent, so the request may run elsewhere once the dead worker is out of the ring
+            if self.forget(member):
+                raise OwnerLeft(f"Worker {member} left the ring")
+            raise OwnerUnavailable(f"Worker {member} is not accepting requests")
+        except OSError as e:
+            raise OwnerUnavailable(f"Worker {member} is unreachable: {e}")
+        try:
+            with sock:
+                _send(sock, {"kind": "request", "meta": meta}, body)
+                return _recv(sock)
+        except socket.timeout:
+            raise OwnerUnavailable(f"Worker {member} did not answer in time", status=504)
+        except OSError as e:
+            # The owner may have run the request already: report it, never run it a second time here
+            raise OwnerUnavailable(f"Worker {member} failed: {e}", status=502)
+
+    def forward(self, member, request):
+        """Send a Django request to its owner and return the owner's response."""
+        header, body = self._exchange(member, self._meta(request), request.body)
+        response = HttpResponse(body, status=header["status"])
+        for key, value in header["headers"]:
+            if key.lower() not in SKIP_RESPONSE_HEADERS:
+                response[key] = value
+        return response
+
+    def call(self, member, request, data=None):
+        """
+        Run `request` on another worker as part of a fan-out, with `data` as its JSON body
+        if given. Returns (status, decoded JSON body).
+        """
+        meta = self._meta(request)
+        meta["HTTP_ACCEPT"] = "application/json"
+        meta[FANOUT_KEY] = True
+        body = request.body
+        if data is not None:
+            meta["CONTENT_TYPE"] = "application/json"
+            body = json.dumps(data).encode()
+        header, content = self._exchange(member, meta, body)
+        return header["status"], json.loads(content) if content else None
+
+    def gather(self, request):
+        """Run `request` on every other worker: {worker: decoded JSON, or None when it failed}."""
+        results = {}
+        for member in self.ring.members:
+            if member == self.name:
+                continue
+            try:
+                status_code, data = self.call(member, request)
+            except OwnerUnavailable as e:
+                logger.warning("%s", e)
+                results[member] = None
+                continue
+            results[member] = data if status_code < 400 else None
+        return results
+
+    def serve_request(self, header, body):
+        """Run a forwarded request through this worker's WSGI application."""
+        if self._app is None:
+            from django.core.wsgi import get_wsgi_application
+            self._app = get_wsgi_application()
+        environ = dict(header["meta"])
+        environ.update({
+            ROUTED_KEY: self.name,
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        })
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = headers
+
+        result = self._app(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return {"status": started["status"], "headers": [*started["headers"], (WORKER_HEADER, self.name)]}, content
+
+    # ---------------------------
+    # Session handoff (monitor thread and worker exit only)
+    # ---------------------------
+    def rebalance(self, exclude_self=False):
+        """Hand every local session whose classroom now belongs to another worker to that worker."""
+        if not self.active:
+            return
+        ring = self.ring
+        if exclude_self:
+            ring = HashRing([m for m in ring.members if m != self.name], routing_setting("REPLICAS"))
+        for classroom_id, session in self.sessions.items():
+            owner = ring.owner(classroom_id)
+            if owner in (None, self.name):
+                continue
+            if self.hand_off(owner, session):
+                self.sessions.pop(classroom_id, None)
+
+    def hand_off(self, member, session):
+        """
+        Send a live session to `member`. The session is locked from serializing until the
+        new owner has installed it, then closed: requests that still hold it get
+        SessionClosed (503, retry) instead of changing a copy nobody will read.
+        """
+        with session.lock:
+            if session.closed:
+                return False
+            payload = json.dumps(session.to_state()).encode()
+            header = {"kind": "handoff", "classroom_id": session.classroom_id, "keyed": session.keyring is not None}
+            try:
+                with self._connect(member) as sock:
+                    _send(sock, header, payload)
+                    answer, _ = _recv(sock)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.forget(member)
+                return False
+            except OSError as e:
+                logger.error("Handoff of classroom %s to %s failed: %s", session.classroom_id, member, e)
+                return False
+            if not answer.get("ok"):
+                logger.error("%s refused the session of classroom %s", member, session.classroom_id)
+                return False
+            session.close(f"handed off to {member}")
+        logger.info("Session for classroom %s handed off to %s", session.classroom_id, member)
+        return True
+
+    def receive_session(self, classroom_id, payload, keyed=True):
+        """Install a handed-off session. Returns False when this worker already holds one for the classroom."""
+        from .signatures import KeyRing
+        from .warmup import cached_roster
+        if classroom_id in self.sessions:
+            return False
+        try:
+            session = SessionObject.from_state(json.loads(payload))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error("Malformed handoff of classroom %s: %s", classroom_id, e)
+            return False
+        if session.classroom_id != classroom_id:
+            return False
+        if keyed:
+            session.keyring = KeyRing.from_parsed(session, cached_roster(classroom_id).verifiers)
+        with self._lock:
+            if classroom_id in self.sessions:
+                return False
+            self.sessions[classroom_id] = session
+        return True
+
+    def leave(self):
+        """Leave the ring (worker shutdown): stop accepting, then hand off every local session."""
+        if not self.active:
+            return
+        self._stop.set()
+        self._wake.set()
+        try:
+            os.unlink(self.socket_path(self.name))
+        except FileNotFoundError:
+            pass
+        self.rebalance(exclude_self=True)
+        self._server.shutdown()
+        self._server.server_close()
+        self.name = None
+        self.ring = None
+
+
+router = Router()
+
+
+def start_router():
+    router.start()
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+def unavailable(error):
+    return JsonResponse({"error": str(error)}, status=error.status, headers={"Retry-After": "1"})
+
+
+class ClassroomRoutingMiddleware:
+    """Forward classroom session requests to the worker owning the classroom."""
+    def __init__(self, get_response):
+        if session_setting("ROUTING") is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.META.pop(LEGACY_ROUTED_HEADER, None)
+        classroom_id = routed_classroom(request.path_info)
+        if classroom_id is None or request.META.get(ROUTED_KEY):
+            return self.get_response(request)
+        while True:
+            owner = router.route(classroom_id)
+            if owner is None:
+                return self.get_response(request)
+            try:
+                return router.forward(owner, request)
+            except OwnerLeft:
+                continue    # The ring changed: route on the new one
+            except OwnerUnavailable as e:
+                logger.warning("Classroom %s: %s", classroom_id, e)
+                return unavailable(e)
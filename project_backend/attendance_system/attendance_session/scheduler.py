@@ -0,0 +1,199 @@
+# attendance_session/scheduler.py
+"""
+Timetable-driven session pre-creation.
+
+A few minutes before each TimetableSlot starts (PRECREATE['LEAD']), the
+scheduler builds the classroom's SessionObject in a dormant state: roster,
+device keys, usernames and detector are all in place, but nobody can pass
+tokens yet. StartSessionView then only activates it (check the roster is still
+current, attach the AttendanceSession row, start the clock) instead of doing
+the roster work at the busiest moment of the day.
+
+Dormant sessions that nobody activates are dropped PRECREATE['GRACE'] minutes
+after their slot started; a late start simply builds the session as before.
+Their nodes count toward MAX_NODES: a sweep only builds what fits, and the
+SessionManager sheds dormant sessions before it evicts a live one.
+
+Only the worker owning a classroom builds its session (ROUTING). Without
+routing any worker may get the start request, so nothing is pre-built unless
+PRECREATE['WITHOUT_ROUTING'] says this is a single-process server.
+The sweep runs on a daemon thread started by warmup.warm_worker().
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from user.models import TimetableSlot
+from .anomaly import PassAnalyzer
+from .engine import SessionObject
+from .routing import router
+from .session_manager import session_setting
+from .signatures import KeyRing
+from .warmup import load_rosters, roster_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "LEAD": 10,         # Minutes before a slot starts that its session is built
+    "GRACE": 20,        # Minutes after the slot start an unused dormant session is kept
+    "INTERVAL": 60,     # Seconds between scheduler sweeps
+    "WITHOUT_ROUTING": False,   # Pre-create with ROUTING off (only correct with a single worker process)
+}
+
+
+def precreate_setting(name):
+    return (session_setting("PRECREATE") or {}).get(name, DEFAULTS[name])
+
+
+def build_session(classroom_id, teacher_uid, roster):
+    """SessionObject with keys, usernames and proxy detector attached; not yet tied to a lecture row."""
+    session = SessionObject(classroom_id, teacher_uid, roster.uids, capture=bool(session_setting("TRACE_DIR")))
+    session.keyring = KeyRing.from_parsed(session, roster.verifiers)
+    session.usernames = roster.usernames
+    if session_setting("ANOMALY") is not None:
+        session.analyzer = PassAnalyzer(len(session), session.teacher_index, session_setting("ANOMALY"))
+    return session
+
+
+class DormantSessions:
+    """Pre-built sessions by classroom id, waiting for the teacher to start them."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # classroom_id -> (session, roster fingerprint, drop after)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, classroom_id):
+        return classroom_id in self._entries
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def total_nodes(self):
+        with self._lock:
+            return sum(session.budget_size() for session, _, _ in self._entries.values())
+
+    def shed(self, nodes):
+        """Drop dormant sessions, latest slot first, until `nodes` are freed. Returns the nodes freed."""
+        freed = 0
+        with self._lock:
+            by_start = sorted(self._entries.items(), key=lambda item: item[1][2], reverse=True)
+            for classroom_id, (session, _, _) in by_start:
+                if freed >= nodes:
+                    break
+                del self._entries[classroom_id]
+                freed += session.budget_size()
+                logger.info("Dormant session for classroom %s dropped (memory budget)", classroom_id)
+        return freed
+
+    def add(self, session, fingerprint, drop_after):
+        with self._lock:
+            self._entries[session.classroom_id] = (session, fingerprint, drop_after)
+
+    def activate(self, classroom_id, teacher_uid):
+        """
+        Take the dormant session of a classroom, or None when there is none or it no longer
+        matches (another teacher, enrollments changed since it was built).
+        """
+        with self._lock:
+            entry = self._entries.pop(classroom_id, None)
+        if entry is None:
+            return None
+        session, fingerprint, _ = entry
+        if session.teacher_uid != teacher_uid or roster_fingerprint(classroom_id) != fingerprint:
+            logger.debug("Dormant session for classroom %s is outdated, rebuilding", classroom_id)
+            return None
+        return session
+
+    def expire(self, now=None):
+        """Drop dormant sessions whose slot started more than GRACE minutes ago. Returns the dropped ids."""
+        now = now or timezone.now()
+        with self._lock:
+            stale = [cid for cid, (_, _, drop_after) in self._entries.items() if drop_after <= now]
+            for classroom_id in stale:
+                del self._entries[classroom_id]
+        for classroom_id in stale:
+            logger.debug("Dormant session for classroom %s was never started, dropped", classroom_id)
+        return stale
+
+    def prepare(self, now=None, active=(), room=None):
+        """
+        Build dormant sessions for slots starting within LEAD minutes, for classrooms this
+        worker owns and while they fit in `room` nodes (None = no limit), soonest slot
+        first. Returns the new classroom ids.
+        """
+        if not router.active and not precreate_setting("WITHOUT_ROUTING"):
+            return []
+        now = timezone.localtime(now or timezone.now())
+        lead_end = now + timedelta(minutes=precreate_setting("LEAD"))
+        if lead_end.date() != now.date():
+            lead_end = now.replace(hour=23, minute=59, second=59)   # Slots after midnight: next day's sweeps
+
+        slots = {}
+        for classroom_id, teacher_uid, start_time in TimetableSlot.objects.filter(
+            weekday=now.weekday(), start_time__gte=now.time(), start_time__lte=lead_end.time()
+        ).values_list('classroom_id', 'classroom__teacher__uid', 'start_time'):
+            if classroom_id not in active and classroom_id not in self._entries and router.owns(classroom_id):
+                slots.setdefault(classroom_id, (teacher_uid, start_time))
+        if not slots:
+            return []
+
+        grace = timedelta(minutes=precreate_setting("GRACE"))
+        built = []
+        for roster in sorted(load_rosters(list(slots)), key=lambda roster: slots[roster.classroom_id][1]):
+            size = len(roster.uids) + 1     # With the teacher node
+            if room is not None:
+                if size > room:
+                    continue
+                room -= size
+            teacher_uid, start_time = slots[roster.classroom_id]
+            starts = timezone.make_aware(datetime.combine(now.date(), start_time), now.tzinfo)
+            self.add(build_session(roster.classroom_id, teacher_uid, roster), roster.fingerprint, starts + grace)
+            built.append(roster.classroom_id)
+        if len(built) < len(slots):
+            logger.info("Pre-created %d of %d dormant sessions (memory budget)", len(built), len(slots))
+        else:
+            logger.info("Pre-created %d dormant sessions", len(built))
+        return built
+
+    def sweep(self, now=None):
+        from .views import sessions  # views imports this module
+        self.expire(now)
+        room = session_setting("MAX_NODES") - sessions.total_nodes() - self.total_nodes()
+        return self.prepare(now, active=set(sessions.keys()), room=room)
+
+    # ---------------------------
+    # Background thread
+    # ---------------------------
+    def start(self):
+        """Start the sweep thread (once per process)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="session-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Session scheduler sweep failed")
+            finally:
+                connections.close_all()  # DB connections are per-thread
+            if self._stop.wait(precreate_setting("INTERVAL")):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+
+dormant_sessions = DormantSessions()
@@ -0,0 +1,246 @@
+# attendance_session/session_manager.py
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Default limits (override with settings.ATTENDANCE_SESSIONS)
+# ---------------------------
+DEFAULTS = {
+    "SHARDS": 16,               # Number of independently locked shards
+    "TTL": 3 * 60 * 60,         # Seconds a session may stay idle before auto-finalize
+    "MAX_NODES": 200_000,       # Memory budget: nodes plus remembered passes across all sessions
+    "REAP_INTERVAL": 30,        # Seconds between background expiry sweeps
+    "TRACE_DIR": None,          # Directory for token-graph traces (None disables capture)
+    "TRACE_KEEP": 1000,         # Trace files kept in TRACE_DIR; older ones are deleted
+    "STORAGE": "rows",          # Finalized attendance layout: "rows", "bitmap" or "both"
+    "ASYNC_FINALIZE": False,    # Queue persistence to FinalizeJob instead of writing in the request
+    "FINALIZE_MAX_ATTEMPTS": 5, # Retries before a FinalizeJob is marked FAILED
+    "FINALIZE_LEASE": 300,      # Seconds before a RUNNING job from a dead worker is reclaimed
+    "FINALIZE_BATCH_WINDOW": 0, # Seconds the worker collects finalizations before one batched write
+    "REQUIRE_SIGNATURES": False,# Verify passes even in classrooms where no student registered a device key
+    "VERIFY_THREADS": 4,        # Threads verifying large batches of signed passes
+    "THROTTLE": {               # Token buckets per user and classroom (see throttling.py)
+        "pass_token": {"RATE": 10, "BURST": 50},
+        "exception": {"RATE": 1, "BURST": 10},
+        "batch": {"RATE": 0.2, "BURST": 5},
+    },
+    "THROTTLE_CACHE": None,     # Cache alias sharing buckets between workers (None = per process)
+    "LATE_AFTER": None,         # Seconds after session start before joining counts as LATE (None = never)
+    "ANOMALY": {},              # Proxy detector limits (see anomaly.DEFAULTS); None disables it
+    "WARMUP": {},               # Roster preloading at worker start (see warmup.DEFAULTS)
+    "PRECREATE": {},            # Dormant sessions built before timetabled classes (see scheduler.DEFAULTS); None = off
+    "ROUTING": None,            # Route classrooms to owner workers over Unix sockets (see routing.DEFAULTS)
+    "MEMORY": {},               # tracemalloc and periodic memory snapshots (see diagnostics.DEFAULTS)
+    "DEBUG_DUMP": False,        # Print every node's root after each pass (O(N) per request)
+}
+
+
+def session_setting(name):
+    """Read one ATTENDANCE_SESSIONS setting, falling back to DEFAULTS."""
+    value = getattr(settings, "ATTENDANCE_SESSIONS", {}).get(name, DEFAULTS.get(name))
+    if hasattr(value, "total_seconds"):  # allow timedelta values
+        value = value.total_seconds()
+    return value
+
+
+class _Shard:
+    """One lock-protected slice of the session table."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}      # classroom_id -> SessionObject
+        self.last_seen = {}     # classroom_id -> monotonic time of last access
+
+
+class SessionManager:
+    """
+    Holds active SessionObjects sharded by classroom id.
+
+    - Each shard has its own lock so unrelated classrooms never contend.
+    - Sessions idle longer than TTL are handed to `on_expire` (auto-finalize).
+    - When the total size (nodes plus remembered passes, see
+      SessionObject.budget_size) exceeds MAX_NODES the least recently used
+      sessions are expired first until the process is back under budget.
+    - Expiry runs on a daemon thread started with the first session. Adding
+      a session only wakes it, so the request that started the session never
+      runs another classroom's auto-finalize.
+    - Nodes held by `spare` (the dormant sessions of scheduler.py) count toward
+      MAX_NODES; they are shed before any live session is evicted.
+
+    Supports the dict operations the views already use
+    (`get`, `in`, `[]`, `del`, `keys`).
+    """
+    def __init__(self, on_expire=None, shards=None, spare=None):
+        self.on_expire = on_expire
+        self.spare = spare      # Anything with total_nodes() and shed(nodes) -> nodes freed
+        self._shards = [_Shard() for _ in range(shards or session_setting("SHARDS"))]
+        self._reaper = None
+        self._reaper_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _shard(self, classroom_id):
+        return self._shards[hash(classroom_id) % len(self._shards)]
+
+    # ---------------------------
+    # Dict-style access
+    # ---------------------------
+    def get(self, classroom_id, default=None):
+        shard = self._shard(classroom_id)
+        with shard.lock:
+            session = shard.sessions.get(classroom_id)
+            if session is None:
+                return default
+            shard.last_seen[classroom_id] = time.monotonic()
+            return session
+
+    def __contains__(self, classroom_id):
+        shard = self._shard(classroom_id)
+        with shard.lock:
+            return classroom_id in shard.sessions
+
+    def __getitem__(self, classroom_id):
+        session = self.get(classroom_id)
+        if session is None:
+            raise KeyError(classroom_id)
+        return session
+
+    def __setitem__(self, classroom_id, session):
+        shard = self._shard(classroom_id)
+        with shard.lock:
+            shard.sessions[classroom_id] = session
+            shard.last_seen[classroom_id] = time.monotonic()
+        self._ensure_reaper()
+        self._wake.set()     # The reaper checks the memory budget
+
+    def __delitem__(self, classroom_id):
+        if self.pop(classroom_id) is None:
+            raise KeyError(classroom_id)
+
+    def __len__(self):
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def pop(self, classroom_id, default=None):
+        shard = self._shard(classroom_id)
+        with shard.lock:
+            shard.last_seen.pop(classroom_id, None)
+            return shard.sessions.pop(classroom_id, default)
+
+    def keys(self):
+        keys = []
+        for shard in self._shards:
+            with shard.lock:
+                keys.extend(shard.sessions.keys())
+        return keys
+
+    def items(self):
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend(shard.sessions.items())
+        return items
+
+    # ---------------------------
+    # Expiry & memory budget
+    # ---------------------------
+    def idle_seconds(self, classroom_id):
+        """Seconds since the session was last accessed (None if not active)."""
+        shard = self._shard(classroom_id)
+        with shard.lock:
+            last_seen = shard.last_seen.get(classroom_id)
+        return None if last_seen is None else time.monotonic() - last_seen
+
+    def total_nodes(self):
+        return sum(session.budget_size() for _, session in self.items())
+
+    def _expire(self, classroom_id, reason):
+        """Remove a session and pass it to the expiry callback."""
+        session = self.pop(classroom_id)
+        if session is None:
+            return  # Finalized by the teacher in the meantime
+        logger.info("Session for classroom %s expired (%s)", classroom_id, reason)
+        if self.on_expire:
+            try:
+                self.on_expire(session, reason)
+            except Exception:
+                logger.exception("Auto-finalize failed for classroom %s", classroom_id)
+
+    def expire_stale(self):
+        """Expire every session idle longer than the TTL. Returns the expired ids."""
+        ttl = session_setting("TTL")
+        now = time.monotonic()
+        stale = []
+        for shard in self._shards:
+            with shard.lock:
+                stale.extend(cid for cid, seen in shard.last_seen.items() if now - seen > ttl)
+        for classroom_id in stale:
+            self._expire(classroom_id, "ttl")
+        return stale
+
+    def enforce_budget(self):
+        """Expire least recently used sessions until under MAX_NODES. Returns the expired ids."""
+        budget = session_setting("MAX_NODES")
+        spare = self.spare.total_nodes() if self.spare is not None else 0
+        over = self.total_nodes() + spare - budget
+        if over <= 0:
+            return []
+        if spare:
+            spare -= self.spare.shed(over)
+        by_age = []
+        for shard in self._shards:
+            with shard.lock:
+                by_age.extend(
+                    (shard.last_seen[cid], cid, session.budget_size())
+                    for cid, session in shard.sessions.items()
+                )
+        by_age.sort()
+
+        total = sum(size for _, _, size in by_age) + spare
+        evicted = []
+        # Never evict the newest session, it is the one that was just started
+        for _, classroom_id, size in by_age[:-1]:
+            if total <= budget:
+                break
+            self._expire(classroom_id, "memory budget")
+            total -= size
+            evicted.append(classroom_id)
+        return evicted
+
+    # ---------------------------
+    # Background scheduler
+    # ---------------------------
+    def _ensure_reaper(self):
+        """Start the expiry thread lazily so imports and migrations never spawn it."""
+        if self._reaper and self._reaper.is_alive():
+            return
+        with self._reaper_lock:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._run_reaper, name="session-reaper", daemon=True)
+            self._reaper.start()
+
+    def _run_reaper(self):
+        """TTL and budget sweeps every REAP_INTERVAL, and whenever a session is added."""
+        while True:
+            self._wake.wait(session_setting("REAP_INTERVAL"))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.expire_stale()
+                self.enforce_budget()
+            except Exception:
+                logger.exception("Session reaper sweep failed")
+            finally:
+                connections.close_all()  # DB connections are per-thread
+
+    def stop(self):
+        """Stop the background expiry thread (used on shutdown)."""
+        self._stop.set()
+        self._wake.set()
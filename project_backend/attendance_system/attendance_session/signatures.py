@@ -0,0 +1,200 @@
+# attendance_session/signatures.py
+"""
+Device signatures on token passes.
+
+The app registers an Ed25519 public key per student (`Student.auth_key`, base64
+of the 32 raw bytes; PEM is accepted too). A pass A -> B is signed by the
+receiver's device over
+
+    b"ATP1" + uint32 epoch + uint32 from_index + uint32 to_index   (little-endian)
+
+so a signature is bound to one pass of one session and cannot be replayed.
+
+Once any student of a classroom has registered a key, every pass to a student
+must carry the receiver's signature: a receiver without a key cannot vouch for
+the handover and is refused. With REQUIRE_SIGNATURES this holds for classrooms
+without keys too. Teachers register no device key, so a pass to the teacher is
+accepted unsigned only when the teacher running the session posts it; anyone
+else needs the sender's signature over the same message.
+
+Keys are parsed once per session at start (KeyRing); batches of passes are
+verified on a small thread pool. Verification uses `cryptography` (OpenSSL)
+when installed and falls back to pycryptodome. The backend is imported on first
+use (backend()), not when the URLconf loads: it is the heaviest import of the app.
+"""
+import base64
+import binascii
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .session_manager import session_setting
+
+BACKEND = None      # Set by backend()
+_resolved = False
+
+MESSAGE = struct.Struct("<4sIII")
+MAGIC = b"ATP1"
+PARALLEL_MIN = 64   # Smaller batches are verified inline; the thread hand-off costs more than it saves
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def backend():
+    """Name of the verification backend ("cryptography" / "pycryptodome"), or None if neither is installed."""
+    global BACKEND, _resolved, InvalidSignature, Ed25519PublicKey, load_pem_public_key, ECC, eddsa
+    if not _resolved:
+        try:
+            from cryptography.exceptions import InvalidSignature
+            from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+            from cryptography.hazmat.primitives.serialization import load_pem_public_key
+            BACKEND = "cryptography"
+        except ImportError:  # pragma: no cover - optional dependency
+            try:
+                from Crypto.PublicKey import ECC
+                from Crypto.Signature import eddsa
+                BACKEND = "pycryptodome"
+            except ImportError:
+                BACKEND = None
+        _resolved = True
+    return BACKEND
+
+
+def pass_message(epoch, from_index, to_index):
+    return MESSAGE.pack(MAGIC, epoch, from_index, to_index)
+
+
+def decode_signature(value):
+    """base64 signature from the request body -> bytes, or None when malformed."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+# ---------------------------
+# Key parsing
+# ---------------------------
+def load_public_key(auth_key):
+    """
+    Parse a stored auth_key into a verify(message, signature) -> bool callable.
+    Returns None for empty or unusable keys (or when no crypto backend is installed).
+    """
+    if not auth_key or backend() is None:
+        return None
+    auth_key = auth_key.strip()
+    try:
+        if BACKEND == "cryptography":
+            if auth_key.startswith("-----BEGIN"):
+                key = load_pem_public_key(auth_key.encode())
+                if not isinstance(key, Ed25519PublicKey):
+                    return None
+            else:
+                key = Ed25519PublicKey.from_public_bytes(base64.b64decode(auth_key, validate=True))
+
+            def verify(message, signature):
+                try:
+                    key.verify(signature, message)
+                    return True
+                except InvalidSignature:
+                    return False
+            return verify
+
+        if auth_key.startswith("-----BEGIN"):
+            key = ECC.import_key(auth_key)
+        else:
+            key = eddsa.import_public_key(base64.b64decode(auth_key, validate=True))
+        verifier = eddsa.new(key, "rfc8032")
+
+        def verify(message, signature):
+            try:
+                verifier.verify(message, signature)
+                return True
+            except ValueError:
+                return False
+        return verify
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def parse_keys(auth_keys):
+    """{uid: auth_key} -> {uid: verify callable or None}."""
+    return {uid: load_public_key(auth_key) for uid, auth_key in auth_keys.items()}
+
+
+class KeyRing:
+    """Parsed device keys of one session, by session index (None = no usable key)."""
+    def __init__(self, verifiers, teacher_index=None):
+        self.verifiers = verifiers
+        self.teacher_index = teacher_index
+        # Signatures are checked on every pass once the classroom has a key
+        self.enforced = bool(session_setting("REQUIRE_SIGNATURES")) or any(v is not None for v in verifiers)
+
+    @classmethod
+    def for_session(cls, session, auth_keys):
+        """`auth_keys` is {uid: auth_key}; each key is parsed once for the whole session."""
+        return cls.from_parsed(session, parse_keys(auth_keys))
+
+    @classmethod
+    def from_parsed(cls, session, parsed):
+        """`parsed` is {uid: verifier} from parse_keys (e.g. a warmed roster)."""
+        verifiers = [None] * len(session.uids)
+        for uid, verify in parsed.items():
+            i = session.index.get(uid)
+            if i is not None:
+                verifiers[i] = verify
+        return cls(verifiers, session.teacher_index)
+
+    def has_key(self, i):
+        return self.verifiers[i] is not None
+
+    def verify_pass(self, epoch, from_index, to_index, signature, by_teacher=False):
+        """
+        True if the receiver's device signed this pass, or signatures are not enforced.
+        A receiver without a key is refused once they are. A pass to the teacher is
+        signed by the sender unless the teacher posted it (`by_teacher`).
+        """
+        if not self.enforced:
+            return True
+        if to_index == self.teacher_index:
+            if by_teacher:
+                return True
+            signer = from_index
+        else:
+            signer = to_index
+        verify = self.verifiers[signer]
+        if verify is None or signature is None:
+            return False
+        return verify(pass_message(epoch, from_index, to_index), signature)
+
+    def verify_batch(self, epoch, pairs, signatures, by_teacher=False):
+        """
+        Verify a flat [from0, to0, from1, to1, ...] batch against one signature per pair
+        (`by_teacher` as in verify_pass).
+        Returns a list of booleans; large batches are split across the verify pool.
+        """
+        count = len(pairs) // 2
+        jobs = [(pairs[2 * k], pairs[2 * k + 1], signatures[k] if k < len(signatures) else None) for k in range(count)]
+
+        def check(chunk):
+            return [self.verify_pass(epoch, a, b, sig, by_teacher) for a, b, sig in chunk]
+
+        if count < PARALLEL_MIN:
+            return check(jobs)
+        pool = get_verify_pool()
+        size = max(PARALLEL_MIN, -(-count // pool._max_workers))
+        results = []
+        for part in pool.map(check, [jobs[k:k + size] for k in range(0, count, size)]):
+            results.extend(part)
+        return results
+
+
+def get_verify_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=session_setting("VERIFY_THREADS"), thread_name_prefix="verify")
+        return _pool
@@ -0,0 +1,183 @@
+# attendance_session/storage.py
+"""
+Writing and reading finalized attendance.
+
+ATTENDANCE_SESSIONS['STORAGE'] selects the layout:
+    "rows"   - one AttendanceRecord per student per lecture (original layout)
+    "bitmap" - one packed status vector per AttendanceSession (see bitmap.py)
+    "both"   - write both, read rows
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from user.models import AttendanceRecord, Student
+from user.sync import next_change_seq, record_deletions
+from .bitmap import (
+    pack_ids, pack_statuses, position, roster_digest, set_status, status_at, unpack_ids, unpack_statuses,
+)
+from .models import AttendanceSession, ClassroomRoster
+from .session_manager import session_setting
+
+
+def storage_mode():
+    return session_setting("STORAGE")
+
+
+def writes_rows():
+    return storage_mode() in ("rows", "both")
+
+
+def writes_bitmap():
+    return storage_mode() in ("bitmap", "both")
+
+
+# ---------------------------
+# Write
+# ---------------------------
+def get_roster(classroom_id, student_ids):
+    """Return the roster version matching these students, creating a new version if needed."""
+    packed = pack_ids(student_ids)
+    digest = roster_digest(packed)
+    roster = ClassroomRoster.objects.filter(classroom_id=classroom_id, digest=digest).first()
+    if roster:
+        return roster
+    last = (
+        ClassroomRoster.objects.filter(classroom_id=classroom_id)
+        .order_by('-version').values_list('version', flat=True).first()
+    )
+    return ClassroomRoster.objects.create(
+        classroom_id=classroom_id,
+        version=(last or 0) + 1,
+        student_ids=packed,
+        size=len(student_ids),
+        digest=digest,
+    )
+
+
+def save_attendance(classroom, statuses, session_id=None):
+    """
+    Persist {uid: status} for one lecture and close its AttendanceSession row.
+    Re-finalizing a session replaces its records.
+    """
+    save_attendance_batch([(classroom.id, session_id, statuses)])
+
+
+@transaction.atomic
+def save_attendance_batch(items):
+    """
+    Persist several lectures in one transaction.
+    `items` are (classroom_id, session_id, {uid: status}); the whole batch costs one
+    student lookup, one delete, one bulk_create and one bulk_update.
+    """
+    now = timezone.now()
+    today = now.date()
+    all_uids = {uid for _, _, statuses in items for uid in statuses}
+    student_ids = dict(Student.objects.filter(uid__in=all_uids).values_list('uid', 'id'))
+
+    rows = [item for item in items if writes_rows() or item[1] is None]
+    replaced = [session_id for _, session_id, _ in rows if session_id is not None]
+    if replaced:
+        old = AttendanceRecord.objects.filter(session_id__in=replaced)
+        record_deletions("attendance", old.values_list('student_id', 'id'))
+        old.delete()
+    change_seq = next_change_seq() if rows else 0  # bulk_create skips the pre_save stamp
+    AttendanceRecord.objects.bulk_create(
+        [
+            AttendanceRecord(
+                student_id=student_ids[uid],
+                classroom_id=classroom_id,
+                session_id=session_id,
+                date=today,
+                status=status,
+                change_seq=change_seq,
+            )
+            for classroom_id, session_id, statuses in rows
+            for uid, status in statuses.items()
+            if uid in student_ids  # Skip students deleted during the session
+        ],
+        batch_size=1000,
+    )
+
+    lectures = []
+    for classroom_id, session_id, statuses in items:
+        if session_id is None:
+            continue
+        present = sum(1 for status in statuses.values() if status in ("PRESENT", "LATE"))
+        lecture = AttendanceSession(
+            id=session_id,
+            finalized_at=now,
+            total_students=len(statuses),
+            present_count=present,
+            absent_count=len(statuses) - present,
+        )
+        if writes_bitmap():
+            ids = {student_ids[uid]: status for uid, status in statuses.items() if uid in student_ids}
+            lecture.roster = get_roster(classroom_id, list(ids))
+            lecture.status_vector = pack_statuses(
+                ids.get(pk, "ABSENT") for pk in unpack_ids(lecture.roster.student_ids)
+            )
+        lectures.append(lecture)
+
+    fields = ["finalized_at", "total_students", "present_count", "absent_count"]
+    if writes_bitmap():
+        fields += ["roster", "status_vector"]
+    if lectures:
+        AttendanceSession.objects.bulk_update(lectures, fields)
+
+
+def rewrite_bitmap_window(student, start_dt, end_dt, status):
+    """Set `status` for a student in every packed lecture started between start_dt and end_dt."""
+    lectures = AttendanceSession.objects.filter(
+        classroom__enrollments__student=student,
+        started_at__gte=start_dt,
+        started_at__lte=end_dt,
+        status_vector__isnull=False,
+    ).select_related('roster')
+    for lecture in lectures:
+        i = position(unpack_ids(lecture.roster.student_ids), student.id)
+        if i is not None:
+            lecture.status_vector = set_status(lecture.status_vector, i, status)
+            lecture.save(update_fields=['status_vector'])
+
+
+# ---------------------------
+# Read (compatibility with the AttendanceRecord API)
+# ---------------------------
+def session_statuses(lecture):
+    """[(student_id, status)] of a packed lecture, in roster order."""
+    ids = unpack_ids(lecture.roster.student_ids)
+    return list(zip(ids, unpack_statuses(lecture.status_vector, len(ids))))
+
+
+def records_for_student(student, classroom_id=None):
+    """
+    Unsaved AttendanceRecord objects decoded from packed lectures that have no rows
+    for this student, so they serialize exactly like stored records.
+    """
+    lectures = AttendanceSession.objects.filter(
+        classroom__enrollments__student=student,
+        status_vector__isnull=False,
+    ).exclude(
+        id__in=AttendanceRecord.objects.filter(student=student, session__isnull=False).values('session_id')
+    ).select_related('roster')
+    if classroom_id:
+        lectures = lectures.filter(classroom_id=classroom_id)
+
+    rosters = {}
+    records = []
+    for lecture in lectures:
+        ids = rosters.get(lecture.roster_id)
+        if ids is None:
+            ids = rosters[lecture.roster_id] = unpack_ids(lecture.roster.student_ids)
+        i = position(ids, student.id)
+        if i is None:
+            continue  # Enrolled after this lecture
+        records.append(AttendanceRecord(
+            student_id=student.id,
+            classroom_id=lecture.classroom_id,
+            session_id=lecture.id,
+            date=timezone.localdate(lecture.started_at),
+            status=status_at(lecture.status_vector, i),
+            timestamp=lecture.finalized_at,
+        ))
+    return records
@@ -0,0 +1,76 @@
+# attendance_session/tests/test_anomaly.py
+"""PassAnalyzer limits, and how batched passes reach it."""
+from django.test import SimpleTestCase
+
+from ..anomaly import PassAnalyzer
+from ..engine import SessionObject
+
+TEACHER = "T0001"
+STUDENTS = [f"S{i:05d}" for i in range(30)]
+
+
+class PassAnalyzerTests(SimpleTestCase):
+    def setUp(self):
+        self.analyzer = PassAnalyzer(len(STUDENTS) + 1, len(STUDENTS))
+
+    def test_spaced_passes_are_not_flagged(self):
+        for k in range(10):
+            self.analyzer.observe(0, k * 5.0)
+        self.assertEqual(self.analyzer.flags, {})
+        self.assertAlmostEqual(self.analyzer.mean_gap[0], 5.0)
+
+    def test_rapid_and_burst(self):
+        for k in range(6):
+            self.analyzer.observe(0, k * 0.5)
+        self.assertEqual(self.analyzer.flags[0], ["rapid", "burst"])
+        self.assertEqual(self.analyzer.max_burst[0], 6)
+
+    def test_fan_out(self):
+        for k in range(13):
+            self.analyzer.observe(0, k * 30.0)
+        self.assertEqual(self.analyzer.flags[0], ["fan_out"])
+
+    def test_one_large_send_is_fan_out_only(self):
+        self.analyzer.observe(0, 1.0, passes=20)
+        self.assertEqual(self.analyzer.flags[0], ["fan_out"])
+        self.assertEqual(self.analyzer.out_degree[0], 20)
+        self.assertEqual(self.analyzer.max_burst[0], 1)
+
+    def test_teacher_is_never_flagged(self):
+        for k in range(20):
+            self.analyzer.observe(len(STUDENTS), k * 0.1)
+        self.assertEqual(self.analyzer.flags, {})
+
+    def test_report(self):
+        self.analyzer.observe(3, 0.0, passes=13)
+        self.assertEqual(self.analyzer.report(STUDENTS), [{
+            "uid": STUDENTS[3], "reasons": ["fan_out"], "out_degree": 13, "max_burst": 1, "mean_gap": 0.0,
+        }])
+
+
+class BatchedPassTests(SimpleTestCase):
+    def setUp(self):
+        self.session = SessionObject(1, TEACHER, STUDENTS)
+        self.session.analyzer = PassAnalyzer(len(self.session), self.session.teacher_index)
+
+    def test_offline_batch_is_one_send(self):
+        """A phone uploading the handovers it queued while offline is not a burst."""
+        pairs = []
+        for sender in range(5):
+            pairs += [sender, sender + 1, sender, sender + 10]
+        self.session.pass_indices(self.session.epoch, pairs)
+        self.assertEqual(self.session.flagged(), [])
+        analyzer = self.session.analyzer
+        self.assertEqual(list(analyzer.out_degree[:5]), [2] * 5)
+        self.assertEqual(list(analyzer.sends[:5]), [1] * 5)
+
+    def test_duplicates_in_batch_are_not_counted(self):
+        self.session.pass_indices(self.session.epoch, [0, 1, 0, 1, 0, 2])
+        self.assertEqual(self.session.analyzer.out_degree[0], 2)
+
+    def test_batch_still_counts_toward_fan_out(self):
+        pairs = []
+        for receiver in range(1, 15):
+            pairs += [0, receiver]
+        self.session.pass_indices(self.session.epoch, pairs)
+        self.assertEqual([entry["reasons"] for entry in self.session.flagged()], [["fan_out"]])
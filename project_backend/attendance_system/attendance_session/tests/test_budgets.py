@@ -0,0 +1,231 @@
+# attendance_session/tests/test_budgets.py
+"""
+Query and latency budgets for the session endpoints (see user/tests/test_budgets.py).
+
+Live sessions are started through the API outside the measured request; half of
+the class is then connected to the teacher directly on the SessionObject so
+finalize has a realistic mix of PRESENT and ABSENT students to persist.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from user.enrollment_index import enrollment_index
+from user.models import AttendanceRecord
+from user.tests.test_budgets import FAST_HASHERS, QueryBudgetMixin, client_for, seed
+from .. import throttling
+from ..views import sessions
+from ..warmup import invalidate_roster
+
+# Trace files off; finalize writes synchronously unless a test turns ASYNC_FINALIZE back on
+TEST_SESSIONS = {**settings.ATTENDANCE_SESSIONS, "TRACE_DIR": None, "ASYNC_FINALIZE": False}
+
+
+class SessionEndpointBudgets(QueryBudgetMixin):
+    """Mixed into one TestCase per scale below."""
+    QUERY_BUDGETS = {
+        "start-session": 4,
+        "pass-token": 0,
+        "pass-token-pairs": 0,
+        "add-exception": 0,
+        "get-exception-list": 1,
+        "mark-present": 3,
+        "finalize-session": 12,
+        "finalize-session-async": 7,
+        "batch-finalize": 12,
+        "finalize-status": 3,
+        "finalize-status-queued": 2,
+        "classroom-session-history": 3,
+        "session-report": 3,
+        "classroom-attendance-export": 4,
+        "active-sessions": 1,
+        "memory-diagnostics": 0,
+        "classroom-session-status": 0,
+        "session-status": 0,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(cls.SCALE)
+        cls.classroom = cls.data.classrooms[0]
+
+    def setUp(self):
+        # In-memory state outlives the per-test transaction rollback
+        for classroom_id in sessions.keys():
+            sessions.pop(classroom_id, None)
+        invalidate_roster()
+        throttling._backends.clear()
+        enrollment_index.invalidate()
+        self.teacher_client = client_for(self.data.teacher.user)
+        self.student_client = client_for(self.data.students[0].user)
+
+    def tearDown(self):
+        for classroom_id in sessions.keys():
+            sessions.pop(classroom_id, None)
+
+    def start(self, classroom=None):
+        """Start a session and connect every other student to the teacher."""
+        classroom = classroom or self.classroom
+        response = self.teacher_client.post(reverse("start-session", args=[classroom.id]))
+        self.assertEqual(response.status_code, 200, response.data)
+        session = sessions.get(classroom.id)
+        for uid in session.uids[::2]:
+            if uid != session.teacher_uid:
+                session.mark_present(uid)
+        return session
+
+    def url(self, name, *args):
+        return reverse(name, args=args or [self.classroom.id])
+
+    # Live session
+    def test_start_session(self):
+        response = self.assertWithinBudget("start-session", lambda: self.teacher_client.post(self.url("start-session")))
+        self.assertEqual(len(response.data["uids"]), self.SCALE + 1)
+
+    def test_pass_token(self):
+        self.start()
+        first, second = self.data.students[0].uid, self.data.students[1].uid
+        self.assertWithinBudget("pass-token", lambda: self.student_client.post(
+            self.url("pass-token"), {"from_uid": first, "to_uid": second}, format="json"
+        ))
+        self.assertIn(self.classroom.id, sessions)     # Passing never ends the session
+
+    def test_pass_token_pairs(self):
+        session = self.start()
+        pairs = list(range(min(len(session), 41) // 2 * 2))     # 0 -> 1, 2 -> 3, ...
+        self.assertWithinBudget("pass-token-pairs", lambda: self.student_client.post(
+            self.url("pass-token"), {"epoch": session.epoch, "pairs": pairs}, format="json"
+        ))
+
+    def test_exceptions(self):
+        self.start()
+        self.assertWithinBudget("add-exception", lambda: self.student_client.post(
+            self.url("add-exception"), {"uid": self.data.students[1].uid}, format="json"
+        ))
+        response = self.assertWithinBudget("get-exception-list", lambda: self.teacher_client.get(
+            self.url("get-exception-list")
+        ))
+        self.assertWithinBudget("get-exception-list", lambda: self.teacher_client.get(
+            self.url("get-exception-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+        ))
+
+    def test_mark_present(self):
+        self.start()
+        uids = [student.uid for student in self.data.students[1::2]][:self.SCALE // 10 or 1]
+        self.assertWithinBudget("mark-present", lambda: self.teacher_client.post(
+            self.url("mark-present"), {"present_uids": uids}, format="json"
+        ))
+
+    # Finalize
+    def test_finalize(self):
+        session = self.start()
+        students = [uid for uid in session.uids if uid != session.teacher_uid]
+        joined = set(students[::2])     # Connected by start()
+        pending = {proposal.student.uid for proposal in self.data.proposals} - joined
+        absent = [uid for uid in students if uid not in joined and uid not in pending]
+        late, excused = absent[0], absent[-1]
+        session.add_exception(excused)
+        session.opened -= 600           # Ten minutes into the lecture
+        session.pass_token(late, session.teacher_uid)
+
+        with override_settings(ATTENDANCE_SESSIONS={**TEST_SESSIONS, "LATE_AFTER": 60}):
+            response = self.assertWithinBudget("finalize-session", lambda: self.teacher_client.post(
+                self.url("finalize-session"), {"present_uids": [excused]}, format="json"
+            ))
+        self.assertEqual(response.data["summary"]["total_students"], self.SCALE)
+        expected = {uid: "ABSENT" for uid in students}
+        expected.update({uid: "PRESENT" for uid in joined | {excused}})
+        expected.update({uid: "PENDING" for uid in pending})    # Absent under a pending absence proposal
+        expected[late] = "LATE"
+        self.assertEqual(dict(AttendanceRecord.objects.filter(session_id=session.session_id).values_list(
+            "student__uid", "status"
+        )), expected)
+        self.assertWithinBudget("finalize-status", lambda: self.teacher_client.get(
+            reverse("finalize-status", args=[session.session_id])
+        ))
+
+    def test_finalize_async(self):
+        session = self.start()
+        with override_settings(ATTENDANCE_SESSIONS={**TEST_SESSIONS, "ASYNC_FINALIZE": True}):
+            self.assertWithinBudget("finalize-session-async", lambda: self.teacher_client.post(
+                self.url("finalize-session"), {"present_uids": []}, format="json"
+            ))
+            again = self.teacher_client.post(self.url("finalize-session"), {"present_uids": []}, format="json")
+        self.assertEqual(again.status_code, 400)    # The first finalize took the session
+        response = self.assertWithinBudget("finalize-status-queued", lambda: self.teacher_client.get(
+            reverse("finalize-status", args=[session.session_id])
+        ))
+        self.assertEqual(response.data["status"], "QUEUED")
+
+    def test_batch_finalize(self):
+        classrooms = self.data.classrooms[:3]
+        for classroom in classrooms:
+            self.start(classroom)
+        response = self.assertWithinBudget("batch-finalize", lambda: self.teacher_client.post(
+            reverse("batch-finalize"),
+            {"classrooms": [{"classroom_id": classroom.id, "present_uids": []} for classroom in classrooms]},
+            format="json",
+        ))
+        self.assertEqual(response.data["finalized"], len(classrooms))
+
+    # Reports
+    def test_history(self):
+        response = self.assertWithinBudget("classroom-session-history", lambda: self.teacher_client.get(
+            self.url("classroom-session-history")
+        ))
+        self.assertEqual(len(response.data["sessions"]), len(self.data.lectures))
+
+    def test_session_report(self):
+        response = self.assertWithinBudget("session-report", lambda: self.teacher_client.get(
+            reverse("session-report", args=[self.data.lectures[0].id])
+        ))
+        self.assertEqual(len(response.data["records"]), self.SCALE)
+
+    def test_export(self):
+        self.assertWithinBudget("classroom-attendance-export", lambda: self.teacher_client.get(
+            self.url("classroom-attendance-export")
+        ))
+
+    # Monitoring & status
+    def test_active_sessions(self):
+        self.start()
+        response = self.assertWithinBudget("active-sessions", lambda: self.teacher_client.get(
+            reverse("active-sessions")
+        ))
+        self.assertEqual(response.data["active_sessions"], [self.classroom.id])
+
+    def test_memory_diagnostics(self):
+        self.start()
+        staff_client = client_for(User.objects.create(username="ops", is_staff=True))
+        response = self.assertWithinBudget("memory-diagnostics", lambda: staff_client.get(
+            reverse("memory-diagnostics")
+        ))
+        self.assertEqual(response.data["totals"]["nodes"], self.SCALE + 1)
+        self.assertEqual(self.teacher_client.get(reverse("memory-diagnostics")).status_code, 403)
+        for top in ("0", "-3", "x"):
+            self.assertEqual(staff_client.get(reverse("memory-diagnostics"), {"top": top}).status_code, 400)
+
+    def test_session_status(self):
+        self.start()
+        self.assertWithinBudget("classroom-session-status", lambda: self.student_client.get(
+            f"/session/student/classroom/{self.classroom.id}/session/"
+        ))
+        self.assertWithinBudget("session-status", lambda: self.student_client.get(
+            f"/session/session/status/{self.classroom.id}/"
+        ))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ATTENDANCE_SESSIONS=TEST_SESSIONS)
+class SessionEndpointBudgets10(SessionEndpointBudgets, TestCase):
+    SCALE = 10
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ATTENDANCE_SESSIONS=TEST_SESSIONS)
+class SessionEndpointBudgets100(SessionEndpointBudgets, TestCase):
+    SCALE = 100
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ATTENDANCE_SESSIONS=TEST_SESSIONS)
+class SessionEndpointBudgets1000(SessionEndpointBudgets, TestCase):
+    SCALE = 1000
@@ -0,0 +1,195 @@
+# attendance_session/tests/test_engine.py
+"""
+SessionObject / DisjointSet: who ends up PRESENT, LATE or ABSENT.
+
+Join times come from the session clock (seconds since start); tests move the
+clock by shifting `opened` instead of sleeping.
+"""
+from django.test import SimpleTestCase
+
+from ..engine import MAX_REQUEST_IDS, NOT_JOINED, DisjointSet, SessionObject
+
+TEACHER = "T0001"
+STUDENTS = [f"S{i:05d}" for i in range(8)]
+
+
+def make_session(capture=True):
+    return SessionObject(1, TEACHER, STUDENTS, capture=capture)
+
+
+def advance(session, seconds):
+    """Move the session clock forward by `seconds`."""
+    session.opened -= seconds
+
+
+class DisjointSetTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.forest = DisjointSet(list("abcdeT"), 5, clock=lambda: self.now)
+
+    def test_teacher_stays_root(self):
+        self.forest.union(0, 1)
+        self.forest.union(1, 5)
+        self.assertEqual(self.forest.find(0), 5)
+        self.assertEqual(self.forest.find(1), 5)
+
+    def test_union_of_same_group_is_not_a_merge(self):
+        self.assertTrue(self.forest.union(0, 1))
+        self.assertFalse(self.forest.union(1, 0))
+
+    def test_group_joining_teacher_is_stamped_at_once(self):
+        self.now = 5.0
+        self.forest.union(0, 1)
+        self.forest.union(2, 1)
+        self.forest.union(3, 4)
+        self.now = 42.0
+        self.forest.union(2, 5)
+        self.assertEqual(list(self.forest.joined_at[:3]), [42.0, 42.0, 42.0])
+        self.assertEqual(list(self.forest.joined_at[3:5]), [NOT_JOINED, NOT_JOINED])
+        self.assertEqual(self.forest.joined_at[5], 0.0)
+        self.assertEqual(list(self.forest.members), [self.forest.find(3)])     # Only the 3-4 group keeps a list
+
+    def test_join_time_is_never_restamped(self):
+        self.now = 10.0
+        self.forest.union(0, 5)
+        self.now = 20.0
+        self.forest.union(0, 1)
+        self.assertEqual(self.forest.joined_at[0], 10.0)
+        self.assertEqual(self.forest.joined_at[1], 20.0)
+
+
+class FinalizeStatusTests(SimpleTestCase):
+    def setUp(self):
+        self.session = make_session()
+
+    def test_present_late_absent(self):
+        s = self.session
+        s.pass_token(STUDENTS[0], TEACHER)
+        advance(s, 120)
+        s.pass_token(STUDENTS[1], STUDENTS[0])
+        statuses = s.finalize_statuses(late_after=60)
+        self.assertEqual(statuses[STUDENTS[0]], "PRESENT")
+        self.assertEqual(statuses[STUDENTS[1]], "LATE")
+        self.assertEqual({statuses[uid] for uid in STUDENTS[2:]}, {"ABSENT"})
+        self.assertNotIn(TEACHER, statuses)
+
+    def test_nobody_is_late_without_late_after(self):
+        s = self.session
+        advance(s, 3600)
+        s.pass_token(STUDENTS[0], TEACHER)
+        statuses = s.finalize_statuses()
+        self.assertEqual(statuses[STUDENTS[0]], "PRESENT")
+        self.assertEqual(statuses[STUDENTS[1]], "ABSENT")
+
+    def test_group_joining_late_is_late_together(self):
+        s = self.session
+        s.pass_token(STUDENTS[0], STUDENTS[1])
+        s.pass_token(STUDENTS[2], STUDENTS[1])
+        advance(s, 300)
+        s.pass_token(STUDENTS[1], TEACHER)
+        statuses = s.finalize_statuses(late_after=60)
+        self.assertEqual([statuses[uid] for uid in STUDENTS[:3]], ["LATE"] * 3)
+        self.assertEqual(statuses[STUDENTS[3]], "ABSENT")
+
+    def test_group_never_reaching_teacher_is_absent(self):
+        s = self.session
+        s.pass_token(STUDENTS[0], STUDENTS[1])
+        statuses = s.finalize_statuses(late_after=60)
+        self.assertEqual(statuses[STUDENTS[0]], "ABSENT")
+        self.assertEqual(statuses[STUDENTS[1]], "ABSENT")
+
+    def test_mark_present_counts_as_joined_at_start(self):
+        s = self.session
+        advance(s, 600)
+        s.mark_present(STUDENTS[0])
+        self.assertEqual(s.forest.joined_at[s.index[STUDENTS[0]]], 0.0)
+        self.assertEqual(s.finalize_statuses(late_after=0)[STUDENTS[0]], "PRESENT")
+
+    def test_mark_present_brings_group_along_on_time(self):
+        s = self.session
+        s.pass_token(STUDENTS[1], STUDENTS[0])
+        advance(s, 600)
+        s.mark_present(STUDENTS[0])
+        statuses = s.finalize_statuses(late_after=60)
+        self.assertEqual(statuses[STUDENTS[1]], "PRESENT")
+
+    def test_exception_students_marked_at_finalize(self):
+        s = self.session
+        s.add_exception(STUDENTS[4])
+        advance(s, 600)
+        statuses = s.finalize_statuses([STUDENTS[4], STUDENTS[5]], late_after=60)
+        self.assertEqual(statuses[STUDENTS[4]], "PRESENT")
+        self.assertEqual(statuses[STUDENTS[5]], "ABSENT")   # Not on the exception list
+
+    def test_matches_finalize_attendance(self):
+        s = self.session
+        s.pass_token(STUDENTS[0], TEACHER)
+        s.pass_token(STUDENTS[2], STUDENTS[3])
+        present = s.finalize_attendance()
+        statuses = s.finalize_statuses()
+        self.assertEqual({uid: status != "ABSENT" for uid, status in statuses.items()}, present)
+
+    def test_activate_restarts_clock(self):
+        s = self.session
+        advance(s, 600)
+        s.activate(session_id=7, started_at=None)
+        s.pass_token(STUDENTS[0], TEACHER)
+        self.assertLess(s.forest.joined_at[s.index[STUDENTS[0]]], 5)
+
+
+class RetryTests(SimpleTestCase):
+    """Dedup of repeated passes and request ids: retries never touch the union-find twice."""
+    def setUp(self):
+        self.session = make_session()
+
+    def test_repeated_pair_is_a_duplicate(self):
+        s = self.session
+        self.assertEqual(s.pass_token(STUDENTS[0], TEACHER), {"duplicate": False, "new_edge": True, "merged": True})
+        self.assertEqual(s.pass_token(STUDENTS[0], TEACHER), {"duplicate": True, "new_edge": False, "merged": False})
+        self.assertEqual(len(s.edges), 2)   # Recorded once in the trace stream
+        self.assertEqual(s.budget_size(), len(STUDENTS) + 2)
+
+    def test_no_edge_stream_without_capture(self):
+        s = make_session(capture=False)
+        s.pass_token(STUDENTS[0], TEACHER)
+        self.assertIsNone(s.edges)
+        self.assertEqual(s.finalize_statuses()[STUDENTS[0]], "PRESENT")
+
+    def test_reverse_direction_is_a_new_edge(self):
+        s = self.session
+        s.pass_token(STUDENTS[0], STUDENTS[1])
+        result = s.pass_token(STUDENTS[1], STUDENTS[0])
+        self.assertEqual(result, {"duplicate": False, "new_edge": True, "merged": False})
+
+    def test_request_id_replays_first_result(self):
+        s = self.session
+        first = s.pass_token(STUDENTS[0], TEACHER, request_id="r1")
+        again = s.pass_token(STUDENTS[2], TEACHER, request_id="r1")     # Same id, whatever the body
+        self.assertEqual(again, dict(first, duplicate=True))
+        self.assertEqual(s.finalize_statuses()[STUDENTS[2]], "ABSENT")
+
+    def test_batch_counts_and_replay(self):
+        s = self.session
+        teacher = s.teacher_index
+        pairs = [0, teacher, 1, 0, 1, 0, 2, 3]
+        result = s.pass_indices(s.epoch, pairs, request_id="batch-1")
+        self.assertEqual(result, {"duplicate": False, "new_edges": 3, "merged": 3})
+        self.assertEqual(s.pass_indices(s.epoch, pairs, request_id="batch-1"), dict(result, duplicate=True))
+        self.assertEqual(s.pass_indices(s.epoch, pairs), {"duplicate": False, "new_edges": 0, "merged": 0})
+
+    def test_stale_epoch_and_bad_pairs(self):
+        s = self.session
+        with self.assertRaises(ValueError):
+            s.pass_indices(s.epoch + 1, [0, 1])
+        for pairs in ([0], [0, len(STUDENTS) + 1], [0, "1"], [-1, 0]):
+            with self.assertRaises(ValueError):
+                s.pass_indices(s.epoch, pairs)
+        with self.assertRaises(ValueError):
+            s.pass_token("nobody", TEACHER)
+
+    def test_request_ids_are_bounded(self):
+        s = self.session
+        for k in range(MAX_REQUEST_IDS + 5):
+            s.pass_token(STUDENTS[k % 2], STUDENTS[2 + k % 3], request_id=f"r{k}")
+        self.assertEqual(len(s.request_results), MAX_REQUEST_IDS)
+        self.assertNotIn("r0", s.request_results)
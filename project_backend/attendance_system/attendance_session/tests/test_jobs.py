@@ -0,0 +1,100 @@
+# attendance_session/tests/test_jobs.py
+"""FinalizeJob queue (jobs.py): idempotent enqueue, leases, retries and batched writes."""
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from user.models import AttendanceRecord
+from user.tests.test_budgets import seed
+from .. import jobs
+from ..jobs import claim_jobs, enqueue_finalize, process_jobs, run_batch, run_job
+from ..models import AttendanceSession, FinalizeJob
+
+TEST_SESSIONS = {
+    **settings.ATTENDANCE_SESSIONS, "STORAGE": "rows", "FINALIZE_LEASE": 300, "FINALIZE_MAX_ATTEMPTS": 3,
+}
+
+
+@override_settings(ATTENDANCE_SESSIONS=TEST_SESSIONS)
+class FinalizeJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(10)
+        cls.classroom = cls.data.classrooms[0]
+
+    def enqueue(self, status="PRESENT"):
+        lecture = AttendanceSession.objects.create(classroom=self.classroom, teacher=self.data.teacher)
+        statuses = {student.uid: status for student in self.data.students}
+        return enqueue_finalize(self.classroom.id, lecture.id, statuses)
+
+    def test_enqueue_is_idempotent_per_session(self):
+        job = self.enqueue()
+        again = enqueue_finalize(self.classroom.id, job.session_id, {})
+        self.assertEqual(again.id, job.id)
+        self.assertEqual(len(again.statuses), 10)   # The first snapshot is kept
+
+    def test_claimed_job_is_leased(self):
+        job = self.enqueue()
+        [claimed] = claim_jobs()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (job.id, "RUNNING", 1))
+        self.assertEqual(claim_jobs(), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self.enqueue()
+        claim_jobs()
+        FinalizeJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(seconds=301))
+        [claimed] = claim_jobs()
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_future_jobs_wait(self):
+        job = self.enqueue()
+        FinalizeJob.objects.filter(id=job.id).update(available_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(claim_jobs(), [])
+
+    def test_failure_backs_off_then_gives_up(self):
+        job = self.enqueue()
+        with mock.patch.object(jobs, "save_attendance", side_effect=RuntimeError("database is down")):
+            for attempt in range(1, 4):
+                FinalizeJob.objects.filter(id=job.id).update(available_at=timezone.now())
+                [claimed] = claim_jobs()
+                self.assertFalse(run_job(claimed))
+                claimed.refresh_from_db()
+                self.assertEqual(claimed.attempts, attempt)
+                self.assertEqual(claimed.last_error, "database is down")
+                if attempt < 3:
+                    self.assertEqual(claimed.status, "QUEUED")
+                    self.assertGreater(claimed.available_at, timezone.now() + timedelta(seconds=2 ** attempt - 1))
+        self.assertEqual(claimed.status, "FAILED")
+        self.assertIsNotNone(claimed.finished_at)
+
+    def test_batch_writes_every_job(self):
+        first, second = self.enqueue("PRESENT"), self.enqueue("ABSENT")
+        self.assertEqual(process_jobs(window=0), 2)
+        self.assertEqual(set(FinalizeJob.objects.values_list("status", flat=True)), {"DONE"})
+        self.assertEqual(AttendanceRecord.objects.filter(session_id=first.session_id, status="PRESENT").count(), 10)
+        self.assertEqual(AttendanceRecord.objects.filter(session_id=second.session_id, status="ABSENT").count(), 10)
+        lecture = AttendanceSession.objects.get(id=first.session_id)
+        self.assertIsNotNone(lecture.finalized_at)
+
+    def test_failed_batch_falls_back_to_single_jobs(self):
+        good, bad = self.enqueue(), self.enqueue()
+        with mock.patch.object(jobs, "save_attendance_batch", side_effect=RuntimeError("batch failed")):
+            real = jobs.save_attendance
+
+            def save(classroom, statuses, session_id=None):
+                if session_id == bad.session_id:
+                    raise ValueError("bad snapshot")
+                real(classroom, statuses, session_id)
+
+            with mock.patch.object(jobs, "save_attendance", side_effect=save):
+                run_batch(claim_jobs())
+        self.assertEqual(FinalizeJob.objects.get(id=good.id).status, "DONE")
+        self.assertEqual(FinalizeJob.objects.get(id=bad.id).status, "QUEUED")
+
+    def test_nothing_due_returns_at_once(self):
+        with mock.patch.object(jobs.time, "sleep") as sleep:
+            self.assertEqual(process_jobs(window=5), 0)
+        sleep.assert_not_called()
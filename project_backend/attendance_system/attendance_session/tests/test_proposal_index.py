@@ -0,0 +1,88 @@
+# attendance_session/tests/test_proposal_index.py
+"""ProposalIntervalIndex stab queries and apply_proposals at finalize."""
+import random
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from user.models import AbsenceProposal
+from user.tests.test_budgets import seed
+from ..proposal_index import ProposalIntervalIndex, apply_proposals
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def test_stab(self):
+        index = ProposalIntervalIndex([
+            ("a", 0, 100, "long"),
+            ("a", 10, 20, "short"),
+            ("a", 30, 40, "later"),
+            ("b", 5, 6, "other"),
+        ])
+        self.assertEqual(len(index), 4)
+        self.assertEqual(sorted(index.stab("a", 15)), ["long", "short"])
+        self.assertEqual(sorted(index.stab("a", 20)), ["long", "short"])    # Ends are inclusive
+        self.assertEqual(index.stab("a", 25), ["long"])
+        self.assertEqual(index.stab("a", 101), [])
+        self.assertEqual(index.stab("a", -1), [])
+        self.assertEqual(index.stab("c", 15), [])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        rows = []
+        for k in range(300):
+            start = rng.randrange(1000)
+            rows.append((f"s{k % 7}", start, start + rng.randrange(1, 200), k))
+        index = ProposalIntervalIndex(rows)
+        for _ in range(500):
+            uid, when = f"s{rng.randrange(8)}", rng.randrange(-50, 1300)
+            expected = {tag for u, start, end, tag in rows if u == uid and start <= when <= end}
+            self.assertEqual(set(index.stab(uid, when)), expected)
+
+
+class ApplyProposalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        data = seed(10)     # Student 1 has a pending proposal around now
+        cls.students = data.students
+        now = timezone.now()
+        AbsenceProposal.objects.create(
+            student=cls.students[2], reason_type="MEDICAL", status="APPROVED",
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+        AbsenceProposal.objects.create(      # Approved over a pending one: the approval wins
+            student=cls.students[1], reason_type="MEDICAL", status="APPROVED",
+            start_datetime=now - timedelta(minutes=5), end_datetime=now + timedelta(minutes=5),
+        )
+        AbsenceProposal.objects.create(
+            student=cls.students[3], reason_type="MEDICAL", status="REJECTED",
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+        AbsenceProposal.objects.create(
+            student=cls.students[4], reason_type="MEDICAL", status="APPROVED",
+            start_datetime=now - timedelta(days=2), end_datetime=now - timedelta(days=1),
+        )
+
+    def test_absent_students_are_reclassified(self):
+        uids = [student.uid for student in self.students[:6]]
+        statuses = {uid: "ABSENT" for uid in uids}
+        statuses[uids[5]] = "PRESENT"
+        earlier = {uids[1]: "ABSENT"}
+        changed = apply_proposals([
+            (timezone.now(), statuses),
+            (timezone.now() - timedelta(minutes=30), earlier),
+        ])
+        self.assertEqual(changed, 3)
+        self.assertEqual(statuses, {
+            uids[0]: "ABSENT",
+            uids[1]: "PRESENT",
+            uids[2]: "PRESENT",
+            uids[3]: "ABSENT",      # Rejected
+            uids[4]: "ABSENT",      # Proposal ended yesterday
+            uids[5]: "PRESENT",
+        })
+        self.assertEqual(earlier, {uids[1]: "PENDING"})     # Only the pending proposal covers that lecture
+
+    def test_nothing_absent_costs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(apply_proposals([(timezone.now(), {self.students[0].uid: "PRESENT"})]), 0)
@@ -0,0 +1,270 @@
+# attendance_session/tests/test_routing.py
+"""
+Classroom routing (routing.py): the hash ring, request forwarding between
+workers and session handoff.
+
+Workers are Router instances in this process, each with its own socket in a
+temporary SOCKET_DIR. Forwarded requests are unauthenticated status checks:
+the owner answers 401 without touching the database, and X-Attendance-Worker
+says which worker served them.
+"""
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance_system.exceptions import exception_handler
+from ..anomaly import PassAnalyzer
+from ..engine import SessionClosed, SessionObject
+from ..routing import WORKER_HEADER, HashRing, Router, routed_classroom, router
+from ..session_manager import SessionManager
+
+TEACHER = "T0001"
+STUDENTS = [f"S{i:05d}" for i in range(6)]
+
+
+class HashRingTests(SimpleTestCase):
+    def test_empty_ring_has_no_owner(self):
+        self.assertIsNone(HashRing([], 64).owner(1))
+
+    def test_owner_is_stable_and_a_member(self):
+        ring = HashRing(["worker-b", "worker-a"], 64)
+        same = HashRing(["worker-a", "worker-b"], 64)
+        for key in range(200):
+            self.assertIn(ring.owner(key), ("worker-a", "worker-b"))
+            self.assertEqual(ring.owner(key), same.owner(key))
+
+    def test_load_is_spread(self):
+        members = [f"worker-{i}" for i in range(4)]
+        ring = HashRing(members, 64)
+        owners = [ring.owner(key) for key in range(4000)]
+        for member in members:
+            self.assertGreater(owners.count(member), 4000 * 0.15)
+
+    def test_joining_worker_only_takes_keys(self):
+        before = HashRing(["worker-a", "worker-b", "worker-c"], 64)
+        after = HashRing(["worker-a", "worker-b", "worker-c", "worker-d"], 64)
+        moved = [key for key in range(4000) if before.owner(key) != after.owner(key)]
+        self.assertTrue(all(after.owner(key) == "worker-d" for key in moved))
+        self.assertLess(len(moved), 4000 * 0.4)
+
+
+class RoutedPathTests(SimpleTestCase):
+    def test_live_session_endpoints_are_routed(self):
+        for path in (
+            "/session/teacher/classroom/7/start/",
+            "/session/teacher/classroom/7/finalize/",
+            "/session/student/classroom/7/pass-token/",
+            "/session/student/classroom/7/session/",
+            "/session/session/status/7/",
+        ):
+            self.assertEqual(routed_classroom(path), 7, path)
+
+    def test_database_reports_are_not_routed(self):
+        for path in (
+            "/session/teacher/classroom/7/attendance/export/",
+            "/session/teacher/classroom/7/sessions/",
+            "/session/teacher/sessions/active/",
+            "/session/student/classroom/7/pass-token/extra/",
+        ):
+            self.assertIsNone(routed_classroom(path), path)
+
+
+class RouterTestCase(SimpleTestCase):
+    """Routing on, with sockets in a fresh directory."""
+    CHECK_INTERVAL = 3600   # Tests refresh the ring themselves
+    TIMEOUT = 2
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="ring-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        override = override_settings(ATTENDANCE_SESSIONS={
+            **settings.ATTENDANCE_SESSIONS,
+            "TRACE_DIR": None,
+            "ROUTING": {"SOCKET_DIR": self.dir, "CHECK_INTERVAL": self.CHECK_INTERVAL, "TIMEOUT": self.TIMEOUT},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def join(self, name, instance=None):
+        instance = instance or Router(sessions=SessionManager())
+        instance.start(name)
+        self.addCleanup(instance.leave)
+        return instance
+
+    def owned_by(self, ring, member):
+        return next(key for key in range(1, 1000) if ring.owner(key) == member)
+
+    def dead_socket(self, name):
+        """A socket file nobody listens on, as left behind by a crashed worker."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(os.path.join(self.dir, f"{name}.sock"))
+        sock.close()
+
+
+class SocketDirTests(RouterTestCase):
+    def test_shared_directory_is_refused(self):
+        os.chmod(self.dir, 0o770)
+        with self.assertRaises(ImproperlyConfigured):
+            Router(sessions=SessionManager()).start("worker-a")
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_symlink_is_refused(self):
+        link = os.path.join(tempfile.mkdtemp(prefix="ring-link-"), "workers")
+        self.addCleanup(shutil.rmtree, os.path.dirname(link), True)
+        os.symlink(self.dir, link)
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "ROUTING": {"SOCKET_DIR": link}}):
+            with self.assertRaises(ImproperlyConfigured):
+                Router(sessions=SessionManager()).start("worker-a")
+
+    def test_default_is_the_runtime_directory(self):
+        runtime = tempfile.mkdtemp(prefix="runtime-")
+        self.addCleanup(shutil.rmtree, runtime, True)
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "ROUTING": {}}), \
+                mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": runtime}):
+            worker = self.join("worker-a")
+            self.assertEqual(worker.socket_path("worker-a"), os.path.join(runtime, "attendance-workers", "worker-a.sock"))
+            self.assertEqual(os.stat(os.path.join(runtime, "attendance-workers")).st_mode & 0o777, 0o700)
+
+
+class ForwardingTests(RouterTestCase):
+    TIMEOUT = 0.5
+
+    def setUp(self):
+        super().setUp()
+        self.other = self.join("worker-b")
+        self.join("worker-a", router)  # The middleware's router
+        self.client = APIClient()
+
+    def status(self, classroom_id, **headers):
+        return self.client.get(f"/session/session/status/{classroom_id}/", **headers)
+
+    def test_request_runs_on_owner(self):
+        remote = self.owned_by(router.ring, "worker-b")
+        local = self.owned_by(router.ring, "worker-a")
+        response = self.status(remote)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response[WORKER_HEADER], "worker-b")
+        self.assertNotIn(WORKER_HEADER, self.status(local))
+
+    def test_client_cannot_skip_routing(self):
+        remote = self.owned_by(router.ring, "worker-b")
+        response = self.status(remote, HTTP_X_ATTENDANCE_ROUTED="worker-a")
+        self.assertEqual(response[WORKER_HEADER], "worker-b")
+
+    def test_crashed_owner_leaves_ring(self):
+        self.dead_socket("worker-dead")
+        router.refresh()
+        classroom_id = self.owned_by(router.ring, "worker-dead")
+        response = self.status(classroom_id)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn("worker-dead", router.ring.members)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "worker-dead.sock")))
+
+    def test_unresponsive_owner_is_not_served_locally(self):
+        stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stuck.bind(os.path.join(self.dir, "worker-stuck.sock"))
+        stuck.listen()  # Accepts connections, never answers
+        self.addCleanup(stuck.close)
+        router.refresh()
+        classroom_id = self.owned_by(router.ring, "worker-stuck")
+        response = self.status(classroom_id)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIn("worker-stuck", router.ring.members)
+
+
+class HandoffTests(RouterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.join("worker-a")
+        self.b = self.join("worker-b")
+        self.a.refresh()
+
+    def session(self, classroom_id):
+        session = SessionObject(classroom_id, TEACHER, STUDENTS)
+        session.pass_token(STUDENTS[0], TEACHER)
+        session.pass_token(STUDENTS[1], STUDENTS[2])
+        return session
+
+    def test_hand_off_moves_state_and_closes_the_old_copy(self):
+        session = self.session(5)
+        self.assertTrue(self.a.hand_off("worker-b", session))
+        moved = self.b.sessions.get(5)
+        self.assertIsNot(moved, session)
+        self.assertEqual(moved.seen_edges, session.seen_edges)
+        with self.assertRaises(SessionClosed):
+            session.pass_token(STUDENTS[3], TEACHER)
+        moved.pass_token(STUDENTS[3], TEACHER)  # The new copy still takes passes
+        statuses = moved.finalize_statuses()
+        self.assertEqual([uid for uid in STUDENTS if statuses[uid] == "PRESENT"], [STUDENTS[0], STUDENTS[3]])
+
+    def test_state_round_trip(self):
+        session = SessionObject(5, TEACHER, STUDENTS, capture=True)
+        session.activate(9, timezone.now(), teacher_user_id=3)
+        session.analyzer = PassAnalyzer(len(session), session.teacher_index, {"MAX_OUT_DEGREE": 1})
+        session.pass_token(STUDENTS[0], TEACHER)
+        session.add_exception(STUDENTS[4])
+        session.pass_token(STUDENTS[1], STUDENTS[3], request_id="r1")
+        session.pass_token(STUDENTS[1], STUDENTS[4])        # Flagged: out-degree 2 > 1
+        moved = SessionObject.from_state(json.loads(json.dumps(session.to_state())))
+        for name in ("uids", "epoch", "session_id", "started_at", "teacher_user_id", "exception_list",
+                     "edges", "seen_edges", "request_results"):
+            self.assertEqual(getattr(moved, name), getattr(session, name), name)
+        self.assertTrue(moved.flagged())
+        self.assertEqual(moved.flagged(), session.flagged())
+        self.assertEqual(moved.finalize_statuses(), session.finalize_statuses())
+        self.assertEqual(list(moved.forest.joined_at), list(session.forest.joined_at))
+        self.assertAlmostEqual(moved.elapsed(), session.elapsed(), delta=1)
+
+    def test_malformed_handoff_is_refused(self):
+        self.assertFalse(self.b.receive_session(5, b'{"uids": ["S1"]}'))
+        state = self.session(5).to_state()
+        state["forest"]["parent"] = ["i", "AAAA"]
+        self.assertFalse(self.b.receive_session(5, json.dumps(state).encode()))
+        self.assertNotIn(5, self.b.sessions)
+
+    def test_receiver_holding_the_classroom_refuses(self):
+        self.b.sessions[5] = self.session(5)
+        session = self.session(5)
+        self.assertFalse(self.a.hand_off("worker-b", session))
+        self.assertIsNone(session.closed)
+        session.pass_token(STUDENTS[3], TEACHER)
+
+    def test_unreachable_receiver_keeps_session_open(self):
+        self.dead_socket("worker-dead")
+        session = self.session(5)
+        self.assertFalse(self.a.hand_off("worker-dead", session))
+        self.assertIsNone(session.closed)
+
+    def test_monitor_moves_sessions_when_a_worker_joins(self):
+        x = self.join("worker-x")
+        before = HashRing(["worker-a", "worker-b", "worker-x"], 64)
+        held = [cid for cid in range(1, 200) if before.owner(cid) == "worker-x"]
+        for classroom_id in held:
+            x.sessions[classroom_id] = self.session(classroom_id)
+        c = self.join("worker-c")
+        after = HashRing(["worker-a", "worker-b", "worker-c", "worker-x"], 64)
+        moved = {cid for cid in held if after.owner(cid) == "worker-c"}
+        self.assertTrue(moved)
+
+        x.owner(held[0])    # What a request does: rebuilds the ring, the monitor thread hands off
+        deadline = time.monotonic() + 5
+        while set(c.sessions.keys()) != moved and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(set(c.sessions.keys()), moved)
+        self.assertEqual(set(x.sessions.keys()), set(held) - moved)
+
+    def test_closed_session_is_a_retryable_503(self):
+        response = exception_handler(SessionClosed("handed off to worker-b"), {})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
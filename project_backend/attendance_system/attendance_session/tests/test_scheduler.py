@@ -0,0 +1,66 @@
+# attendance_session/tests/test_scheduler.py
+"""Dormant session pre-creation: ownership and the MAX_NODES budget."""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from user.models import TimetableSlot
+from user.tests.test_budgets import seed
+from ..engine import SessionObject
+from ..scheduler import DormantSessions
+from ..session_manager import SessionManager
+
+MONDAY_9AM = timezone.make_aware(datetime(2026, 10, 19, 9, 0))
+
+
+def precreate(**options):
+    return override_settings(ATTENDANCE_SESSIONS={
+        **settings.ATTENDANCE_SESSIONS,
+        "TRACE_DIR": None,
+        "PRECREATE": {"LEAD": 10, "GRACE": 20, **options},
+    })
+
+
+class PrecreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(20)     # Classroom 0: 20 students, classrooms 1-2: student 0 only
+        first, second, _ = cls.data.classrooms
+        TimetableSlot.objects.create(classroom=first, weekday=0, start_time=time(9, 5), end_time=time(10))
+        TimetableSlot.objects.create(classroom=second, weekday=0, start_time=time(9, 8), end_time=time(10))
+
+    def setUp(self):
+        self.dormant = DormantSessions()
+
+    def test_nothing_is_built_without_routing(self):
+        with precreate():
+            self.assertEqual(self.dormant.prepare(MONDAY_9AM), [])
+        self.assertEqual(len(self.dormant), 0)
+
+    def test_single_process_opt_in(self):
+        first, second, _ = self.data.classrooms
+        with precreate(WITHOUT_ROUTING=True):
+            self.assertEqual(self.dormant.prepare(MONDAY_9AM), [first.id, second.id])
+        self.assertEqual(self.dormant.total_nodes(), 21 + 2)
+
+    def test_only_what_fits_is_built(self):
+        first, second, _ = self.data.classrooms
+        with precreate(WITHOUT_ROUTING=True):
+            self.assertEqual(self.dormant.prepare(MONDAY_9AM, room=10), [second.id])
+            self.assertEqual(self.dormant.prepare(MONDAY_9AM, room=0), [])
+        self.assertEqual(self.dormant.keys(), [second.id])
+
+    def test_dormant_sessions_are_shed_before_live_ones(self):
+        with precreate(WITHOUT_ROUTING=True):
+            self.dormant.prepare(MONDAY_9AM)
+        manager = SessionManager(spare=self.dormant, shards=2)
+        self.addCleanup(manager.stop)
+        live = SessionObject(99, "T0001", [f"S{i:05d}" for i in range(4)])
+        manager._shard(99).sessions[99] = live
+        manager._shard(99).last_seen[99] = 0.0
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "MAX_NODES": 10}):
+            self.assertEqual(manager.enforce_budget(), [])
+        self.assertEqual(len(self.dormant), 0)  # Both shed: dropping the 2-node one alone was not enough
+        self.assertEqual(manager.keys(), [99])
@@ -0,0 +1,68 @@
+# attendance_session/tests/test_session_manager.py
+"""SessionManager expiry: TTL sweeps and the MAX_NODES budget on the reaper thread."""
+import threading
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from ..engine import SessionObject
+from ..session_manager import SessionManager
+
+TEACHER = "T0001"
+
+
+def make_session(classroom_id, students=9):
+    return SessionObject(classroom_id, TEACHER, [f"S{i:05d}" for i in range(students)])
+
+
+class SessionManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.expired = []
+        self.done = threading.Event()
+        self.manager = SessionManager(on_expire=self.on_expire, shards=4)
+        self.addCleanup(self.manager.stop)
+
+    def on_expire(self, session, reason):
+        self.expired.append((session.classroom_id, reason, threading.current_thread().name))
+        self.done.set()
+
+    def test_dict_access(self):
+        self.manager[1] = session = make_session(1)
+        self.assertIn(1, self.manager)
+        self.assertIs(self.manager[1], session)
+        self.assertEqual(self.manager.total_nodes(), 10)
+        del self.manager[1]
+        self.assertIsNone(self.manager.get(1))
+        with self.assertRaises(KeyError):
+            del self.manager[1]
+
+    def test_ttl_expiry(self):
+        self.manager[1] = make_session(1)
+        self.manager[2] = make_session(2)
+        self.manager._shard(1).last_seen[1] -= 10_000
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "TTL": 60}):
+            self.assertEqual(self.manager.expire_stale(), [1])
+        self.assertEqual(self.expired[0][:2], (1, "ttl"))
+        self.assertEqual(self.manager.keys(), [2])
+
+    def test_budget_is_enforced_by_the_reaper(self):
+        """Starting a session never runs another classroom's auto-finalize on the request thread."""
+        with override_settings(ATTENDANCE_SESSIONS={
+            **settings.ATTENDANCE_SESSIONS, "MAX_NODES": 25, "REAP_INTERVAL": 3600,
+        }):
+            self.manager[1] = make_session(1)
+            self.manager[2] = make_session(2)
+            self.manager[3] = make_session(3)
+            self.assertTrue(self.done.wait(5))
+            self.assertEqual(self.expired, [(1, "memory budget", "session-reaper")])
+            self.assertEqual(sorted(self.manager.keys()), [2, 3])
+
+    def test_passes_count_toward_the_budget(self):
+        self.manager[1] = busy = make_session(1)
+        self.manager[2] = make_session(2)
+        for i in range(9):
+            busy.pass_token(f"S{i:05d}", f"S{(i + 1) % 9:05d}")
+        self.assertEqual(self.manager.total_nodes(), 10 + 9 + 10)
+        self.manager._shard(1).last_seen[1] -= 10     # Least recently used
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "MAX_NODES": 25}):
+            self.assertEqual(self.manager.enforce_budget(), [1])
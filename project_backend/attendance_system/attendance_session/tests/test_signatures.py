@@ -0,0 +1,153 @@
+# attendance_session/tests/test_signatures.py
+"""Device signatures on passes (signatures.py): KeyRing checks and the pass-token view."""
+import base64
+import unittest
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from user.tests.test_budgets import client_for
+from .. import throttling
+from ..engine import SessionObject
+from ..signatures import KeyRing, backend, decode_signature, parse_keys, pass_message
+from ..views import sessions
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:  # pragma: no cover - optional dependency
+    Ed25519PrivateKey = None
+
+TEACHER = "T0001"
+STUDENTS = [f"S{i:05d}" for i in range(4)]
+CLASSROOM = 41
+
+
+def new_key():
+    """(private key, auth_key as stored on Student)."""
+    private = Ed25519PrivateKey.generate()
+    raw = private.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    return private, base64.b64encode(raw).decode()
+
+
+def sign(private, session, from_uid, to_uid):
+    message = pass_message(session.epoch, session.index[from_uid], session.index[to_uid])
+    return base64.b64encode(private.sign(message)).decode()
+
+
+def signatures_setting(required):
+    return override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "REQUIRE_SIGNATURES": required})
+
+
+@unittest.skipIf(Ed25519PrivateKey is None or backend() is None, "cryptography is not installed")
+class KeyRingTests(SimpleTestCase):
+    def setUp(self):
+        self.session = SessionObject(1, TEACHER, STUDENTS)
+        self.private, auth_key = new_key()
+        self.keyring = KeyRing.for_session(self.session, {STUDENTS[1]: auth_key, STUDENTS[2]: "not a key"})
+
+    def check(self, from_uid, to_uid, signature):
+        s = self.session
+        return self.keyring.verify_pass(s.epoch, s.index[from_uid], s.index[to_uid], decode_signature(signature))
+
+    def test_signed_by_receiver(self):
+        signature = sign(self.private, self.session, STUDENTS[0], STUDENTS[1])
+        self.assertTrue(self.check(STUDENTS[0], STUDENTS[1], signature))
+
+    def test_signature_is_bound_to_the_pass(self):
+        signature = sign(self.private, self.session, STUDENTS[0], STUDENTS[1])
+        self.assertFalse(self.check(STUDENTS[3], STUDENTS[1], signature))
+        self.session.epoch += 1     # Restarted session
+        self.assertFalse(self.check(STUDENTS[0], STUDENTS[1], signature))
+
+    def test_unsigned_or_malformed(self):
+        self.assertFalse(self.check(STUDENTS[0], STUDENTS[1], None))
+        self.assertFalse(self.check(STUDENTS[0], STUDENTS[1], "%%%"))
+
+    def test_keyless_receiver_is_refused_once_classroom_has_keys(self):
+        self.assertTrue(self.keyring.enforced)
+        self.assertFalse(self.check(STUDENTS[1], STUDENTS[3], None))
+        self.assertFalse(self.check(STUDENTS[1], STUDENTS[2], None))  # Unusable key counts as none
+
+    def test_pass_to_teacher(self):
+        s = self.session
+        a, teacher = s.index[STUDENTS[1]], s.teacher_index
+        self.assertTrue(self.keyring.verify_pass(s.epoch, a, teacher, None, by_teacher=True))
+        self.assertFalse(self.keyring.verify_pass(s.epoch, a, teacher, None))
+        signed = decode_signature(sign(self.private, s, STUDENTS[1], TEACHER))     # By the sender
+        self.assertTrue(self.keyring.verify_pass(s.epoch, a, teacher, signed))
+        self.assertFalse(self.check(STUDENTS[0], TEACHER, None))    # Keyless sender
+
+    def test_classroom_without_keys(self):
+        keyring = KeyRing.for_session(self.session, {})
+        self.assertFalse(keyring.enforced)
+        self.assertTrue(keyring.verify_pass(self.session.epoch, 0, 1, None))
+        with signatures_setting(True):
+            keyring = KeyRing.for_session(self.session, {})
+        self.assertTrue(keyring.enforced)
+        self.assertFalse(keyring.verify_pass(self.session.epoch, 0, 1, None))
+
+    def test_batch(self):
+        s = self.session
+        pairs = [0, 1, 2, 1, 3, 1] * 30     # Enough pairs to go through the verify pool
+        good = sign(self.private, s, STUDENTS[0], STUDENTS[1])
+        signed = [decode_signature(good), None, decode_signature(good)] * 30
+        self.assertEqual(self.keyring.verify_batch(s.epoch, pairs, signed), [True, False, False] * 30)
+
+    def test_parse_keys(self):
+        parsed = parse_keys({"a": "", "b": "garbage", "c": new_key()[1]})
+        self.assertIsNone(parsed["a"])
+        self.assertIsNone(parsed["b"])
+        self.assertTrue(callable(parsed["c"]))
+
+
+@unittest.skipIf(Ed25519PrivateKey is None or backend() is None, "cryptography is not installed")
+class PassTokenSignatureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="student")
+
+    def setUp(self):
+        throttling._backends.clear()
+        self.session = SessionObject(CLASSROOM, TEACHER, STUDENTS)
+        self.private, auth_key = new_key()
+        self.session.keyring = KeyRing.for_session(self.session, {STUDENTS[1]: auth_key})
+        sessions[CLASSROOM] = self.session
+        self.addCleanup(sessions.pop, CLASSROOM, None)
+        self.client = client_for(self.user)
+
+    def post(self, data):
+        return self.client.post(reverse("pass-token", args=[CLASSROOM]), data, format="json")
+
+    def test_unsigned_pass_in_keyed_classroom_is_refused(self):
+        response = self.post({"from_uid": STUDENTS[0], "to_uid": STUDENTS[1]})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.session.seen_edges, set())
+
+    def test_signed_pass_is_applied(self):
+        signature = sign(self.private, self.session, STUDENTS[0], STUDENTS[1])
+        response = self.post({"from_uid": STUDENTS[0], "to_uid": STUDENTS[1], "signature": signature})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(response.data["new_edge"])
+
+    def test_unsigned_pass_to_teacher_needs_the_teacher(self):
+        response = self.post({"from_uid": STUDENTS[0], "to_uid": TEACHER})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.session.seen_edges, set())
+
+        teacher = User.objects.create(username="teacher")
+        self.session.activate(7, None, teacher.id)
+        response = client_for(teacher).post(
+            reverse("pass-token", args=[CLASSROOM]), {"from_uid": STUDENTS[0], "to_uid": TEACHER}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_batch_drops_unsigned_passes(self):
+        s = self.session
+        signature = sign(self.private, s, STUDENTS[0], STUDENTS[1])
+        response = self.post({"epoch": s.epoch, "pairs": [0, 1, 0, 2, 1, 3], "signatures": [signature]})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["rejected"], [1, 2])
+        self.assertEqual(response.data["new_edges"], 1)
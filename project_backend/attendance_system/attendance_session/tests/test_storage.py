@@ -0,0 +1,111 @@
+# attendance_session/tests/test_storage.py
+"""Packed status vectors (bitmap.py) and the row / bitmap layouts of storage.py."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from user.models import AttendanceRecord
+from user.tests.test_budgets import seed
+from ..bitmap import (
+    STATUSES, pack_ids, pack_statuses, position, roster_digest, set_status, status_at, unpack_ids, unpack_statuses,
+)
+from ..models import AttendanceSession, ClassroomRoster
+from ..storage import records_for_student, rewrite_bitmap_window, save_attendance, session_statuses
+
+
+def storage(mode):
+    return override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "STORAGE": mode})
+
+
+class BitmapCodecTests(SimpleTestCase):
+    def test_round_trip_every_length(self):
+        for count in range(0, 13):
+            statuses = [STATUSES[(i * 7) % 4] for i in range(count)]
+            blob = pack_statuses(statuses)
+            self.assertEqual(len(blob), (count + 3) // 4)
+            self.assertEqual(unpack_statuses(blob, count), statuses)
+            self.assertEqual([status_at(blob, i) for i in range(count)], statuses)
+
+    def test_set_status_touches_one_position(self):
+        statuses = ["PRESENT"] * 9
+        blob = pack_statuses(statuses)
+        for i, status in ((0, "LATE"), (4, "PENDING"), (8, "ABSENT"), (4, "PRESENT")):
+            blob = set_status(blob, i, status)
+            statuses[i] = status
+            self.assertEqual(unpack_statuses(blob, 9), statuses)
+
+    def test_ids_are_sorted_and_searchable(self):
+        packed = pack_ids([30, 2, 2 ** 40, 7])
+        ids = unpack_ids(packed)
+        self.assertEqual(list(ids), [2, 7, 30, 2 ** 40])
+        self.assertEqual(len(packed), 4 * 8)
+        self.assertEqual(position(ids, 30), 2)
+        self.assertEqual(position(ids, 2 ** 40), 3)
+        self.assertIsNone(position(ids, 8))
+        self.assertIsNone(position(ids, 2 ** 41))
+        self.assertEqual(roster_digest(pack_ids([7, 2])), roster_digest(pack_ids([2, 7])))
+
+
+class StorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(10)
+        cls.classroom = cls.data.classrooms[0]
+        cls.students = cls.data.students[:4]
+
+    def lecture(self):
+        return AttendanceSession.objects.create(classroom=self.classroom, teacher=self.data.teacher)
+
+    def statuses(self, *values):
+        return {student.uid: value for student, value in zip(self.students, values)}
+
+    def test_rows_replace_on_refinalize(self):
+        lecture = self.lecture()
+        with storage("rows"):
+            save_attendance(self.classroom, self.statuses("PRESENT", "ABSENT", "LATE", "ABSENT"), lecture.id)
+            save_attendance(self.classroom, self.statuses("PRESENT", "PRESENT", "LATE", "ABSENT"), lecture.id)
+        rows = dict(AttendanceRecord.objects.filter(session=lecture).values_list("student__uid", "status"))
+        self.assertEqual(rows, self.statuses("PRESENT", "PRESENT", "LATE", "ABSENT"))
+        lecture.refresh_from_db()
+        self.assertEqual((lecture.total_students, lecture.present_count, lecture.absent_count), (4, 3, 1))
+        self.assertIsNone(lecture.status_vector)
+
+    def test_bitmap_layout(self):
+        first, second = self.lecture(), self.lecture()
+        with storage("bitmap"):
+            save_attendance(self.classroom, self.statuses("PRESENT", "ABSENT", "LATE", "PENDING"), first.id)
+            save_attendance(self.classroom, self.statuses("ABSENT", "ABSENT", "PRESENT", "PRESENT"), second.id)
+        self.assertFalse(AttendanceRecord.objects.filter(session__in=[first, second]).exists())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.roster_id, second.roster_id)     # Same students: one roster version
+        self.assertEqual(ClassroomRoster.objects.filter(classroom=self.classroom).count(), 1)
+        self.assertEqual(
+            dict(session_statuses(first)),
+            {student.id: status for student, status in zip(self.students, ("PRESENT", "ABSENT", "LATE", "PENDING"))},
+        )
+
+    def test_new_roster_version_when_students_change(self):
+        first, second = self.lecture(), self.lecture()
+        with storage("bitmap"):
+            save_attendance(self.classroom, self.statuses("PRESENT", "PRESENT", "PRESENT"), first.id)
+            save_attendance(self.classroom, self.statuses("PRESENT", "PRESENT", "PRESENT", "PRESENT"), second.id)
+        versions = ClassroomRoster.objects.filter(classroom=self.classroom).order_by("version")
+        self.assertEqual([(r.version, r.size) for r in versions], [(1, 3), (2, 4)])
+
+    def test_records_for_student_and_window_rewrite(self):
+        lecture = self.lecture()
+        student = self.students[1]
+        with storage("bitmap"):
+            save_attendance(self.classroom, self.statuses("PRESENT", "ABSENT", "LATE", "ABSENT"), lecture.id)
+        [record] = [r for r in records_for_student(student, self.classroom.id) if r.session_id == lecture.id]
+        self.assertEqual(record.status, "ABSENT")
+        self.assertIsNone(record.pk)
+
+        now = timezone.now()
+        rewrite_bitmap_window(student, now - timedelta(hours=1), now + timedelta(hours=1), "PRESENT")
+        lecture.refresh_from_db()
+        self.assertEqual(dict(session_statuses(lecture))[student.id], "PRESENT")
+        self.assertEqual(dict(session_statuses(lecture))[self.students[3].id], "ABSENT")
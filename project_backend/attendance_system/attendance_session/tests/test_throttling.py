@@ -0,0 +1,109 @@
+# attendance_session/tests/test_throttling.py
+"""Token buckets (throttling.py): refill arithmetic and the 429 of the pass endpoint."""
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from user.tests.test_budgets import client_for
+from .. import throttling
+from ..engine import SessionObject
+from ..throttling import CacheBuckets, MemoryBuckets
+from ..views import sessions
+
+CLASSROOM = 43
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BucketTests(SimpleTestCase):
+    def buckets(self):
+        return MemoryBuckets()
+
+    def setUp(self):
+        self.clock = Clock()
+        for name in ("monotonic", "time"):
+            patcher = mock.patch.object(throttling.time, name, self.clock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.bucket = self.buckets()
+
+    def test_burst_then_refill(self):
+        for _ in range(5):
+            self.assertEqual(self.bucket.take("k", 2, 5, 1), 0)
+        self.assertAlmostEqual(self.bucket.take("k", 2, 5, 1), 0.5)     # Empty: one token takes 1/RATE s
+        self.clock.now += 0.5
+        self.assertEqual(self.bucket.take("k", 2, 5, 1), 0)
+        self.clock.now += 100       # Refill stops at BURST
+        for _ in range(5):
+            self.assertEqual(self.bucket.take("k", 2, 5, 1), 0)
+        self.assertGreater(self.bucket.take("k", 2, 5, 1), 0)
+
+    def test_cost_and_separate_keys(self):
+        self.assertEqual(self.bucket.take("a", 1, 10, 8), 0)
+        self.assertAlmostEqual(self.bucket.take("a", 1, 10, 4), 2.0)
+        self.assertEqual(self.bucket.take("a", 1, 10, 2), 0)    # A refused request takes nothing
+        self.assertEqual(self.bucket.take("b", 1, 10, 10), 0)
+
+
+class CacheBucketTests(BucketTests):
+    def buckets(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        return CacheBuckets("default")
+
+
+class MemoryBucketLimitTests(SimpleTestCase):
+    def test_least_recently_used_dropped(self):
+        bucket = MemoryBuckets()
+        with mock.patch.object(throttling, "MAX_BUCKETS", 2):
+            bucket.take("a", 1, 1, 1)
+            bucket.take("b", 1, 1, 1)
+            bucket.take("a", 1, 1, 0)
+            bucket.take("c", 1, 1, 1)
+        self.assertEqual(list(bucket._buckets), ["a", "c"])
+
+
+class PassTokenThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="student")
+
+    def setUp(self):
+        throttling._backends.clear()
+        self.session = SessionObject(CLASSROOM, "T0001", [f"S{i:05d}" for i in range(10)])
+        sessions[CLASSROOM] = self.session
+        self.addCleanup(sessions.pop, CLASSROOM, None)
+        override = override_settings(ATTENDANCE_SESSIONS={
+            **settings.ATTENDANCE_SESSIONS,
+            "THROTTLE": {"pass_token": {"RATE": 0.01, "BURST": 3}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def post(self, user, data):
+        return client_for(user).post(reverse("pass-token", args=[CLASSROOM]), data, format="json")
+
+    def test_batch_costs_one_token_per_pair(self):
+        s = self.session
+        self.assertEqual(self.post(self.user, {"epoch": s.epoch, "pairs": [0, 1, 2, 3]}).status_code, 200)
+        self.assertEqual(self.post(self.user, {"from_uid": "S00004", "to_uid": "S00005"}).status_code, 200)
+        response = self.post(self.user, {"from_uid": "S00006", "to_uid": "S00007"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_buckets_are_per_user(self):
+        other = User.objects.create(username="other")
+        s = self.session
+        self.assertEqual(self.post(self.user, {"epoch": s.epoch, "pairs": [0, 1, 2, 3, 4, 5]}).status_code, 200)
+        self.assertEqual(self.post(self.user, {"from_uid": "S00006", "to_uid": "S00007"}).status_code, 429)
+        self.assertEqual(self.post(other, {"from_uid": "S00006", "to_uid": "S00007"}).status_code, 200)
@@ -0,0 +1,77 @@
+# attendance_session/tests/test_trace.py
+"""Session traces: file round trip, capture on finalize and retention."""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from ..engine import SessionObject
+from ..trace import prune_traces, read_trace, save_session_trace, write_trace
+
+TEACHER = "T0001"
+STUDENTS = [f"S{i:05d}" for i in range(5)]
+
+
+class TraceTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="traces-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_round_trip(self):
+        path = os.path.join(self.dir, "a.trace")
+        write_trace(path, STUDENTS + [TEACHER], 5, [0, 5, 1, 0, 3, 4])
+        uids, teacher_index, edges = read_trace(path)
+        self.assertEqual(uids, STUDENTS + [TEACHER])
+        self.assertEqual(teacher_index, 5)
+        self.assertEqual(list(edges), [0, 5, 1, 0, 3, 4])
+
+    def test_not_a_trace(self):
+        path = os.path.join(self.dir, "junk.trace")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            read_trace(path)
+
+    def test_save_is_off_without_trace_dir(self):
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "TRACE_DIR": None}):
+            self.assertIsNone(save_session_trace(SessionObject(1, TEACHER, STUDENTS, capture=True)))
+
+    def test_save_skips_sessions_built_without_capture(self):
+        with override_settings(ATTENDANCE_SESSIONS={**settings.ATTENDANCE_SESSIONS, "TRACE_DIR": self.dir}):
+            self.assertIsNone(save_session_trace(SessionObject(1, TEACHER, STUDENTS)))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_save_keeps_newest(self):
+        for i in range(4):
+            path = os.path.join(self.dir, f"old_{i}.trace")
+            write_trace(path, [TEACHER], 0, [])
+            os.utime(path, (1000 + i, 1000 + i))
+        session = SessionObject(1, TEACHER, STUDENTS, capture=True)
+        session.pass_token(STUDENTS[0], TEACHER)
+        with override_settings(ATTENDANCE_SESSIONS={
+            **settings.ATTENDANCE_SESSIONS, "TRACE_DIR": self.dir, "TRACE_KEEP": 2,
+        }):
+            path = save_session_trace(session)
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted([os.path.basename(path), "old_3.trace"]))
+        uids, _, edges = read_trace(path)
+        self.assertEqual(uids, session.uids)
+        self.assertEqual(len(edges), 2)
+
+    def test_save_never_overwrites(self):
+        with override_settings(ATTENDANCE_SESSIONS={
+            **settings.ATTENDANCE_SESSIONS, "TRACE_DIR": self.dir, "TRACE_KEEP": None,
+        }):
+            first = save_session_trace(SessionObject(1, TEACHER, STUDENTS, capture=True))
+            second = save_session_trace(SessionObject(1, TEACHER, STUDENTS, capture=True))
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(os.listdir(self.dir)), 2)
+        with self.assertRaises(FileExistsError):
+            write_trace(first, [TEACHER], 0, [])
+
+    def test_prune_ignores_other_files(self):
+        open(os.path.join(self.dir, "notes.txt"), "w").close()
+        write_trace(os.path.join(self.dir, "a.trace"), [TEACHER], 0, [])
+        self.assertEqual(len(prune_traces(self.dir, 0)), 1)
+        self.assertEqual(os.listdir(self.dir), ["notes.txt"])
@@ -0,0 +1,123 @@
+# attendance_session/throttling.py
+"""
+Token-bucket throttles for the session hot endpoints.
+
+Each (endpoint scope, user, classroom) gets a bucket of BURST tokens refilled
+at RATE tokens per second (ATTENDANCE_SESSIONS['THROTTLE']). A request takes
+one token (a batched pass takes one per pair); when the bucket is short the
+request gets 429 with Retry-After, so one misbehaving phone cannot occupy
+the workers a whole lecture hall depends on.
+
+Buckets live in process memory by default. Set
+ATTENDANCE_SESSIONS['THROTTLE_CACHE'] to a cache alias (e.g. a Redis-backed
+"default") to share them between workers; the cache path is a read-modify-write
+without locking, so concurrent bursts may overshoot the limit slightly.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .routing import FANOUT_KEY
+from .session_manager import session_setting
+
+MAX_BUCKETS = 100_000   # In-memory buckets kept before the least recently used are dropped
+
+
+class MemoryBuckets:
+    """Per-process buckets: key -> [tokens, last refill (monotonic)]."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, rate, burst, cost):
+        """Take `cost` tokens; return 0 if allowed, else seconds until enough tokens are back."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0
+            return (cost - bucket[0]) / rate
+
+
+class CacheBuckets:
+    """Buckets stored in a Django cache so every worker shares them."""
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, rate, burst, cost):
+        now = time.time()
+        tokens, updated = self.cache.get(key) or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        # Keep the entry until the bucket would be full again anyway
+        self.cache.set(key, (tokens, now), timeout=math.ceil(burst / rate) + 1)
+        return 0 if allowed else (cost - tokens) / rate
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_buckets():
+    alias = session_setting("THROTTLE_CACHE")
+    with _backends_lock:
+        if alias not in _backends:
+            _backends[alias] = CacheBuckets(alias) if alias else MemoryBuckets()
+        return _backends[alias]
+
+
+# ---------------------------
+# DRF throttles
+# ---------------------------
+class SessionRateThrottle(BaseThrottle):
+    """Token bucket per user and classroom; `scope` selects the limits in ATTENDANCE_SESSIONS['THROTTLE']."""
+    scope = None
+
+    def get_cost(self, request):
+        return 1
+
+    def allow_request(self, request, view):
+        limits = (session_setting("THROTTLE") or {}).get(self.scope)
+        if not limits or request.META.get(FANOUT_KEY):
+            return True     # Fan-out shares were charged on the worker that received the request
+        if request.user and request.user.is_authenticated:
+            ident = f"u{request.user.pk}"
+        else:
+            ident = self.get_ident(request)
+        key = f"throttle:{self.scope}:{ident}:{view.kwargs.get('classroom_id', '')}"
+        self._wait = get_buckets().take(key, limits["RATE"], limits["BURST"], min(self.get_cost(request), limits["BURST"]))
+        return self._wait == 0
+
+    def wait(self):
+        return math.ceil(self._wait)
+
+
+class PassTokenThrottle(SessionRateThrottle):
+    scope = "pass_token"
+
+    def get_cost(self, request):
+        pairs = request.data.get("pairs") if hasattr(request.data, "get") else None
+        return max(1, len(pairs) // 2) if isinstance(pairs, list) else 1
+
+
+class ExceptionThrottle(SessionRateThrottle):
+    scope = "exception"
+
+
+class BatchThrottle(SessionRateThrottle):
+    scope = "batch"
@@ -0,0 +1,133 @@
+# attendance_session/trace.py
+"""
+Binary traces of a session's token graph, for offline replay.
+
+Layout (little-endian):
+    header  : magic b"ATRC", version u16, node count u32, teacher index u32, edge count u32
+    roster  : node count x (u8 length + UTF-8 uid), in index order
+    edges   : edge count x (u32 from index, u32 to index), in arrival order
+"""
+import itertools
+import os
+import struct
+import sys
+from array import array
+
+from django.utils import timezone
+
+from .engine import Node
+from .session_manager import session_setting
+
+MAGIC = b"ATRC"
+VERSION = 1
+HEADER = struct.Struct("<4sHIII")
+
+
+# ---------------------------
+# Read / Write
+# ---------------------------
+def write_trace(path, uids, teacher_index, edges):
+    """Write a roster and a flat uint32 edge array to a new file at `path` (FileExistsError if taken)."""
+    edges = array('I', edges)
+    if sys.byteorder != "little":
+        edges.byteswap()
+    with open(path, "xb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(uids), teacher_index, len(edges) // 2))
+        for uid in uids:
+            encoded = uid.encode()
+            f.write(struct.pack("<B", len(encoded)) + encoded)
+        edges.tofile(f)
+
+
+def read_trace(path):
+    """Return (uids, teacher_index, edges) from a trace file."""
+    with open(path, "rb") as f:
+        magic, version, node_count, teacher_index, edge_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a v{VERSION} session trace")
+        uids = []
+        for _ in range(node_count):
+            (length,) = struct.unpack("<B", f.read(1))
+            uids.append(f.read(length).decode())
+        edges = array('I')
+        edges.fromfile(f, edge_count * 2)
+    if sys.byteorder != "little":
+        edges.byteswap()
+    return uids, teacher_index, edges
+
+
+def save_session_trace(session):
+    """
+    Dump a session's edge stream to ATTENDANCE_SESSIONS['TRACE_DIR'] (no-op if unset),
+    keeping only the newest TRACE_KEEP traces there.
+    """
+    trace_dir = session_setting("TRACE_DIR")
+    if not trace_dir or session.edges is None:
+        return None     # Off, or the session was built while capture was off
+    os.makedirs(trace_dir, exist_ok=True)
+    stamp = timezone.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(trace_dir, f"classroom_{session.classroom_id}_{session.session_id or 'live'}_{stamp}")
+    for n in itertools.count():
+        # Never overwrite: two sessions of the classroom (or two workers) may finish in the same second
+        path = f"{base}_{n}.trace" if n else f"{base}.trace"
+        try:
+            write_trace(path, session.uids, session.teacher_index, session.edges)
+            break
+        except FileExistsError:
+            continue
+    prune_traces(trace_dir, session_setting("TRACE_KEEP"))
+    return path
+
+
+def prune_traces(trace_dir, keep):
+    """Delete all but the `keep` most recently written traces in `trace_dir`. Returns the deleted paths."""
+    if keep is None:
+        return []
+    traces = []
+    with os.scandir(trace_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".trace") and entry.is_file():
+                traces.append((entry.stat().st_mtime, entry.path))
+    traces.sort(reverse=True)
+    deleted = []
+    for _, path in traces[keep:]:
+        try:
+            os.unlink(path)
+            deleted.append(path)
+        except FileNotFoundError:
+            pass    # Another worker pruned it first
+    return deleted
+
+
+# ---------------------------
+# Replay
+# ---------------------------
+class NodeUnionFind:
+    """
+    Reference implementation for replay: the original object-per-node engine.
+
+    Any implementation can be replayed as long as it has the same shape:
+        __init__(uids, teacher_index), union(a, b), connected_to_teacher(i)
+    """
+    def __init__(self, uids, teacher_index):
+        self.nodes = [Node(uid) for uid in uids]
+        self.teacher = self.nodes[teacher_index]
+
+    def union(self, a, b):
+        self.nodes[a].union(self.nodes[b])
+
+    def connected_to_teacher(self, i):
+        return self.nodes[i].find() == self.teacher
+
+
+def replay(impl_class, uids, teacher_index, edges):
+    """Apply an edge stream to a fresh implementation and return {uid: is_present}."""
+    impl = impl_class(uids, teacher_index)
+    union = impl.union
+    for k in range(0, len(edges), 2):
+        union(edges[k], edges[k + 1])
+    return {
+        uid: impl.connected_to_teacher(i)
+        for i, uid in enumerate(uids)
+        if i != teacher_index
+    }
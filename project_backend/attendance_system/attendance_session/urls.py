@@ -8,7 +8,13 @@ from .views import (
     MarkExceptionPresentView,
     FinalizeSessionView,
     ActiveSessionsView,
-    ClassroomSessionStatusView
+    ClassroomSessionHistoryView,
+    SessionReportView,
+    ClassroomAttendanceExportView,
+    FinalizeStatusView,
+    BatchFinalizeView,
+    ClassroomSessionStatusView,
+    MemoryDiagnosticsView,
 )
 #path('session/', include('attendance_session.urls')),
 urlpatterns = [
@@ -27,9 +33,23 @@ urlpatterns = [
     # Finalize attendance session
     path('teacher/classroom/<int:classroom_id>/finalize/', FinalizeSessionView.as_view(), name='finalize-session'),
 
+    # Past lectures of a classroom and the per-student report of one lecture
+    path('teacher/classroom/<int:classroom_id>/sessions/', ClassroomSessionHistoryView.as_view(), name='classroom-session-history'),
+    path('teacher/session/<int:session_id>/report/', SessionReportView.as_view(), name='session-report'),
+    path('teacher/classroom/<int:classroom_id>/attendance/export/', ClassroomAttendanceExportView.as_view(), name='classroom-attendance-export'),
+
+    # Background persistence status of a finalized session
+    path('teacher/session/<int:session_id>/finalize-status/', FinalizeStatusView.as_view(), name='finalize-status'),
+
+    # Finalize several classrooms at once (end of period)
+    path('teacher/sessions/finalize/', BatchFinalizeView.as_view(), name='batch-finalize'),
+
     # List all active sessions
     path('teacher/sessions/active/', ActiveSessionsView.as_view(), name='active-sessions'),
 
+    # Memory used by this worker's live sessions (teachers and staff)
+    path('teacher/diagnostics/memory/', MemoryDiagnosticsView.as_view(), name='memory-diagnostics'),
+
     # ---------------------------
     # Student-only endpoints
     # ---------------------------
@@ -2,113 +2,75 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+import csv
+import logging
+
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 from user.models import Student, Teacher, Classroom, AttendanceRecord
 from user.permission import IsTeacher, IsStudent
+from .diagnostics import memory_setting, memory_snapshots, process_memory, sessions_memory, top_allocators
+from .jobs import enqueue_finalize
+from .models import AttendanceSession, FinalizeJob
+from .proposal_index import apply_proposals
+from .routing import OwnerUnavailable, router
+from .session_manager import SessionManager, session_setting
+from .storage import save_attendance, save_attendance_batch, session_statuses
+from .scheduler import build_session, dormant_sessions
+from .signatures import backend as signature_backend, decode_signature
+from .throttling import BatchThrottle, ExceptionThrottle, PassTokenThrottle
+from .trace import save_session_trace
+from .warmup import cached_roster
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Persistence helpers
+# ---------------------------
+def auto_finalize_session(session, reason):
+    """
+    Called by the SessionManager when a session expires (TTL or memory budget).
+    Attendance is saved exactly as if the teacher had finalized without exceptions.
+    """
+    try:
+        classroom = Classroom.objects.get(id=session.classroom_id)
+    except Classroom.DoesNotExist:
+        logger.warning("Classroom %s deleted, dropping expired session", session.classroom_id)
+        return
+    statuses = session.finalize_statuses(late_after=session_setting("LATE_AFTER"))
+    apply_proposals([(session.started_at, statuses)])
+    if session_setting("ASYNC_FINALIZE") and session.session_id is not None:
+        enqueue_finalize(classroom.id, session.session_id, statuses)
+    else:
+        save_attendance(classroom, statuses, session.session_id)
+    save_session_trace(session)
+    logger.info("Session for classroom %s auto-finalized (%s)", session.classroom_id, reason)
+    for entry in session.flagged():
+        logger.warning("Possible proxy in classroom %s: %s", session.classroom_id, entry)
+
 
 # ---------------------------
 # Session storage (in-memory)
 # ---------------------------
 # Key: classroom_id
 # Value: SessionObject instance
-sessions = {}
+# Sharded by classroom id; stale sessions are auto-finalized in the background.
+sessions = SessionManager(on_expire=auto_finalize_session, spare=dormant_sessions)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison: compressed responses carry W/ validators)."""
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def session_index(session):
+    """Wire index of a session: position in `uids` is the integer clients send in token passes."""
+    return {"epoch": session.epoch, "uids": session.uids}
 
-# ---------------------------
-# Node & Disjoint Set (Union-Find) Objects
-# ---------------------------
-class Node:
-    """Represents a student or teacher in the attendance session using union-find for token passing."""
-    def __init__(self, uid):
-        self.uid = uid          # Unique identifier of student/teacher
-        self.parent = self      # Initially, parent is self (disjoint set root)
-        self.rank = 0           # Rank for union by rank optimization
-
-    def find(self):
-        """Find the ultimate parent of this node (with path compression)."""
-        if self.parent != self:
-            self.parent = self.parent.find()
-        return self.parent
-    def union(self, other):
-        """Union two nodes so teacher always remains root if involved."""
-        root1 = self.find()
-        root2 = other.find()
-
-        # Always make teacher the root if one is teacher
-        if 'T' in root1.uid:  # teacher UID prefix
-            root2.parent = root1
-            return
-        if 'T' in root2.uid:
-            root1.parent = root2
-            return
-
-        # Normal union by rank for students
-        if root1.rank > root2.rank:
-            root2.parent = root1
-        else:
-            root1.parent = root2
-            if root1.rank == root2.rank:
-                root2.rank += 1
-
-
-class SessionObject:
-    """Represents an active attendance session for a classroom."""
-    def __init__(self, classroom_id, teacher_uid, student_uids):
-        self.classroom_id = classroom_id
-        self.teacher_uid = teacher_uid
-        # Create Node objects for each student
-        self.nodes = {uid: Node(uid) for uid in student_uids}
-        # Create Node for teacher and add to nodes
-        self.teacher_node = Node(teacher_uid)
-        self.nodes[teacher_uid] = self.teacher_node
-        # Students without devices (exception list)
-        self.exception_list = set()
-
-    # ---------------------------
-    # Token Passing Logic
-    # ---------------------------
-    def pass_token(self, from_uid, to_uid):
-        """
-        Merge sender and receiver nodes to form a linked group.
-        Simulates student A passing token to B.
-        """
-        if from_uid not in self.nodes or to_uid not in self.nodes:
-            raise ValueError("Invalid from_uid or to_uid")
-        self.nodes[from_uid].union(self.nodes[to_uid])
-
-    # ---------------------------
-    # Exception Handling
-    # ---------------------------
-    def add_exception(self, student_uid):
-        """Add a student to exception list (no device)."""
-        if student_uid not in self.nodes:
-            raise ValueError("Invalid student UID")
-        self.exception_list.add(student_uid)
-
-    def get_exception_list(self):
-        """Return the current exception list."""
-        return list(self.exception_list)
-
-    # ---------------------------
-    # Finalize Attendance
-    # ---------------------------
-    def finalize_attendance(self, present_uids_from_exception=[]):
-        """
-        Mark attendance at session end.
-        - Students in exception list marked present by teacher are linked to teacher node.
-        - Any node whose ultimate parent is teacher → present; otherwise → absent.
-        """
-        # Link present exception students to teacher
-        for uid in present_uids_from_exception:
-            if uid in self.exception_list:
-                self.nodes[uid].union(self.teacher_node)
-
-        attendance = {}
-        # Iterate all nodes, mark present if linked to teacher
-        for uid, node in self.nodes.items():
-            if uid == self.teacher_uid:
-                continue  # Skip teacher node
-            attendance[uid] = node.find() == self.teacher_node
-        return attendance
 
 # ---------------------------
 # Teacher-only Endpoints
@@ -129,22 +91,46 @@ class StartSessionView(APIView):
         except Classroom.DoesNotExist:
             return Response({"error": "Classroom not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Initialize session with all student UIDs
-        student_uids = list(classroom.enrollments.all().values_list('student__uid', flat=True))
-        session = SessionObject(classroom_id, teacher_uid, student_uids)
+        # Timetabled classes were built ahead of time (scheduler.py); otherwise build the session
+        # with all student UIDs, device keys and usernames now
+        session = dormant_sessions.activate(classroom_id, teacher_uid)
+        if session is None:
+            session = build_session(classroom_id, teacher_uid, cached_roster(classroom_id))
+        record = AttendanceSession.objects.create(classroom=classroom, teacher=request.user.teacher)
+        session.activate(record.id, record.started_at, request.user.id)
+        if signature_backend() is None and session_setting("REQUIRE_SIGNATURES"):
+            print("[ERROR] REQUIRE_SIGNATURES is on but neither cryptography nor pycryptodome is installed")
         sessions[classroom_id] = session
-        return Response({"message": f"Session started for classroom {classroom_id}"})
+        return Response({
+            "message": f"Session started for classroom {classroom_id}",
+            "session_id": record.id,
+            **session_index(session),
+        })
 
 class PassTokenView(APIView):
-    """Student passes token to another student (A -> B)."""
+    """
+    Student passes token to another student (A -> B).
+
+    Either {"from_uid", "to_uid"} or, using the index from StartSession / status,
+    {"epoch": e, "pairs": [from0, to0, from1, to1, ...]}.
+    Passes carry the receiver's device signature ("signature", or "signatures" with
+    one entry per pair; see signatures.py), or the sender's for a pass to the teacher
+    not posted by the teacher. Once the classroom has device keys, passes with a
+    missing or bad signature are refused.
+    Retries (same pair, or same optional request_id / Idempotency-Key) are acknowledged
+    without re-running the union-find.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [PassTokenThrottle]
 
     def post(self, request, classroom_id):
+        request_id = request.data.get("request_id") or request.headers.get("Idempotency-Key")
+        if "pairs" in request.data:
+            return self._pass_indices(request, classroom_id, request_id)
+
         from_uid = request.data.get("from_uid")
         to_uid = request.data.get("to_uid")
 
-        print(f"[DEBUG] PassToken called: from_uid={from_uid}, to_uid={to_uid}")
-
         if not from_uid or not to_uid:
             print("[DEBUG] Missing from_uid or to_uid")
             return Response({"error": "from_uid and to_uid required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -154,17 +140,71 @@ class PassTokenView(APIView):
             print(f"[DEBUG] No active session for classroom {classroom_id}")
             return Response({"error": "No active session"}, status=status.HTTP_400_BAD_REQUEST)
 
+        signature = request.data.get("signature")
+        if session.keyring is not None and session.keyring.enforced:
+            a, b = session.index.get(from_uid), session.index.get(to_uid)
+            if a is not None and b is not None and not session.keyring.verify_pass(
+                session.epoch, a, b, decode_signature(signature), request.user.id == session.teacher_user_id
+            ):
+                return Response({"error": "Invalid device signature"}, status=status.HTTP_403_FORBIDDEN)
+
         try:
-            session.pass_token(from_uid, to_uid)
-            print(f"[DEBUG] Nodes after pass_token:")
-            for uid, node in session.nodes.items():
-                parent_uid = node.find().uid
-                print(f"   {uid} -> parent: {parent_uid}")
-            return Response({"message": f"Token passed {from_uid} -> {to_uid}"})
+            result = session.pass_token(from_uid, to_uid, request_id=request_id)
         except ValueError as e:
             print(f"[DEBUG] Error in pass_token: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        if result["duplicate"]:
+            return Response({"message": f"Token pass {from_uid} -> {to_uid} already recorded", **result})
+
+        print(f"[DEBUG] PassToken called: from_uid={from_uid}, to_uid={to_uid}, merged={result['merged']}")
+        if session_setting("DEBUG_DUMP"):
+            print(f"[DEBUG] Nodes after pass_token:")
+            for uid in session.uids:
+                print(f"   {uid} -> parent: {session.root_uid(uid)}")
+        return Response({"message": f"Token passed {from_uid} -> {to_uid}", **result})
+
+    def _pass_indices(self, request, classroom_id, request_id):
+        session = sessions.get(classroom_id)
+        if not session:
+            return Response({"error": "No active session"}, status=status.HTTP_400_BAD_REQUEST)
+
+        epoch = request.data.get("epoch")
+        pairs = request.data.get("pairs")
+        if epoch != session.epoch:
+            # Session was restarted: the client's index map is stale
+            return Response(
+                {"error": "Stale session epoch", **session_index(session)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if not isinstance(pairs, list):
+            return Response({"error": "pairs must be a list of indices"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session.validate_pairs(pairs)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Drop passes whose receiver signature does not verify; apply the rest
+        rejected = []
+        signatures = request.data.get("signatures")
+        if session.keyring is not None and session.keyring.enforced and request_id not in session.request_results:
+            if not isinstance(signatures, list):
+                signatures = []
+            valid = session.keyring.verify_batch(
+                epoch, pairs, [decode_signature(sig) for sig in signatures], request.user.id == session.teacher_user_id
+            )
+            rejected = [k for k, ok in enumerate(valid) if not ok]
+            if rejected:
+                pairs = [i for k, ok in enumerate(valid) if ok for i in pairs[2 * k:2 * k + 2]]
+
+        try:
+            result = session.pass_indices(epoch, pairs, request_id=request_id)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if rejected:
+            result = dict(result, rejected=rejected)
+        return Response(result)
+
 
 
 class ClassroomSessionStatusView(APIView):
@@ -183,6 +223,7 @@ class ClassroomSessionStatusView(APIView):
 class AddExceptionView(APIView):
     """student adds a student to the exception list by UID."""
     permission_classes = [permissions.IsAuthenticated] 
+    throttle_classes = [ExceptionThrottle]
 
     def post(self, request, classroom_id):
         # Take UID from request body
@@ -202,7 +243,7 @@ class AddExceptionView(APIView):
 
         try:
             session.add_exception(student_uid)
-        except Exception as e:
+        except ValueError as e:
             return Response(
                 {"error": f"Failed to add student {student_uid} to exception list: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -214,7 +255,10 @@ class AddExceptionView(APIView):
         )
 
 class GetExceptionListView(APIView):
-    """Teacher fetches exception list for classroom (UID + username)."""
+    """
+    Teacher fetches exception list for classroom (UID + username).
+    Responses carry an ETag; polling with If-None-Match gets 304 while the list is unchanged.
+    """
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
 
     def get(self, request, classroom_id):
@@ -222,15 +266,18 @@ class GetExceptionListView(APIView):
         if not session:
             return Response({"error": "No active session"}, status=status.HTTP_400_BAD_REQUEST)
 
-        exception_uids = session.get_exception_list()
-        students = Student.objects.filter(uid__in=exception_uids).select_related('user')
+        etag = session.exception_etag()
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
+        usernames = session.usernames
         exception_list = [
-            {"uid": student.uid, "username": student.user.username}
-            for student in students
+            {"uid": uid, "username": usernames[uid]}
+            for uid in session.get_exception_list()
+            if uid in usernames
         ]
 
-        return Response({"exception_list": exception_list})
+        return Response({"exception_list": exception_list}, headers={"ETag": etag})
 
 # class GetExceptionListView(APIView):
 #     """Teacher fetches exception list for classroom."""
@@ -274,12 +321,21 @@ class MarkExceptionPresentView(APIView):
             if uid not in enrolled_uids:
                 return Response({"error": f"UID {uid} not enrolled in this classroom"}, status=status.HTTP_400_BAD_REQUEST)
             # Union student node with teacher node
-            session.nodes[uid].union(session.teacher_node)
+            try:
+                session.mark_present(uid)
+            except ValueError as e:
+                return Response({"error": f"UID {uid}: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": f"{len(present_uids)} students marked present"})
 
 
 
+def summarize(statuses):
+    """Attendance summary of a snapshot, computed without touching the DB."""
+    present = sum(1 for st in statuses.values() if st in ("PRESENT", "LATE"))
+    return {"total_students": len(statuses), "present": present, "absent": len(statuses) - present}
+
+
 class FinalizeSessionView(APIView):
     """Teacher finalizes attendance session and returns attendance summary."""
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
@@ -288,10 +344,12 @@ class FinalizeSessionView(APIView):
         present_uids_from_exception = request.data.get("present_uids", [])
         print(f"[DEBUG] FinalizeSession called with present_uids_from_exception={present_uids_from_exception}")
 
-        session = sessions.get(classroom_id)
+        # Taken out of the manager first: a concurrent finalize or the reaper cannot save it twice
+        session = sessions.pop(classroom_id, None)
         if not session:
             print(f"[DEBUG] No active session for classroom {classroom_id}")
             return Response({"error": "No active session"}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info("Session for classroom %s removed from memory", classroom_id)
 
         # Fetch classroom
         try:
@@ -301,49 +359,338 @@ class FinalizeSessionView(APIView):
             return Response({"error": "Classroom not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Compute attendance
-        results = session.finalize_attendance(present_uids_from_exception)
+        statuses = session.finalize_statuses(present_uids_from_exception, session_setting("LATE_AFTER"))
         print("[DEBUG] Attendance results:")
-        for uid, is_present in results.items():
-            print(f"   {uid}: {'PRESENT' if is_present else 'ABSENT'}")
+        for uid, st in statuses.items():
+            print(f"   {uid}: {st}")
 
-        today = timezone.now().date()
+        # Absent students covered by an approved / pending absence proposal
+        apply_proposals([(session.started_at, statuses)])
 
-        # Save attendance in DB
-        for uid, is_present in results.items():
-            student = Student.objects.get(uid=uid)
-            AttendanceRecord.objects.create(
-                student=student,
-                classroom=classroom,
-                date=today,
-                status="PRESENT" if is_present else "ABSENT"
-    )
+        # Save attendance in DB (or hand it to the background queue)
+        job = None
+        if session_setting("ASYNC_FINALIZE") and session.session_id is not None:
+            job = enqueue_finalize(classroom_id, session.session_id, statuses)
+        else:
+            save_attendance(classroom, statuses, session.session_id)
+        save_session_trace(session)
 
-        # Remove session from memory
-        del sessions[classroom_id]
-        print(f"[DEBUG] Session for classroom {classroom_id} removed from memory")
+        # --- Attendance summary (from the snapshot, no extra queries) ---
+        summary = summarize(statuses)
+        print(f"[DEBUG] Summary: {summary}")
 
-        # --- Attendance summary ---
-        total_students = classroom.enrollments.count()
-        total_present = sum(1 for status in results.values() if status)
-        total_absent = total_students - total_present
+        response = {
+            "message": f"Attendance finalized for classroom {classroom_id}",
+            "session_id": session.session_id,
+            "summary": summary,
+            "flagged": session.flagged(),
+        }
+        if job is not None:
+            response["persistence"] = {"job_id": job.id, "status": job.status}
+        return Response(response)
 
-        print(f"[DEBUG] Summary: total_students={total_students}, present={total_present}, absent={total_absent}")
 
+class BatchFinalizeView(APIView):
+    """
+    Teacher finalizes several classrooms at once (end of a period).
+    Body: {"classrooms": [{"classroom_id": 1, "present_uids": [...]}, ...]}
+    All sessions are persisted together: one roster lookup and one bulk write,
+    or one queued job each when ASYNC_FINALIZE is on.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+    throttle_classes = [BatchThrottle]
+
+    def post(self, request):
+        entries = request.data.get("classrooms", [])
+        if not isinstance(entries, list) or not entries:
+            return Response({"error": "classrooms list required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested = {}
+        for entry in entries:
+            try:
+                requested[int(entry["classroom_id"])] = entry.get("present_uids", [])
+            except (KeyError, TypeError, ValueError):
+                return Response({"error": f"Invalid entry: {entry}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Classrooms whose session lives on another worker are finalized there (one request per worker)
+        remote = {}
+        if router.fans_out(request):
+            for classroom_id in list(requested):
+                owner = router.route(classroom_id)
+                if owner is not None:
+                    remote.setdefault(owner, []).append(
+                        {"classroom_id": classroom_id, "present_uids": requested.pop(classroom_id)}
+                    )
+
+        owned = set(Classroom.objects.filter(
+            id__in=list(requested), teacher=request.user.teacher
+        ).values_list("id", flat=True))
+
+        results, batch, finalized = {}, [], []
+        for classroom_id, present_uids in requested.items():
+            if classroom_id not in owned:
+                results[classroom_id] = {"error": "Classroom not found"}
+                continue
+            session = sessions.pop(classroom_id, None)
+            if not session:
+                results[classroom_id] = {"error": "No active session"}
+                continue
+            statuses = session.finalize_statuses(present_uids, session_setting("LATE_AFTER"))
+            batch.append((classroom_id, session.session_id, statuses))
+            finalized.append(session)
+            results[classroom_id] = {"session_id": session.session_id, "flagged": session.flagged()}
+
+        # One proposal lookup for every classroom of the batch
+        apply_proposals([(session.started_at, statuses) for session, (_, _, statuses) in zip(finalized, batch)])
+        for classroom_id, _, statuses in batch:
+            results[classroom_id]["summary"] = summarize(statuses)
+
+        if session_setting("ASYNC_FINALIZE"):
+            for classroom_id, session_id, statuses in batch:
+                if session_id is None:
+                    save_attendance_batch([(classroom_id, session_id, statuses)])
+                    continue
+                job = enqueue_finalize(classroom_id, session_id, statuses)
+                results[classroom_id]["persistence"] = {"job_id": job.id, "status": job.status}
+        elif batch:
+            save_attendance_batch(batch)
+        for session in finalized:
+            save_session_trace(session)
+
+        finalized_count = len(batch)
+        for owner, share in remote.items():
+            try:
+                status_code, data = router.call(owner, request, {"classrooms": share})
+            except OwnerUnavailable as e:
+                print(f"[ERROR] Batch finalize on {owner}: {e}")
+                status_code, data = e.status, None
+            if status_code >= 400 or not data or "results" not in data:
+                for entry in share:
+                    results[entry["classroom_id"]] = {"error": "Session owner unavailable, retry"}
+                continue
+            finalized_count += data["finalized"]
+            results.update((result.pop("classroom_id"), result) for result in data["results"])
+
+        print(f"[DEBUG] Batch finalize: {finalized_count} of {len(results)} classrooms finalized")
         return Response({
-            "message": f"Attendance finalized for classroom {classroom_id}",
-            "summary": {
-                "total_students": total_students,
-                "present": total_present,
-                "absent": total_absent,
+            "finalized": finalized_count,
+            "results": [{"classroom_id": cid, **result} for cid, result in results.items()],
+        })
+
+
+class FinalizeStatusView(APIView):
+    """Teacher checks whether a finalized session has been written to the database."""
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get(self, request, session_id):
+        job = FinalizeJob.objects.filter(
+            session_id=session_id, classroom__teacher=request.user.teacher
+        ).first()
+        if job is None:
+            lecture = AttendanceSession.objects.filter(
+                id=session_id, classroom__teacher=request.user.teacher
+            ).first()
+            if lecture is None:
+                return Response({"error": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
+            # Finalized synchronously (or still live)
+            return Response({
+                "session_id": lecture.id,
+                "status": "DONE" if lecture.finalized_at else "LIVE",
+            })
+        return Response({
+            "session_id": job.session_id,
+            "job_id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "last_error": job.last_error,
+            "finished_at": job.finished_at,
+        })
+
+class ClassroomSessionHistoryView(APIView):
+    """Teacher lists past and live lectures (sessions) of one of their classrooms."""
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get(self, request, classroom_id):
+        if not Classroom.objects.filter(id=classroom_id, teacher=request.user.teacher).exists():
+            return Response({"error": "Classroom not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        rows = AttendanceSession.objects.filter(classroom_id=classroom_id).values(
+            "id", "started_at", "finalized_at", "total_students", "present_count", "absent_count"
+        )
+        return Response({"sessions": list(rows)})
+
+
+class SessionReportView(APIView):
+    """Teacher fetches the per-student attendance of a single lecture."""
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get(self, request, session_id):
+        try:
+            lecture = AttendanceSession.objects.get(id=session_id, classroom__teacher=request.user.teacher)
+        except AttendanceSession.DoesNotExist:
+            return Response({"error": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        records = list(AttendanceRecord.objects.filter(session_id=session_id).values(
+            "student__uid", "student__user__username", "status"
+        ))
+        if not records and lecture.status_vector is not None:
+            # Packed storage: decode the status vector against its roster
+            packed = session_statuses(lecture)
+            names = {
+                s["id"]: s for s in Student.objects.filter(id__in=[pk for pk, _ in packed]).values(
+                    "id", "uid", "user__username"
+                )
             }
+            records = [
+                {"student__uid": names[pk]["uid"], "student__user__username": names[pk]["user__username"], "status": st}
+                for pk, st in packed if pk in names
+            ]
+        return Response({
+            "session_id": lecture.id,
+            "classroom_id": lecture.classroom_id,
+            "started_at": lecture.started_at,
+            "finalized_at": lecture.finalized_at,
+            "summary": {
+                "total_students": lecture.total_students,
+                "present": lecture.present_count,
+                "absent": lecture.absent_count,
+            },
+            "records": [
+                {"uid": r["student__uid"], "username": r["student__user__username"], "status": r["status"]}
+                for r in records
+            ],
         })
 
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+class ClassroomAttendanceExportView(APIView):
+    """
+    Teacher downloads every attendance mark of a classroom as CSV.
+    Rows are streamed from the DB (compressed on the fly by CompressionMiddleware),
+    so the export never sits in memory as a whole.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get(self, request, classroom_id):
+        classroom = Classroom.objects.filter(id=classroom_id, teacher=request.user.teacher).first()
+        if not classroom:
+            return Response({"error": "Classroom not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(self._rows(classroom_id), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="attendance_{classroom.code}.csv"'
+        return response
+
+    def _rows(self, classroom_id):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["session_id", "date", "uid", "username", "status"])
+
+        records = AttendanceRecord.objects.filter(classroom_id=classroom_id).values_list(
+            "session_id", "date", "student__uid", "student__user__username", "status"
+        ).order_by("date", "timestamp")
+        for row in records.iterator(chunk_size=2000):
+            yield writer.writerow(row)
+
+        # Packed storage: lectures that only have a status vector
+        lectures = AttendanceSession.objects.filter(
+            classroom_id=classroom_id, status_vector__isnull=False
+        ).exclude(id__in=AttendanceRecord.objects.filter(session__classroom_id=classroom_id).values("session_id"))
+        names = {}
+        for lecture in lectures.select_related("roster").order_by("started_at").iterator(chunk_size=100):
+            packed = session_statuses(lecture)
+            missing = [pk for pk, _ in packed if pk not in names]
+            if missing:
+                # Rosters rarely change between lectures, so this runs about once per roster version
+                names.update(
+                    (pk, (uid, username))
+                    for pk, uid, username in Student.objects.filter(id__in=missing).values_list("id", "uid", "user__username")
+                )
+            day = timezone.localdate(lecture.started_at)
+            for pk, st in packed:
+                if pk in names:
+                    yield writer.writerow([lecture.id, day, *names[pk], st])
+
+
 class ActiveSessionsView(APIView):
-    """Teacher can see all active sessions (debugging / monitoring)."""
+    """
+    Teacher can see all active sessions (debugging / monitoring).
+    With routing on, every worker is asked and the answers are merged.
+    """
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
 
     def get(self, request):
-        return Response({"active_sessions": list(sessions.keys())})
+        details = [
+            {
+                "classroom_id": classroom_id,
+                "nodes": len(session),
+                "idle_seconds": int(sessions.idle_seconds(classroom_id) or 0),
+                **({"worker": router.name} if router.active else {}),
+            }
+            for classroom_id, session in sessions.items()
+        ]
+        dormant = dormant_sessions.keys()
+        response = {}
+        if router.fans_out(request):
+            unreachable = []
+            for worker, data in router.gather(request).items():
+                if data is None:
+                    unreachable.append(worker)
+                    continue
+                details.extend(data["sessions"])
+                dormant.extend(data["dormant_sessions"])
+            response["unreachable_workers"] = unreachable
+        return Response({
+            "active_sessions": [d["classroom_id"] for d in details],
+            "sessions": details,
+            "total_nodes": sum(d["nodes"] for d in details),
+            "dormant_sessions": dormant,
+            **response,
+        })
+
+
+class MemoryDiagnosticsView(APIView):
+    """
+    Staff check this worker's memory: size of every live session (largest first),
+    process RSS, the top allocation sites when tracemalloc runs, and recent periodic snapshots.
+    Staff only: the report covers every classroom and the server's source paths.
+    With routing on, the other workers' reports are listed under "other_workers" (None when
+    a worker did not answer). GET ?top=<n> sets how many allocation sites are listed (n >= 1).
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            top = int(request.query_params.get("top", memory_setting("TOP")))
+        except ValueError:
+            top = 0
+        if top < 1:
+            return Response({"error": "top must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = sessions_memory()
+        response = {}
+        if router.active:
+            response["worker"] = router.name
+        if router.fans_out(request):
+            response["other_workers"] = router.gather(request)
+        return Response({
+            **response,
+            "process": process_memory(),
+            "totals": {
+                "sessions": len(report),
+                "nodes": sum(s["nodes"] for s in report),
+                "exceptions": sum(s["exceptions"] for s in report),
+                "bytes": sum(s["bytes"] for s in report),
+            },
+            "sessions": report,
+            "stale_sessions": [s["classroom_id"] for s in report if s["stale"]],
+            "dormant_sessions": len(dormant_sessions),
+            "top_allocators": top_allocators(top),
+            "snapshots": memory_snapshots.recent(),
+        })
 
 
 # ---------------------------
@@ -356,7 +703,8 @@ class ClassroomSessionStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, classroom_id):
-        if classroom_id in sessions:
-            return Response({"active": True, "message": "Attendance session is active"})
+        session = sessions.get(classroom_id)
+        if session:
+            return Response({"active": True, "message": "Attendance session is active", **session_index(session)})
         else:
             return Response({"active": False, "message": "No active attendance session"}, status=status.HTTP_200_OK)
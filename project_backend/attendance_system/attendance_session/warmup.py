@@ -0,0 +1,191 @@
+# attendance_session/warmup.py
+"""
+Warm worker start.
+
+The first StartSession of a classroom after a deploy used to pay for importing
+the view modules, the roster query (enrollments x students x users) and parsing
+every device key. warm_worker() does that work before the worker takes traffic:
+it loads the URLconf (and with it every view module) and preloads the rosters
+of classrooms whose timetable has a slot starting within WARMUP['HORIZON']
+minutes (or currently running).
+
+Run it from gunicorn (see gunicorn.conf.py: post_worker_init) or, for other
+servers, set WARMUP['ON_READY'] to run it on a background thread from
+AppConfig.ready. It also starts the session pre-creation scheduler (scheduler.py)
+and the periodic memory snapshots (diagnostics.py).
+
+Cached rosters are checked on use: they are reloaded when older than
+WARMUP['ROSTER_TTL'] or when the classroom's enrollments changed (count and
+highest change_seq, one indexed aggregate). Device key or username changes made
+in another worker are only picked up after the TTL.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import DatabaseError, connection
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from user.models import Enrollment, Student, TimetableSlot
+from .session_manager import session_setting
+from .signatures import backend as signature_backend, parse_keys
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "HORIZON": 30,          # Minutes ahead whose classrooms are preloaded
+    "ROSTER_TTL": 600,      # Seconds a cached roster is trusted (still checked against enrollments)
+    "MAX_ROSTERS": 512,     # Cached rosters per process
+    "ON_READY": False,      # Warm from AppConfig.ready (servers without the gunicorn hook)
+}
+
+_rosters = OrderedDict()
+_lock = threading.Lock()
+
+
+def warmup_setting(name):
+    return (session_setting("WARMUP") or {}).get(name, DEFAULTS[name])
+
+
+# ---------------------------
+# Rosters
+# ---------------------------
+class Roster:
+    """What StartSessionView needs about a classroom's students: UIDs, usernames, parsed device keys."""
+    def __init__(self, classroom_id, rows):
+        self.classroom_id = classroom_id
+        self.uids = []
+        self.usernames = {}
+        auth_keys = {}
+        seq = 0
+        for uid, auth_key, username, change_seq in rows:
+            self.uids.append(uid)
+            self.usernames[uid] = username
+            auth_keys[uid] = auth_key
+            seq = max(seq, change_seq)
+        self.verifiers = parse_keys(auth_keys)
+        self.fingerprint = (len(self.uids), seq)
+        self.loaded_at = time.monotonic()
+
+
+ROSTER_FIELDS = ('student__uid', 'student__auth_key', 'student__user__username', 'change_seq')
+
+
+def roster_fingerprint(classroom_id):
+    """(enrollment count, highest change_seq): changes whenever a student is enrolled or removed."""
+    agg = Enrollment.objects.filter(classroom_id=classroom_id).aggregate(count=Count('id'), seq=Max('change_seq'))
+    return (agg['count'], agg['seq'] or 0)
+
+
+def load_roster(classroom_id):
+    roster = Roster(classroom_id, Enrollment.objects.filter(classroom_id=classroom_id).values_list(*ROSTER_FIELDS))
+    _store(roster)
+    return roster
+
+
+def load_rosters(classroom_ids):
+    """Rosters of several classrooms in one query."""
+    rows = {cid: [] for cid in classroom_ids}
+    for classroom_id, *row in Enrollment.objects.filter(classroom_id__in=classroom_ids).values_list(
+        'classroom_id', *ROSTER_FIELDS
+    ):
+        rows[classroom_id].append(row)
+    rosters = [Roster(cid, classroom_rows) for cid, classroom_rows in rows.items()]
+    for roster in rosters:
+        _store(roster)
+    return rosters
+
+
+def cached_roster(classroom_id):
+    """Warmed roster if still valid, else a freshly loaded one (which is cached for the next start)."""
+    with _lock:
+        roster = _rosters.get(classroom_id)
+    if (
+        roster is not None
+        and time.monotonic() - roster.loaded_at < warmup_setting("ROSTER_TTL")
+        and roster_fingerprint(classroom_id) == roster.fingerprint
+    ):
+        return roster
+    return load_roster(classroom_id)
+
+
+def _store(roster):
+    with _lock:
+        _rosters[roster.classroom_id] = roster
+        _rosters.move_to_end(roster.classroom_id)
+        while len(_rosters) > warmup_setting("MAX_ROSTERS"):
+            _rosters.popitem(last=False)
+
+
+def invalidate_roster(classroom_id=None):
+    with _lock:
+        if classroom_id is None:
+            _rosters.clear()
+        else:
+            _rosters.pop(classroom_id, None)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def _enrollment_changed(sender, instance, **kwargs):
+    invalidate_roster(instance.classroom_id)
+
+
+@receiver(post_save, sender=Student)
+def _student_changed(sender, instance, **kwargs):
+    # Device key or profile change: rare, so simply drop every roster of this process
+    invalidate_roster()
+
+
+# ---------------------------
+# Timetable
+# ---------------------------
+def upcoming_classroom_ids(now=None, horizon=None):
+    """Classrooms with a timetable slot running now or starting within `horizon` minutes."""
+    now = timezone.localtime(now or timezone.now())
+    end = now + timedelta(minutes=warmup_setting("HORIZON") if horizon is None else horizon)
+    today, current = now.weekday(), now.time()
+
+    running = Q(weekday=today, start_time__lte=current, end_time__gt=current)
+    if end.date() == now.date():
+        starting = Q(weekday=today, start_time__gt=current, start_time__lte=end.time())
+    else:
+        starting = Q(weekday=today, start_time__gt=current) | Q(weekday=end.weekday(), start_time__lte=end.time())
+    return list(TimetableSlot.objects.filter(running | starting).values_list('classroom_id', flat=True).distinct())
+
+
+# ---------------------------
+# Hooks
+# ---------------------------
+def warm_rosters(now=None):
+    """Preload the rosters of upcoming classrooms (owned by this worker). Returns how many were loaded."""
+    from .routing import router
+    classroom_ids = [cid for cid in upcoming_classroom_ids(now) if router.owns(cid)]
+    return len(load_rosters(classroom_ids)) if classroom_ids else 0
+
+
+def warm_worker():
+    """Worker start hook: import the request path, start the background threads, preload upcoming rosters."""
+    start = time.perf_counter()
+    from django.urls import get_resolver
+    get_resolver().url_patterns     # Imports every view module now rather than on the first request
+    signature_backend()
+    if session_setting("PRECREATE") is not None:
+        from .scheduler import dormant_sessions
+        dormant_sessions.start()
+    from .diagnostics import memory_setting, memory_snapshots
+    if memory_setting("SNAPSHOT_INTERVAL"):
+        memory_snapshots.start()
+    try:
+        count = warm_rosters()
+    except DatabaseError as e:
+        logger.error("Roster warmup skipped: %s", e)
+        return
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+    logger.info("Worker warmed in %.0f ms (%d rosters)", (time.perf_counter() - start) * 1000, count)
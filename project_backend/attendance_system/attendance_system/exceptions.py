@@ -0,0 +1,21 @@
+# attendance_system/exceptions.py
+"""
+DRF exception handler: DRF's own, plus a retryable 503 for a live session that
+was handed to another worker while the request held it (routing.py). The
+retry is routed to the new owner.
+"""
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from attendance_session.engine import SessionClosed
+
+
+def exception_handler(exc, context):
+    if isinstance(exc, SessionClosed):
+        return Response(
+            {"error": f"Session {exc}, retry"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,131 @@
+# attendance_system/middleware.py
+"""
+Response compression negotiated from Accept-Encoding.
+
+brotli is used when the client accepts it and the optional `brotli` package is
+installed, gzip otherwise. Responses smaller than RESPONSE_COMPRESSION['MIN_SIZE']
+are sent as is; streaming responses (exports) are compressed chunk by chunk.
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULTS = {
+    "MIN_SIZE": 1024,       # Bytes; smaller bodies are not worth the CPU
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 5,    # 0-11; 4-6 is the usual speed / size trade-off for dynamic responses
+}
+
+# Already compressed payloads
+SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/pdf")
+
+_accept_re = re.compile(r"\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+def compression_setting(name):
+    return getattr(settings, "RESPONSE_COMPRESSION", {}).get(name, DEFAULTS[name])
+
+
+def negotiate(accept_encoding):
+    """Best supported content coding for an Accept-Encoding header, or None."""
+    offered = {}
+    for token in accept_encoding.split(","):
+        match = _accept_re.match(token)
+        if not match:
+            continue
+        try:
+            q = float(match.group(2)) if match.group(2) is not None else 1.0
+        except ValueError:
+            continue
+        offered[match.group(1).lower()] = q
+    wildcard = offered.get("*", 0)
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if offered.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+# ---------------------------
+# Compressors (same interface for both codings)
+# ---------------------------
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(compression_setting("GZIP_LEVEL"), zlib.DEFLATED, 31)   # 31 = gzip container
+
+    def process(self, data):
+        return self._z.compress(data)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._b = brotli.Compressor(quality=compression_setting("BROTLI_QUALITY"))
+
+    def process(self, data):
+        return self._b.process(data)
+
+    def finish(self):
+        return self._b.finish()
+
+
+COMPRESSORS = {"gzip": _Gzip, "br": _Brotli}
+
+
+def compress(coding, data):
+    compressor = COMPRESSORS[coding]()
+    return compressor.process(data) + compressor.finish()
+
+
+def compress_stream(coding, chunks):
+    compressor = COMPRESSORS[coding]()
+    for chunk in chunks:
+        out = compressor.process(chunk)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header("Content-Encoding") or response.get("Content-Type", "").startswith(SKIP_TYPES):
+            return response
+        if not response.streaming and len(response.content) < compression_setting("MIN_SIZE"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(coding, response.streaming_content)
+            del response["Content-Length"]
+        else:
+            body = compress(coding, response.content)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response["Content-Length"] = str(len(body))
+
+        # The body changed, so a strong validator no longer matches byte for byte
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = coding
+        return response
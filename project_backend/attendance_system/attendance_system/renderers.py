@@ -0,0 +1,53 @@
+# attendance_system/renderers.py
+"""
+Response renderers.
+
+ORJSONRenderer: JSON backed by orjson (optional dependency: `pip install orjson`).
+Produces the same compact UTF-8 JSON as DRF's JSONRenderer. Without orjson,
+or when indentation is requested (browsable API), it falls back to DRF's
+encoder, so the setting is safe on any install.
+
+MessagePackRenderer: `Accept: application/msgpack` (optional dependency:
+`pip install msgpack`). Only registered in settings when msgpack is installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Types orjson does not know (Decimal, lazy strings, QuerySet...) and datetimes
+    # (DRF trims microseconds and writes "Z") go through DRF's encoder
+    _fallback = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=self._fallback, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Same data as the JSON responses, MessagePack encoded (binary, no repeated quoting)."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    # Values msgpack cannot pack become what they would be in JSON (datetimes as ISO strings, ...)
+    _fallback = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self._fallback, use_bin_type=True, strict_types=False)
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 # External apps
 EXTERNAL_APPS = [
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',   # Rotated device refresh tokens (user/login.py)
 ]
 
 # Internal apps
@@ -58,6 +59,10 @@ INSTALLED_APPS += EXTERNAL_APPS + INTERNAL_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # gzip / brotli above RESPONSE_COMPRESSION['MIN_SIZE'], streamed for exports
+    'attendance_system.middleware.CompressionMiddleware',
+    # Forwards classroom session requests to the owning worker (only when ATTENDANCE_SESSIONS['ROUTING'] is set)
+    'attendance_session.routing.ClassroomRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -137,11 +142,25 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+try:
+    import msgpack  # noqa: F401  optional: `Accept: application/msgpack` for the mobile app
+    _MSGPACK_RENDERER = ("attendance_system.renderers.MessagePackRenderer",)
+except ImportError:
+    _MSGPACK_RENDERER = ()
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     'DATETIME_FORMAT': "%Y-%m-%dT%H:%M:%S%z",
+    # orjson when installed, DRF's JSON encoder otherwise; MessagePack on request
+    "DEFAULT_RENDERER_CLASSES": (
+        "attendance_system.renderers.ORJSONRenderer",
+        *_MSGPACK_RENDERER,
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    # 503 + Retry-After for sessions moved to another worker mid-request
+    "EXCEPTION_HANDLER": "attendance_system.exceptions.exception_handler",
 }
 
 SIMPLE_JWT = {
@@ -149,6 +168,98 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),      # Refresh token valid for 7 days
 }
 
+# Refresh tokens issued to a phone that sent a device_id at login (see user/login.py)
+DEVICE_REFRESH_LIFETIME = timedelta(days=90)
+
+# Password checks of login/ are admitted per process so all workers together use each CPU once (see user/login.py)
+LOGIN_ADMISSION = {
+    "PROCESSES": None,      # Gunicorn --workers on this host (None = $WEB_CONCURRENCY or 1)
+    "CONCURRENT": None,     # None = CPUs / PROCESSES
+    "WAIT": 2,              # Seconds a login may wait for a slot
+    "RETRY_AFTER": 3,
+}
+
+# Seconds before the per-process enrollment bitset index is rebuilt from the DB
+ENROLLMENT_INDEX_MAX_AGE = 60
+
+# Processes used to hash passwords during bulk CSV imports (None = one per CPU)
+BULK_IMPORT_WORKERS = None
+
+# Response compression (see attendance_system/middleware.py); brotli needs `pip install brotli`
+RESPONSE_COMPRESSION = {
+    "MIN_SIZE": 1024,
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 5,
+}
+
+# In-memory attendance sessions (see attendance_session/session_manager.py)
+ATTENDANCE_SESSIONS = {
+    "SHARDS": 16,                       # Lock shards, keyed by classroom id
+    "TTL": timedelta(hours=3),          # Idle sessions are auto-finalized after this
+    "MAX_NODES": 200_000,               # Memory budget across live and pre-created sessions
+    "REAP_INTERVAL": 30,                # Seconds between background expiry sweeps
+    "TRACE_DIR": None,                  # Edge-stream traces for replay_traces, e.g. os.path.join(BASE_DIR, 'session_traces')
+    "TRACE_KEEP": 1000,                 # Newest trace files kept in TRACE_DIR
+    "STORAGE": "rows",                  # "rows" (AttendanceRecord), "bitmap" (packed per session) or "both"
+    "ASYNC_FINALIZE": False,            # True: finalize returns at once and queues the write. Only turn it on
+                                        # with `manage.py run_finalize_worker` running, or nothing is persisted
+    "FINALIZE_MAX_ATTEMPTS": 5,         # Retries before a queued finalize is marked FAILED
+    "FINALIZE_LEASE": 300,              # Seconds before a job held by a dead worker is retried
+    "FINALIZE_BATCH_WINDOW": 2,         # Coalesce finalizes from the same bell into one transaction
+    "REQUIRE_SIGNATURES": False,        # Classrooms with device keys always verify; True: verify in every classroom
+    "VERIFY_THREADS": 4,                # Signature checks of large pass batches run on this many threads
+    "THROTTLE": {                       # Token buckets per user and classroom: RATE tokens/s, BURST max
+        "pass_token": {"RATE": 10, "BURST": 50},    # A batched pass costs one token per pair
+        "exception": {"RATE": 1, "BURST": 10},
+        "batch": {"RATE": 0.2, "BURST": 5},
+    },
+    "THROTTLE_CACHE": None,             # Cache alias to share buckets across workers (None = per process)
+    "LATE_AFTER": None,                 # Grace window in seconds; students reaching the teacher later are LATE.
+                                        # Leave room for the pass chain itself to cross the room (e.g. 15 * 60)
+    "ANOMALY": {                        # Flag devices that pass like a proxy (None = detector off)
+        "MAX_OUT_DEGREE": 12,           # Distinct classmates one device passed to
+        "BURST_PASSES": 6,              # Passes inside BURST_WINDOW seconds
+        "BURST_WINDOW": 10,
+    },
+    "WARMUP": {                         # Preload rosters of classrooms on the timetable (see warmup.py)
+        "HORIZON": 30,                  # Minutes ahead
+        "ROSTER_TTL": 600,              # Seconds a preloaded roster is trusted
+        "ON_READY": False,              # True when not running under gunicorn (gunicorn.conf.py warms instead)
+    },
+    "PRECREATE": {                      # Build sessions of timetabled classes ahead of time (None = off)
+        "LEAD": 10,                     # Minutes before the slot starts
+        "GRACE": 20,                    # Minutes after the start an unused session is dropped
+        "WITHOUT_ROUTING": False,       # Also pre-create with ROUTING off; single-process servers only
+    },
+    "ROUTING": None,                    # Several workers: {} (or {"SOCKET_DIR": ...}) gives each classroom
+                                        # one owner worker holding its session (see attendance_session/routing.py)
+    "MEMORY": {                         # Memory diagnostics (see attendance_session/diagnostics.py)
+        "TRACEMALLOC": 0,               # Frames per traced allocation; 0 = off (tracing slows every allocation)
+        "SNAPSHOT_INTERVAL": None,      # Seconds between per-worker snapshots, e.g. 300 (None = off)
+        "SNAPSHOT_DIR": os.path.join(BASE_DIR, 'memory_snapshots'),   # Read by `manage.py memory_report`
+    },
+    "DEBUG_DUMP": False,                # Log the whole union-find after every pass (slow, debugging only)
+}
+
+# Session reaper, scheduler, routing and finalize jobs log under "attendance_session"
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "worker": {"format": "%(asctime)s [%(levelname)s] %(process)d %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "worker"},
+    },
+    "loggers": {
+        "attendance_session": {
+            "handlers": ["console"],
+            "level": os.environ.get("ATTENDANCE_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 
 # BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -0,0 +1,15 @@
+# gunicorn.conf.py (picked up automatically when gunicorn runs from this directory)
+
+
+def post_worker_init(worker):
+    """Join the classroom ring, then import the views and preload upcoming rosters before taking traffic."""
+    from attendance_session.routing import start_router
+    from attendance_session.warmup import warm_worker
+    start_router()
+    warm_worker()
+
+
+def worker_exit(server, worker):
+    """Hand this worker's live sessions to their new owners."""
+    from attendance_session.routing import router
+    router.leave()
@@ -1,9 +1,15 @@
 from django.contrib import admin
-from .models import AbsenceProposal, Student, Teacher, Classroom, Enrollment, AttendanceRecord
+from .models import (
+    AbsenceProposal, Student, Teacher, Classroom, Enrollment, AttendanceRecord, ChangeSequence, SyncTombstone,
+    TimetableSlot,
+)
 
 admin.site.register(Student)
 admin.site.register(Teacher)
 admin.site.register(Classroom)
+admin.site.register(TimetableSlot)
 admin.site.register(Enrollment)
 admin.site.register(AttendanceRecord)
 admin.site.register(AbsenceProposal)
+admin.site.register(ChangeSequence)
+admin.site.register(SyncTombstone)
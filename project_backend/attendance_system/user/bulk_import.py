@@ -0,0 +1,167 @@
+# user/bulk_import.py
+"""
+Bulk student onboarding from CSV.
+
+Expected columns: username, password, uid, branch (auth_key optional).
+Rows are validated in batches against the DB, passwords are hashed on a
+process pool, and each chunk is written with bulk_create in one transaction.
+"""
+import csv
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .enrollment_index import enrollment_index
+from .models import Enrollment, Student
+from .sync import next_change_seq
+
+REQUIRED_COLUMNS = ("username", "password", "uid", "branch")
+DEFAULT_CHUNK_SIZE = 500
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ---------------------------
+# Password hashing pool
+# ---------------------------
+def init_hash_worker():
+    """Pool initializer: make sure Django settings (PASSWORD_HASHERS) are loaded in spawned workers."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def get_hash_pool():
+    """Process pool shared by every import in this process (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "BULK_IMPORT_WORKERS", None),
+                initializer=init_hash_worker,
+            )
+        return _pool
+
+
+# ---------------------------
+# Import
+# ---------------------------
+def import_students(stream, classroom=None, chunk_size=DEFAULT_CHUNK_SIZE, pool=None):
+    """
+    Import students from a text stream of CSV rows.
+    Optionally enroll every created student in `classroom`.
+
+    Returns {"created": int, "enrolled": int, "errors": [{"row", "uid", "errors"}]}.
+    """
+    reader = csv.DictReader(stream)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+
+    pool = pool or get_hash_pool()
+    report = {"created": 0, "enrolled": 0, "errors": []}
+    seen_uids, seen_usernames = set(), set()
+    rows = enumerate(reader, start=2)  # row 1 is the header
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid = _validate_chunk(chunk, seen_uids, seen_usernames, report)
+        if valid:
+            _write_chunk(valid, classroom, pool, report)
+
+    if classroom is not None and report["enrolled"]:
+        enrollment_index.invalidate()  # bulk_create sends no post_save signals
+    return report
+
+
+def _error(report, line_no, row, *errors):
+    report["errors"].append({"row": line_no, "uid": (row.get("uid") or "").strip(), "errors": list(errors)})
+
+
+def _validate_chunk(chunk, seen_uids, seen_usernames, report):
+    """Per-row checks plus one uid and one username lookup for the whole chunk."""
+    candidates = []
+    for line_no, row in chunk:
+        row = {k: (v or "").strip() for k, v in row.items() if k}
+        errors = [f"{c} is required" for c in REQUIRED_COLUMNS if not row.get(c)]
+        if len(row.get("uid", "")) > Student._meta.get_field("uid").max_length:
+            errors.append("uid is too long")
+        if len(row.get("branch", "")) > Student._meta.get_field("branch").max_length:
+            errors.append("branch is too long")
+        if len(row.get("username", "")) > User._meta.get_field("username").max_length:
+            errors.append("username is too long")
+        if row.get("uid") in seen_uids:
+            errors.append("duplicate uid in file")
+        if row.get("username") in seen_usernames:
+            errors.append("duplicate username in file")
+        if errors:
+            _error(report, line_no, row, *errors)
+            continue
+        seen_uids.add(row["uid"])
+        seen_usernames.add(row["username"])
+        candidates.append((line_no, row))
+
+    taken_uids = set(Student.objects.filter(uid__in=[r["uid"] for _, r in candidates]).values_list("uid", flat=True))
+    taken_usernames = set(
+        User.objects.filter(username__in=[r["username"] for _, r in candidates]).values_list("username", flat=True)
+    )
+    valid = []
+    for line_no, row in candidates:
+        errors = []
+        if row["uid"] in taken_uids:
+            errors.append("uid already registered")
+        if row["username"] in taken_usernames:
+            errors.append("username already taken")
+        if errors:
+            _error(report, line_no, row, *errors)
+        else:
+            valid.append((line_no, row))
+    return valid
+
+
+def _write_chunk(valid, classroom, pool, report):
+    """Hash passwords in parallel, then bulk insert users, students and enrollments."""
+    hashes = list(pool.map(make_password, [row["password"] for _, row in valid], chunksize=32))
+
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=row["username"], password=hashed)
+                for (_, row), hashed in zip(valid, hashes)
+            ])
+            user_ids = dict(
+                User.objects.filter(username__in=[row["username"] for _, row in valid]).values_list("username", "id")
+            )
+            Student.objects.bulk_create([
+                Student(
+                    user_id=user_ids[row["username"]],
+                    uid=row["uid"],
+                    branch=row["branch"],
+                    auth_key=row.get("auth_key") or None,
+                )
+                for _, row in valid
+            ])
+            if classroom is not None:
+                student_ids = Student.objects.filter(uid__in=[row["uid"] for _, row in valid]).values_list("id", flat=True)
+                change_seq = next_change_seq()
+                Enrollment.objects.bulk_create([
+                    Enrollment(student_id=student_id, classroom=classroom, change_seq=change_seq)
+                    for student_id in student_ids
+                ])
+    except IntegrityError as e:
+        # Another request registered one of these rows in the meantime; report the whole chunk
+        for line_no, row in valid:
+            _error(report, line_no, row, f"not imported, chunk rolled back: {e}")
+        return
+    report["created"] += len(valid)
+    if classroom is not None:
+        report["enrolled"] += len(valid)
@@ -0,0 +1,122 @@
+# user/enrollment_index.py
+import threading
+import time
+
+from django.conf import settings
+
+
+class EnrollmentIndex:
+    """
+    In-memory view of the Enrollment table as per-classroom bitsets.
+
+    - Every student pk gets a dense bit position the first time it is seen.
+    - Each classroom maps to a Python int whose set bits are its students.
+    - Membership and "students of these classrooms" become bitwise ops
+      instead of joins through Enrollment.
+
+    The index is per process: it is built lazily, kept current by the
+    Enrollment signals in user/signals.py, and rebuilt after
+    ENROLLMENT_INDEX_MAX_AGE seconds so writes made by other workers
+    (or by bulk_create, which sends no signals) are picked up.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._student_bit = {}      # student pk -> bit position
+        self._student_pks = []      # bit position -> student pk
+        self._classrooms = {}       # classroom pk -> int bitset
+
+    # ---------------------------
+    # Build & maintenance
+    # ---------------------------
+    def _ensure_built(self):
+        """Rebuild if stale. Callers hold the lock, so a rebuild never renumbers bits under a query."""
+        max_age = getattr(settings, "ENROLLMENT_INDEX_MAX_AGE", 60)
+        if self._built_at is not None and time.monotonic() - self._built_at < max_age:
+            return
+        from .models import Enrollment
+
+        with self._lock:
+            self._student_bit.clear()
+            self._student_pks.clear()
+            self._classrooms.clear()
+            for student_id, classroom_id in Enrollment.objects.values_list("student_id", "classroom_id"):
+                self._add(student_id, classroom_id)
+            self._built_at = time.monotonic()
+
+    def _bit(self, student_id):
+        bit = self._student_bit.get(student_id)
+        if bit is None:
+            bit = self._student_bit[student_id] = len(self._student_pks)
+            self._student_pks.append(student_id)
+        return bit
+
+    def _add(self, student_id, classroom_id):
+        self._classrooms[classroom_id] = self._classrooms.get(classroom_id, 0) | (1 << self._bit(student_id))
+
+    def add(self, student_id, classroom_id):
+        """Record a new enrollment (called from post_save)."""
+        with self._lock:
+            if self._built_at is not None:
+                self._add(student_id, classroom_id)
+
+    def remove(self, student_id, classroom_id):
+        """Forget an enrollment (called from post_delete)."""
+        with self._lock:
+            bit = self._student_bit.get(student_id)
+            if self._built_at is not None and bit is not None and classroom_id in self._classrooms:
+                self._classrooms[classroom_id] &= ~(1 << bit)
+
+    def invalidate(self):
+        """Force a rebuild on next use (e.g. after bulk_create of enrollments)."""
+        with self._lock:
+            self._built_at = None
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def members(self, classroom_ids):
+        """
+        Bitset of every student enrolled in any of `classroom_ids`.
+        Bits are only meaningful until the next rebuild: use enrolled_students() to get pks.
+        """
+        with self._lock:
+            self._ensure_built()
+            return self._members(classroom_ids)
+
+    def _members(self, classroom_ids):
+        mask = 0
+        for classroom_id in classroom_ids:
+            mask |= self._classrooms.get(classroom_id, 0)
+        return mask
+
+    def is_enrolled(self, student_id, classroom_ids):
+        """True if the student is enrolled in at least one of `classroom_ids`."""
+        with self._lock:
+            self._ensure_built()
+            bit = self._student_bit.get(student_id)
+            return bit is not None and bool(self._members(classroom_ids) >> bit & 1)
+
+    def enrolled_students(self, classroom_ids):
+        """Pks of every student enrolled in any of `classroom_ids` (mask and decode under one build)."""
+        with self._lock:
+            self._ensure_built()
+            return self._decode(self._members(classroom_ids))
+
+    def student_ids(self, mask):
+        """Decode a bitset from members() back into student pks."""
+        with self._lock:
+            return self._decode(mask)
+
+    def _decode(self, mask):
+        ids = []
+        pks = self._student_pks
+        while mask:
+            low = mask & -mask
+            ids.append(pks[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+
+# Shared per-process instance
+enrollment_index = EnrollmentIndex()
@@ -0,0 +1,168 @@
+# user/login.py
+"""
+Login under load.
+
+At lecture start hundreds of students log in together and every login costs a
+full PBKDF2 run. Logins go through django.contrib.auth.authenticate() (so every
+configured backend, hash upgrades and the user_login_failed signal apply) behind
+an admission semaphore sized for the whole host: each worker process admits
+about CPUs / LOGIN_ADMISSION['PROCESSES'] password checks at a time, so all
+workers together keep every core busy without queueing more hashes than there
+are cores. Further logins wait at most LOGIN_ADMISSION['WAIT'] seconds and are
+then refused with 503 + Retry-After.
+
+hashlib's PBKDF2 releases the GIL, so the admitted checks of one process run in
+parallel only if it serves requests on threads: run gunicorn with the gthread
+worker (--threads) and set PROCESSES to its --workers.
+
+Phones that send a `device_id` at login get a refresh token bound to that
+device and valid for DEVICE_REFRESH_LIFETIME. Refreshing it (with the same
+device_id) rotates it, so an app in daily use never needs the password again.
+The rotated token is blacklisted (simplejwt's token_blacklist app), so a stolen
+copy stops working as soon as either holder refreshes, and `manage.py
+flushexpiredtokens` keeps the tables small.
+"""
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User, update_last_login
+from django.db import transaction
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+DEFAULTS = {
+    "PROCESSES": None,      # Worker processes serving logins on this host (None = $WEB_CONCURRENCY or 1)
+    "CONCURRENT": None,     # Password checks per process at once (None = CPUs / PROCESSES, at least 1)
+    "WAIT": 2,              # Seconds a login may wait for an admission slot
+    "RETRY_AFTER": 3,       # Seconds suggested to refused clients
+}
+
+DEVICE_CLAIM = "device"
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def login_setting(name):
+    return getattr(settings, "LOGIN_ADMISSION", {}).get(name, DEFAULTS[name])
+
+
+class LoginBusy(exceptions.APIException):
+    status_code = 503
+    default_detail = "Too many logins in progress, retry shortly."
+    default_code = "login_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait    # DRF's exception handler turns this into Retry-After
+
+
+# ---------------------------
+# Admission
+# ---------------------------
+def login_slots():
+    """Password checks this process admits at once: its share of the host's CPUs."""
+    concurrent = login_setting("CONCURRENT")
+    if concurrent is not None:
+        return concurrent
+    processes = login_setting("PROCESSES") or int(os.environ.get("WEB_CONCURRENCY") or 1)
+    return max(1, (os.cpu_count() or 1) // processes)
+
+
+def get_admission():
+    """Admission semaphore shared by every login in this process."""
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = threading.BoundedSemaphore(login_slots())
+        return _admission
+
+
+def admitted_authenticate(**credentials):
+    """django.contrib.auth.authenticate() once an admission slot is free, or raise LoginBusy."""
+    admission = get_admission()
+    if not admission.acquire(timeout=login_setting("WAIT")):
+        raise LoginBusy(login_setting("RETRY_AFTER"))
+    try:
+        return authenticate(**credentials)
+    finally:
+        admission.release()
+
+
+# ---------------------------
+# Device-bound refresh tokens
+# ---------------------------
+def device_fingerprint(device_id):
+    return hashlib.sha256(device_id.encode()).hexdigest()[:32]
+
+
+def device_refresh_token(user, device_id):
+    refresh = RefreshToken.for_user(user)
+    refresh.set_exp(lifetime=getattr(settings, "DEVICE_REFRESH_LIFETIME", jwt_settings.REFRESH_TOKEN_LIFETIME))
+    refresh[DEVICE_CLAIM] = device_fingerprint(device_id)
+    # for_user recorded the default lifetime; flushexpiredtokens must keep the blacklist entry as long as the token lives
+    OutstandingToken.objects.filter(jti=refresh[jwt_settings.JTI_CLAIM]).update(
+        token=str(refresh), expires_at=datetime_from_epoch(refresh["exp"])
+    )
+    return refresh
+
+
+# ---------------------------
+# Serializers
+# ---------------------------
+class AdmittedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """TokenObtainPairSerializer whose password check waits for an admission slot; optional device_id."""
+    device_id = serializers.CharField(required=False, allow_blank=False, max_length=200, write_only=True)
+
+    def validate(self, attrs):
+        credentials = {self.username_field: attrs[self.username_field], "password": attrs["password"]}
+        if "request" in self.context:
+            credentials["request"] = self.context["request"]
+        self.user = admitted_authenticate(**credentials)
+        if not jwt_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        device_id = attrs.get("device_id")
+        refresh = device_refresh_token(self.user, device_id) if device_id else self.get_token(self.user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+
+class DeviceTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that enforces device binding: a device-bound refresh token is only accepted
+    with the same device_id, and is rotated so its lifetime slides while the app is used.
+    The old token is blacklisted in the same step; a second refresh with it is refused.
+    Plain refresh tokens behave exactly as before.
+    """
+    device_id = serializers.CharField(required=False, allow_blank=False, max_length=200, write_only=True)
+
+    def validate(self, attrs):
+        # Claims only; the token is verified (signature, expiry, blacklist) once by whichever path handles it
+        bound = self.token_class(attrs["refresh"], verify=False).get(DEVICE_CLAIM)
+        if bound is None:
+            return super().validate(attrs)
+        refresh = self.token_class(attrs["refresh"])
+
+        device_id = attrs.get("device_id") or self.context["request"].headers.get("X-Device-Id")
+        if not device_id or device_fingerprint(device_id) != bound:
+            raise exceptions.AuthenticationFailed("Refresh token is bound to another device", "device_mismatch")
+
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}).first()
+        if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed("No active account found for the given token.", "no_active_account")
+        with transaction.atomic():
+            _, blacklisted_now = refresh.blacklist()
+            if not blacklisted_now:
+                # Checked by the token constructor too; this catches two refreshes racing with one token
+                raise exceptions.AuthenticationFailed("Refresh token was already used", "token_reused")
+            rotated = device_refresh_token(user, device_id)
+        return {"access": str(rotated.access_token), "refresh": str(rotated)}
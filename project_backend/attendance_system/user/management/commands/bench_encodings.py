@@ -0,0 +1,91 @@
+# user/management/commands/bench_encodings.py
+import random
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from attendance_system.middleware import brotli, compress, compress_stream
+from attendance_system.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from user.projections import attendance_row, classroom_row, datetime_formatter
+
+
+class Command(BaseCommand):
+    help = (
+        "Bytes on the wire and encode CPU time per response encoding (JSON / MessagePack, "
+        "identity / gzip / brotli) for typical attendance and classroom list payloads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lectures", type=int, default=40, help="Lectures per classroom in the attendance payload")
+        parser.add_argument("--classrooms", type=int, default=6, help="Classrooms a student is enrolled in")
+        parser.add_argument("--listing", type=int, default=50, help="Classrooms in the listing payload")
+        parser.add_argument("--export-rows", type=int, default=100_000, help="CSV rows in the streamed export")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        fmt = datetime_formatter()
+        base = datetime(2025, 1, 6, 3, 30, tzinfo=dt_timezone.utc)
+
+        attendance = [
+            attendance_row({
+                "id": 10_000 + i, "student_id": 42, "classroom_id": 1 + i % options["classrooms"],
+                "session_id": 500 + i, "date": date(2025, 1, 6) + timedelta(days=i // options["classrooms"]),
+                "status": rng.choices(("PRESENT", "ABSENT", "LATE"), (85, 10, 5))[0],
+                "timestamp": base + timedelta(days=i // options["classrooms"], minutes=i, seconds=rng.randrange(60)),
+            }, fmt)
+            for i in range(options["lectures"] * options["classrooms"])
+        ]
+        listing = [
+            classroom_row({
+                "id": i, "name": f"Course {i}", "code": f"CS{100 + i}", "teacher__user__username": f"teacher{i % 12}",
+                "created_at": base + timedelta(days=i, seconds=rng.randrange(86400)), "active": True,
+            }, fmt)
+            for i in range(1, options["listing"] + 1)
+        ]
+
+        renderers = [("json", ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+        codings = [("identity", None), ("gzip", "gzip")] + ([("br", "br")] if brotli is not None else [])
+        missing = [name for name, mod in (("msgpack", msgpack), ("brotli", brotli)) if mod is None]
+        if missing:
+            self.stdout.write(f"Not installed, skipped: {', '.join(missing)}")
+
+        for label, payload in ((f"attendance list ({len(attendance)} rows)", attendance),
+                               (f"classroom listing ({len(listing)} rows)", listing)):
+            self.stdout.write(label)
+            self.stdout.write(f"  {'encoding':20}{'bytes':>10}{'vs json':>10}{'encode (us)':>14}")
+            json_size = None
+            for name, renderer in renderers:
+                for coding_name, coding in codings:
+                    encode = (lambda r=renderer, c=coding:
+                              compress(c, r.render(payload)) if c else r.render(payload))
+                    size = len(encode())
+                    json_size = json_size or size
+                    spent = self._time(encode, options["iterations"])
+                    self.stdout.write(
+                        f"  {name + '+' + coding_name:20}{size:10d}{size / json_size:9.0%}{spent * 1e6:14.1f}"
+                    )
+
+        # Streamed CSV export, compressed chunk by chunk as CompressionMiddleware does
+        lines = [
+            f"{500 + i // 60},2025-01-{6 + i // 6000 % 20:02d},S{i % 60:05d},student{i % 60},"
+            f"{rng.choices(('PRESENT', 'ABSENT', 'LATE'), (85, 10, 5))[0]}\r\n".encode()
+            for i in range(options["export_rows"])
+        ]
+        raw = sum(len(line) for line in lines)
+        self.stdout.write(f"streamed CSV export ({len(lines)} rows, {raw} bytes)")
+        for coding_name, coding in codings[1:]:
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in compress_stream(coding, iter(lines)))
+            spent = time.perf_counter() - start
+            self.stdout.write(f"  {coding_name:20}{size:10d}{size / raw:9.0%}{spent * 1e3:12.1f}ms")
+
+    def _time(self, fn, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,73 @@
+# user/management/commands/bench_login.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from user import login
+from user.login import DEVICE_CLAIM, device_fingerprint, device_refresh_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Logins/sec with the password check on one request thread versus concurrent threads behind the login "
+        "admission semaphore, "
+        "and the cost of a device-bound refresh that skips hashing. Uses the configured PASSWORD_HASHERS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=24, help="Password checks per variant")
+        parser.add_argument("--clients", type=int, default=32, help="Concurrent login requests for the admitted run")
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes the host's CPUs are shared by")
+        parser.add_argument("--refreshes", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        n = options["logins"]
+        cores = os.cpu_count() or 1
+        encoded = make_password("correct horse")
+        self.stdout.write(f"hasher: {encoded.split('$', 1)[0]}, {cores} CPU(s)")
+
+        start = time.perf_counter()
+        for _ in range(n):
+            assert check_password("correct horse", encoded)
+        inline = n / (time.perf_counter() - start)
+        self.stdout.write(f"inline (one request thread): {inline:8.1f} logins/s  ({inline:.1f} per core)")
+
+        with override_settings(LOGIN_ADMISSION={"PROCESSES": options["processes"], "WAIT": 60}):
+            login._admission = None     # Pick up --processes
+            admission = login.get_admission()
+            slots = login.login_slots()
+
+            def admitted_check(_):
+                with admission:
+                    return check_password("correct horse", encoded)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options["clients"]) as clients:
+                results = list(clients.map(admitted_check, range(n)))
+            admitted = n / (time.perf_counter() - start)
+            login._admission = None
+        assert all(results)
+        per_core = admitted / min(slots, cores)
+        self.stdout.write(
+            f"admitted ({slots} slots, {options['clients']} clients): {admitted:8.1f} logins/s  ({per_core:.1f} per core)"
+        )
+
+        # Device refresh without the user lookup: token decoding, device check and re-signing
+        user = User(id=1, username="bench", is_active=True)
+        token = str(device_refresh_token(user, "phone-1"))
+        start = time.perf_counter()
+        for _ in range(options["refreshes"]):
+            refresh = RefreshToken(token)
+            assert refresh[DEVICE_CLAIM] == device_fingerprint("phone-1")
+            str(device_refresh_token(user, "phone-1").access_token)
+        per_refresh = (time.perf_counter() - start) / options["refreshes"]
+        self.stdout.write(
+            f"device-bound refresh: {per_refresh * 1e6:8.1f} us each  "
+            f"(~{1 / per_refresh / inline:.0f}x cheaper than a password login)"
+        )
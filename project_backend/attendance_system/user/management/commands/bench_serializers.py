@@ -0,0 +1,103 @@
+# user/management/commands/bench_serializers.py
+import json
+import random
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from attendance_system.renderers import ORJSONRenderer, orjson
+from user.models import AbsenceProposal, AttendanceRecord, Classroom, Student, Teacher
+from user.projections import attendance_row, classroom_row, datetime_formatter, media_url_builder, proposal_row
+from user.serializer import AbsenceProposalSerializer, AttendanceRecordSerializer, ClassroomSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ModelSerializer + JSONRenderer against values() projections + JSON / orjson rendering "
+        "for the list endpoints, on in-memory rows (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant (best is reported)")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        n = options["rows"]
+        base = datetime(2025, 1, 6, 3, 30, tzinfo=dt_timezone.utc)
+        teachers = [Teacher(id=i, uid=f"T{i:03d}", department="CSE", user=User(id=i, username=f"teacher{i}"))
+                    for i in range(1, 21)]
+        students = [Student(id=i, uid=f"S{i:05d}", branch="CSE", user=User(id=1000 + i, username=f"student{i}"))
+                    for i in range(1, 501)]
+
+        classrooms = []
+        for i in range(1, n + 1):
+            teacher = rng.choice(teachers)
+            classrooms.append(Classroom(id=i, name=f"Course {i}", code=f"C{i:05d}", teacher=teacher,
+                                        created_at=base + timedelta(minutes=i), active=True))
+        records = [
+            AttendanceRecord(id=i, student_id=rng.randrange(1, 501), classroom_id=rng.randrange(1, 50),
+                             session_id=i // 60 + 1, date=date(2025, 1, 6) + timedelta(days=i // 600),
+                             status=rng.choice(("PRESENT", "ABSENT", "LATE")), timestamp=base + timedelta(seconds=i))
+            for i in range(1, n + 1)
+        ]
+        proposals = []
+        for i in range(1, n + 1):
+            proposal = AbsenceProposal(id=i, student=rng.choice(students), reason_type="MEDICAL",
+                                       reason_description="Fever", start_datetime=base, status="PENDING",
+                                       end_datetime=base + timedelta(days=1), timestamp=base + timedelta(seconds=i))
+            proposal.document.name = f"absence_proposals/student_{proposal.student.id}/note_{i}.pdf" if i % 3 == 0 else None
+            proposals.append(proposal)
+
+        # What .values() would have returned for the same rows
+        classroom_values = [
+            {"id": c.id, "name": c.name, "code": c.code, "teacher__user__username": c.teacher.user.username,
+             "created_at": c.created_at, "active": c.active} for c in classrooms
+        ]
+        record_values = [
+            {"id": r.id, "student_id": r.student_id, "classroom_id": r.classroom_id, "session_id": r.session_id,
+             "date": r.date, "status": r.status, "timestamp": r.timestamp} for r in records
+        ]
+        proposal_values = [
+            {"id": p.id, "student_id": p.student.id, "student__uid": p.student.uid, "student__branch": p.student.branch,
+             "student__auth_key": p.student.auth_key, "student__user__username": p.student.user.username,
+             "reason_type": p.reason_type, "reason_description": p.reason_description, "document": p.document.name,
+             "start_datetime": p.start_datetime, "end_datetime": p.end_datetime, "status": p.status,
+             "timestamp": p.timestamp} for p in proposals
+        ]
+
+        fmt, media_url = datetime_formatter(), media_url_builder()
+        cases = [
+            ("classrooms", lambda: ClassroomSerializer(classrooms, many=True).data,
+             lambda: [classroom_row(row, fmt) for row in classroom_values]),
+            ("attendance", lambda: AttendanceRecordSerializer(records, many=True).data,
+             lambda: [attendance_row(row, fmt) for row in record_values]),
+            ("proposals", lambda: AbsenceProposalSerializer(proposals, many=True).data,
+             lambda: [proposal_row(row, fmt, media_url) for row in proposal_values]),
+        ]
+
+        json_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        self.stdout.write(f"{n} rows per endpoint, best of {options['repeat']} (orjson {'on' if orjson else 'not installed'})")
+        self.stdout.write(f"{'':12}{'serializer':>14}{'projection':>14}{'+ orjson':>14}{'speedup':>10}")
+        for name, serialize, project in cases:
+            expected = json_renderer.render(serialize())
+            if json.loads(expected) != json.loads(fast_renderer.render(project())):
+                raise CommandError(f"{name}: projection output differs from the serializer")
+            slow = self._best(options["repeat"], lambda: json_renderer.render(serialize()))
+            lean = self._best(options["repeat"], lambda: json_renderer.render(project()))
+            fast = self._best(options["repeat"], lambda: fast_renderer.render(project()))
+            self.stdout.write(
+                f"{name:12}{slow * 1e3:12.1f}ms{lean * 1e3:12.1f}ms{fast * 1e3:12.1f}ms{slow / fast:9.1f}x"
+            )
+
+    def _best(self, repeat, fn):
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -0,0 +1,34 @@
+# user/management/commands/import_students.py
+from django.core.management.base import BaseCommand, CommandError
+
+from user.bulk_import import DEFAULT_CHUNK_SIZE, import_students
+from user.models import Classroom
+
+
+class Command(BaseCommand):
+    help = "Register students from a CSV file (username,password,uid,branch[,auth_key])."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("--classroom", help="Classroom code to enroll every imported student in")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        classroom = None
+        if options["classroom"]:
+            try:
+                classroom = Classroom.objects.get(code=options["classroom"])
+            except Classroom.DoesNotExist:
+                raise CommandError(f"Classroom {options['classroom']} not found")
+
+        with open(options["csv_path"], newline="", encoding="utf-8-sig") as f:
+            try:
+                report = import_students(f, classroom=classroom, chunk_size=options["chunk_size"])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"row {error['row']} ({error['uid'] or '-'}): {'; '.join(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} students, enrolled {report['enrolled']}, {len(report['errors'])} row(s) rejected"
+        ))
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 import os
 from django.utils import timezone
@@ -31,13 +31,57 @@ class Classroom(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
-class Enrollment(models.Model):
+
+class TimetableSlot(models.Model):
+    """A weekly lecture slot of a classroom (optional; used to warm rosters before class)."""
+    WEEKDAY_CHOICES = (
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    )
+
+    classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name="timetable")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()     # Local time (settings.TIME_ZONE)
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['weekday', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.classroom.code} | {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+class ChangeStamped(models.Model):
+    """
+    Rows the mobile app syncs by change_seq (see user/sync.py). save() runs in one
+    transaction so the pre_save stamp commits together with the row it numbers.
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
+class Enrollment(ChangeStamped):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="enrollments")
     classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name="enrollments")
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(default=0)  # Sync cursor position (see user/sync.py)
 
     class Meta:
         unique_together = ('student', 'classroom')
+        indexes = [
+            models.Index(fields=['student', 'change_seq']),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} → {self.classroom.code}"
@@ -45,7 +89,7 @@ class Enrollment(models.Model):
 
 
 
-class AttendanceRecord(models.Model):
+class AttendanceRecord(ChangeStamped):
     STATUS_CHOICES = (
         ("PRESENT", "Present"),
         ("ABSENT", "Absent"),
@@ -55,13 +99,26 @@ class AttendanceRecord(models.Model):
 
     student = models.ForeignKey("Student", on_delete=models.CASCADE, related_name="attendance_records")
     classroom = models.ForeignKey("Classroom", on_delete=models.CASCADE, related_name="attendance_records")
+    # Lecture this record belongs to (null for records written before sessions were persisted)
+    session = models.ForeignKey(
+        "attendance_session.AttendanceSession",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="records"
+    )
     date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PRESENT")
     timestamp = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(default=0)  # Sync cursor position (see user/sync.py)
 
     class Meta:
         # Remove unique_together to allow multiple records per day
         ordering = ['date', 'timestamp']
+        indexes = [
+            models.Index(fields=['session', 'student']),
+            models.Index(fields=['student', 'change_seq']),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} | {self.classroom.code} |  {self.timestamp} | {self.status}"
@@ -80,7 +137,7 @@ def absence_document_upload_path(instance, filename):
     unique_filename = f"{timestamp}_{base}{ext}"
     return f'absence_proposals/student_{instance.student.id}/{unique_filename}'
 
-class AbsenceProposal(models.Model):
+class AbsenceProposal(ChangeStamped):
     STATUS_CHOICES = (
         ("PENDING", "Pending"),
         ("APPROVED", "Approved"),
@@ -110,9 +167,46 @@ class AbsenceProposal(models.Model):
     end_datetime = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
     timestamp = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(default=0)  # Sync cursor position (see user/sync.py)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['student', 'change_seq']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.user.username} | {self.reason_type} | {self.status}"
+
+
+# ---------------------------
+# Mobile sync bookkeeping
+# ---------------------------
+class ChangeSequence(models.Model):
+    """Single-row counter that hands out monotonically increasing change_seq values."""
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"change_seq={self.value}"
+
+
+class SyncTombstone(models.Model):
+    """Deleted row a student's app still has to drop on its next sync."""
+    COLLECTION_CHOICES = (
+        ("enrollments", "Enrollments"),
+        ("attendance", "Attendance"),
+        ("proposals", "Absence proposals"),
+    )
+
+    student = models.ForeignKey("Student", on_delete=models.CASCADE, related_name="sync_tombstones")
+    collection = models.CharField(max_length=20, choices=COLLECTION_CHOICES)
+    object_id = models.BigIntegerField()    # Classroom id for enrollments, row id otherwise
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'change_seq']),
+        ]
 
     def __str__(self):
-        return f"{self.student.user.username} | {self.reason_type} | {self.status}"
\ No newline at end of file
+        return f"{self.student.uid} | {self.collection} #{self.object_id} deleted at {self.change_seq}"
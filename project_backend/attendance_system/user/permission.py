@@ -29,3 +29,15 @@ class IsTeacherOrStudent(BasePermission):
             and (Teacher.objects.filter(user=request.user).exists() 
                  or Student.objects.filter(user=request.user).exists())
         )
+
+
+class IsTeacherOrAdmin(BasePermission):
+    """
+    Allows access to Teachers and staff users.
+    """
+    def has_permission(self, request, view):
+        return (
+            request.user
+            and request.user.is_authenticated
+            and (request.user.is_staff or Teacher.objects.filter(user=request.user).exists())
+        )
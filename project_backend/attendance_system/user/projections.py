@@ -0,0 +1,149 @@
+# user/projections.py
+"""
+Read-only fast path for list endpoints.
+
+Each projection reads exactly the columns a serializer would output with one
+values() query and builds plain dicts, producing the same JSON as the
+ModelSerializer it replaces (ClassroomSerializer, AttendanceRecordSerializer,
+AbsenceProposalSerializer) without per-row field objects or related lookups.
+Writes and single-object endpoints keep using the serializers.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework.settings import api_settings
+
+
+# ---------------------------
+# Field formatting (same output as the DRF fields)
+# ---------------------------
+def datetime_formatter():
+    """
+    value -> string exactly like DRF's DateTimeField, with the current timezone
+    and DATETIME_FORMAT resolved once per response instead of once per field.
+    """
+    fmt = api_settings.DATETIME_FORMAT
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    iso = fmt is None or fmt.lower() == "iso-8601"
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if tz is not None and value.tzinfo is not None:
+            value = value.astimezone(tz)
+        if iso:
+            value = value.isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return value.strftime(fmt)
+    return format_datetime
+
+
+def format_date(value):
+    return value.isoformat() if value is not None else None
+
+
+def media_url_builder(request=None):
+    """
+    Return name -> URL for stored files, resolving the media base URL once per response.
+    Falls back to the storage backend for anything that is not local file storage.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        base = default_storage.base_url
+        if request is not None:
+            base = request.build_absolute_uri(base)
+        return lambda name: base + filepath_to_uri(name).lstrip("/") if name else None
+
+    def storage_url(name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return storage_url
+
+
+# ---------------------------
+# Classrooms
+# ---------------------------
+CLASSROOM_FIELDS = ("id", "name", "code", "teacher__user__username", "created_at", "active")
+
+
+def classroom_row(row, format_datetime):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "code": row["code"],
+        "teacher_name": row["teacher__user__username"],
+        "created_at": format_datetime(row["created_at"]),
+        "active": row["active"],
+    }
+
+
+def classroom_rows(queryset):
+    """ClassroomSerializer(many=True).data equivalent."""
+    format_datetime = datetime_formatter()
+    return [classroom_row(row, format_datetime) for row in queryset.values(*CLASSROOM_FIELDS)]
+
+
+# ---------------------------
+# Attendance records
+# ---------------------------
+ATTENDANCE_FIELDS = ("id", "student_id", "classroom_id", "session_id", "date", "status", "timestamp")
+
+
+def attendance_row(row, format_datetime):
+    return {
+        "id": row["id"],
+        "student": row["student_id"],
+        "classroom": row["classroom_id"],
+        "session": row["session_id"],
+        "date": format_date(row["date"]),
+        "status": row["status"],
+        "timestamp": format_datetime(row["timestamp"]),
+    }
+
+
+def attendance_rows(queryset):
+    """AttendanceRecordSerializer(many=True).data equivalent."""
+    format_datetime = datetime_formatter()
+    return [attendance_row(row, format_datetime) for row in queryset.values(*ATTENDANCE_FIELDS)]
+
+
+# ---------------------------
+# Absence proposals
+# ---------------------------
+PROPOSAL_FIELDS = (
+    "id", "student_id", "student__uid", "student__branch", "student__auth_key", "student__user__username",
+    "reason_type", "reason_description", "document", "start_datetime", "end_datetime", "status", "timestamp",
+)
+
+
+def proposal_row(row, format_datetime, media_url):
+    document = media_url(row["document"])
+    return {
+        "id": row["id"],
+        "student": {
+            "id": row["student_id"],
+            "uid": row["student__uid"],
+            "branch": row["student__branch"],
+            "auth_key": row["student__auth_key"],
+            "username": row["student__user__username"],
+        },
+        "reason_type": row["reason_type"],
+        "reason_description": row["reason_description"],
+        "document": document,
+        "document_url": document,
+        "start_datetime": format_datetime(row["start_datetime"]),
+        "end_datetime": format_datetime(row["end_datetime"]),
+        "status": row["status"],
+        "timestamp": format_datetime(row["timestamp"]),
+    }
+
+
+def proposal_rows(queryset, request=None):
+    """
+    AbsenceProposalSerializer(many=True).data equivalent.
+    Pass `request` when the serializer would have had it in its context (absolute file URLs).
+    """
+    format_datetime, media_url = datetime_formatter(), media_url_builder(request)
+    return [proposal_row(row, format_datetime, media_url) for row in queryset.values(*PROPOSAL_FIELDS)]
@@ -99,7 +99,8 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AttendanceRecord
-        fields = ['id', 'student', 'classroom', 'date', 'status', 'timestamp']
+        fields = ['id', 'student', 'classroom', 'session', 'date', 'status', 'timestamp']
+        read_only_fields = ['session']
 
     def create(self, validated_data):
         request = self.context.get('request')
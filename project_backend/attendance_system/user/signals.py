@@ -0,0 +1,53 @@
+# user/signals.py
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .enrollment_index import enrollment_index
+from .models import AbsenceProposal, AttendanceRecord, Enrollment, Student
+from .sync import next_change_seq, record_deletions
+
+
+# ---------------------------
+# Keep the in-memory enrollment index in sync
+# ---------------------------
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, **kwargs):
+    if created:
+        enrollment_index.add(instance.student_id, instance.classroom_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    enrollment_index.remove(instance.student_id, instance.classroom_id)
+
+
+# ---------------------------
+# Change cursors for mobile sync (see user/sync.py)
+# ---------------------------
+@receiver(pre_save, sender=Enrollment)
+@receiver(pre_save, sender=AttendanceRecord)
+@receiver(pre_save, sender=AbsenceProposal)
+def stamp_change_seq(sender, instance, update_fields=None, **kwargs):
+    # Saves restricted to update_fields must list change_seq themselves to be synced
+    if update_fields is None or "change_seq" in update_fields:
+        instance.change_seq = next_change_seq()
+
+
+def _student_deleted(origin):
+    """True when the delete cascades from the student (or its user) itself: nobody is left to sync."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Student, User)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_tombstone(sender, instance, origin=None, **kwargs):
+    if not _student_deleted(origin):
+        record_deletions("enrollments", [(instance.student_id, instance.classroom_id)])
+
+
+@receiver(post_delete, sender=AbsenceProposal)
+def proposal_tombstone(sender, instance, origin=None, **kwargs):
+    if not _student_deleted(origin):
+        record_deletions("proposals", [(instance.student_id, instance.id)])
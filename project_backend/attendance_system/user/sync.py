@@ -0,0 +1,57 @@
+# user/sync.py
+"""
+Change cursors for the mobile app's incremental sync.
+
+Enrollment, AttendanceRecord and AbsenceProposal carry a `change_seq` taken
+from one global counter. Every save is stamped by the pre_save signal in
+user/signals.py; bulk_create and queryset.update() send no signals, so
+those paths call next_change_seq() themselves. Deleted rows leave a
+SyncTombstone with their own change_seq.
+
+GET user/student/sync/?since=<cursor> then returns rows with
+since < change_seq <= cursor, where cursor is the counter value read at the
+start of the request.
+
+A change number must commit together with the rows it stamps: if the counter
+committed first, a sync could return cursor N before row N is visible and the
+client would skip that row for good. next_change_seq() therefore only runs
+inside the writer's transaction. The counter row stays locked until that
+transaction commits, so writers commit in sequence order and every row up to
+the committed counter value is visible.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import ChangeSequence, SyncTombstone
+
+COUNTER_ID = 1
+
+
+def next_change_seq(count=1):
+    """
+    Reserve `count` consecutive change numbers and return the last one.
+    Must be called inside the transaction that writes the stamped rows.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("next_change_seq() must run inside the transaction that writes the stamped rows")
+    if not ChangeSequence.objects.filter(id=COUNTER_ID).update(value=F("value") + count):
+        ChangeSequence.objects.get_or_create(id=COUNTER_ID)
+        ChangeSequence.objects.filter(id=COUNTER_ID).update(value=F("value") + count)
+    return ChangeSequence.objects.values_list("value", flat=True).get(id=COUNTER_ID)
+
+
+def current_change_seq():
+    """Latest change number handed out (0 before any change)."""
+    return ChangeSequence.objects.filter(id=COUNTER_ID).values_list("value", flat=True).first() or 0
+
+
+def record_deletions(collection, rows):
+    """Leave tombstones for deleted rows, given as (student_id, object_id) pairs."""
+    rows = list(rows)
+    if not rows:
+        return
+    seq = next_change_seq()
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(student_id=student_id, collection=collection, object_id=object_id, change_seq=seq)
+        for student_id, object_id in rows
+    ])
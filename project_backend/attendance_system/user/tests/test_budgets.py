@@ -0,0 +1,327 @@
+# user/tests/test_budgets.py
+"""
+Query and latency budgets for the user endpoints.
+
+Every URL of user/urls.py is called against seeded data at several scales
+(10, 100 and 1,000 students) and must run exactly QUERY_BUDGETS[name]
+queries, whatever the scale, within LATENCY_BUDGETS[scale] seconds. A count that
+grows with the class size is an N+1; fix the view rather than the budget. A
+bulk_create that the database splits into several INSERTs (SQLite's parameter
+limit) counts as one query.
+
+attendance_session/tests/test_budgets.py reuses seed() and QueryBudgetMixin.
+"""
+import contextlib
+import io
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance_session.models import AttendanceSession
+from ..enrollment_index import enrollment_index
+from ..models import AbsenceProposal, AttendanceRecord, Classroom, Enrollment, Student, Teacher
+
+LATENCY_BUDGETS = {10: 0.5, 100: 1.0, 1000: 3.0}   # Seconds per request, generous for slow CI machines
+LECTURES = 10
+PASSWORD = "pw"
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+# ---------------------------
+# Seed data
+# ---------------------------
+def seed(n):
+    """
+    One teacher and `n` students:
+    - 1 + n // 10 classrooms; every student is enrolled in the first, student 0 in all of them
+    - LECTURES finalized lectures of the first classroom with a record for every student
+    - n // 10 pending absence proposals covering those lectures
+    """
+    password = make_password(PASSWORD)      # One hash for every seeded account
+    teacher_user = User.objects.create(username="teacher", password=password)
+    teacher = Teacher.objects.create(user=teacher_user, uid="T0001", department="CSE")
+
+    users = User.objects.bulk_create([User(username=f"student{i}", password=password) for i in range(n)])
+    students = Student.objects.bulk_create([
+        Student(user=user, uid=f"S{i:05d}", branch="CSE") for i, user in enumerate(users)
+    ])
+    classrooms = Classroom.objects.bulk_create([
+        Classroom(name=f"Course {i}", code=f"CS{i:04d}", teacher=teacher) for i in range(1 + n // 10)
+    ])
+    Enrollment.objects.bulk_create(
+        [Enrollment(student=student, classroom=classrooms[0], change_seq=1) for student in students]
+        + [Enrollment(student=students[0], classroom=classroom, change_seq=1) for classroom in classrooms[1:]]
+    )
+
+    lectures = AttendanceSession.objects.bulk_create([
+        AttendanceSession(
+            classroom=classrooms[0], teacher=teacher, finalized_at=timezone.now(),
+            total_students=n, present_count=n - n // 2, absent_count=n // 2,
+        )
+        for _ in range(LECTURES)
+    ])
+    today = timezone.localdate()
+    AttendanceRecord.objects.bulk_create([
+        AttendanceRecord(
+            student=student, classroom=classrooms[0], session=lecture, date=today,
+            status="ABSENT" if i % 2 else "PRESENT", change_seq=1,
+        )
+        for lecture in lectures for i, student in enumerate(students)
+    ])
+
+    now = timezone.now()
+    proposals = AbsenceProposal.objects.bulk_create([
+        AbsenceProposal(
+            student=student, reason_type="MEDICAL", reason_description="Seeded",
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1), change_seq=1,
+        )
+        for student in students[1:1 + n // 10]
+    ])
+    return SimpleNamespace(
+        teacher=teacher, students=students, classrooms=classrooms, lectures=lectures, proposals=proposals,
+    )
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+# ---------------------------
+# Budget assertions
+# ---------------------------
+def count_queries(captured):
+    """Queries as budgeted: consecutive INSERTs into the same table (one split bulk_create) count once."""
+    count, last_insert = 0, None
+    for query in captured:
+        sql = query["sql"]
+        table = sql.split(" ", 3)[2] if sql.startswith("INSERT INTO ") else None
+        if table is None or table != last_insert:
+            count += 1
+        last_insert = table
+    return count
+
+
+class QueryBudgetMixin:
+    """Runs a request, counting its queries and timing it (streamed bodies included)."""
+    SCALE = None
+    QUERY_BUDGETS = {}
+
+    def assertWithinBudget(self, name, call):
+        with CaptureQueriesContext(connection) as queries, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            response = call()
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(response.status_code, 400, f"{name}: {getattr(response, 'data', response)}")
+        count = count_queries(queries.captured_queries)
+        sql = "\n".join(q["sql"] for q in queries.captured_queries)
+        self.assertEqual(
+            count, self.QUERY_BUDGETS[name],
+            f"{name} ran {count} queries at {self.SCALE} students "
+            f"(budget {self.QUERY_BUDGETS[name]}):\n{sql}",
+        )
+        budget = LATENCY_BUDGETS[self.SCALE]
+        self.assertLess(elapsed, budget, f"{name} took {elapsed:.3f}s at {self.SCALE} students (budget {budget}s)")
+        return response
+
+
+# ---------------------------
+# User endpoints
+# ---------------------------
+class UserEndpointBudgets(QueryBudgetMixin):
+    """Mixed into one TestCase per scale below."""
+    QUERY_BUDGETS = {
+        "student-register": 3,
+        "teacher-register": 3,
+        "student-bulk-import": 14,
+        "token_obtain_pair": 2,
+        "token_refresh": 2,
+        "token_refresh_device": 12,
+        "student-enroll": 9,
+        "student-enrollments": 3,
+        "student-attendance": 3,
+        "student-search-classroom": 2,
+        "student-classroom-search": 1,
+        "student-sync": 6,
+        "student-sync-since": 7,
+        "profile": 2,
+        "teacher-classrooms-list": 3,
+        "teacher-classrooms-create": 5,
+        "teacher-classrooms-detail": 3,
+        "create-absence-proposal": 12,
+        "list-absence-proposals": 2,
+        "teacher-pending-proposals": 3,
+        "teacher-update-proposal": 12,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(cls.SCALE)
+        cls.student = cls.data.students[0]
+
+    def setUp(self):
+        enrollment_index.invalidate()   # Seeded with bulk_create, which sends no signals
+        self.teacher_client = client_for(self.data.teacher.user)
+        self.student_client = client_for(self.student.user)
+
+    # Registration
+    def test_student_register(self):
+        self.assertWithinBudget("student-register", lambda: APIClient().post(reverse("student-register"), {
+            "username": "newstudent", "password": PASSWORD, "uid": "NEW001", "branch": "CSE",
+        }, format="json"))
+
+    def test_teacher_register(self):
+        self.assertWithinBudget("teacher-register", lambda: APIClient().post(reverse("teacher-register"), {
+            "username": "newteacher", "password": PASSWORD, "uid": "NEWT01", "department": "CSE",
+        }, format="json"))
+
+    def test_bulk_import(self):
+        count = self.SCALE // 10 or 1
+        rows = "".join(f"bulk{i},{PASSWORD},B{i:05d},CSE\n" for i in range(count))
+        upload = SimpleUploadedFile("students.csv", ("username,password,uid,branch\n" + rows).encode(), "text/csv")
+        response = self.assertWithinBudget("student-bulk-import", lambda: self.teacher_client.post(
+            reverse("student-bulk-import"), {"file": upload, "classroom_id": self.data.classrooms[0].id},
+            format="multipart",
+        ))
+        self.assertEqual(response.data["created"], count)
+
+    # Login
+    def test_login(self):
+        self.assertWithinBudget("token_obtain_pair", lambda: APIClient().post(reverse("token_obtain_pair"), {
+            "username": self.student.user.username, "password": PASSWORD,
+        }, format="json"))
+
+    def test_login_refresh(self):
+        refresh = APIClient().post(reverse("token_obtain_pair"), {
+            "username": self.student.user.username, "password": PASSWORD,
+        }, format="json").data["refresh"]
+        self.assertWithinBudget("token_refresh", lambda: APIClient().post(
+            reverse("token_refresh"), {"refresh": refresh}, format="json"
+        ))
+
+    def test_login_refresh_device(self):
+        refresh = APIClient().post(reverse("token_obtain_pair"), {
+            "username": self.student.user.username, "password": PASSWORD, "device_id": "phone",
+        }, format="json").data["refresh"]
+        self.assertWithinBudget("token_refresh_device", lambda: APIClient().post(
+            reverse("token_refresh"), {"refresh": refresh, "device_id": "phone"}, format="json"
+        ))
+
+    # Student enrollment & attendance
+    def test_enroll(self):
+        other = self.data.students[-1]
+        classroom = self.data.classrooms[-1] if len(self.data.classrooms) > 1 else Classroom.objects.create(
+            name="Extra", code="EXTRA", teacher=self.data.teacher
+        )
+        self.assertWithinBudget("student-enroll", lambda: client_for(other.user).post(
+            reverse("student-enroll"), {"classroom": classroom.id}, format="json"
+        ))
+
+    def test_enrollments(self):
+        response = self.assertWithinBudget("student-enrollments", lambda: self.student_client.get(
+            reverse("student-enrollments")
+        ))
+        self.assertEqual(len(response.data), len(self.data.classrooms))
+
+    def test_attendance(self):
+        response = self.assertWithinBudget("student-attendance", lambda: self.student_client.get(
+            reverse("student-attendance")
+        ))
+        self.assertEqual(len(response.data), LECTURES)
+
+    def test_search_classroom(self):
+        self.assertWithinBudget("student-search-classroom", lambda: self.student_client.get(
+            reverse("student-search-classroom"), {"code": "all"}
+        ))
+
+    def test_classroom_search(self):
+        self.assertWithinBudget("student-classroom-search", lambda: self.student_client.get(
+            reverse("student-classroom-search"), {"code": "CS"}
+        ))
+
+    def test_sync(self):
+        self.assertWithinBudget("student-sync", lambda: self.student_client.get(reverse("student-sync")))
+        self.assertWithinBudget("student-sync-since", lambda: self.student_client.get(
+            reverse("student-sync"), {"since": 1}
+        ))
+
+    # Profile
+    def test_profile(self):
+        self.assertWithinBudget("profile", lambda: self.student_client.get(reverse("profile")))
+
+    # Teacher classrooms
+    def test_teacher_classrooms(self):
+        response = self.assertWithinBudget("teacher-classrooms-list", lambda: self.teacher_client.get(
+            reverse("teacher-classrooms-list")
+        ))
+        self.assertEqual(len(response.data), len(self.data.classrooms))
+        self.assertWithinBudget("teacher-classrooms-create", lambda: self.teacher_client.post(
+            reverse("teacher-classrooms-list"), {"name": "New course", "code": "NEW100"}, format="json"
+        ))
+        self.assertWithinBudget("teacher-classrooms-detail", lambda: self.teacher_client.get(
+            reverse("teacher-classrooms-detail", args=[self.data.classrooms[0].id])
+        ))
+
+    # Absence proposals
+    def test_create_absence_proposal(self):
+        now = timezone.now()
+        self.assertWithinBudget("create-absence-proposal", lambda: self.student_client.post(
+            reverse("create-absence-proposal"), {
+                "reason_type": "MEDICAL", "reason_description": "Fever",
+                "start_datetime": (now - timedelta(hours=2)).isoformat(),
+                "end_datetime": (now + timedelta(hours=2)).isoformat(),
+            }, format="multipart",
+        ))
+
+    def test_list_absence_proposals(self):
+        self.assertWithinBudget("list-absence-proposals", lambda: self.student_client.get(
+            reverse("list-absence-proposals")
+        ))
+
+    def test_pending_proposals(self):
+        response = self.assertWithinBudget("teacher-pending-proposals", lambda: self.teacher_client.get(
+            reverse("teacher-pending-proposals")
+        ))
+        self.assertEqual(len(response.data), len(self.data.proposals))
+
+    def test_update_proposal(self):
+        proposal = self.data.proposals[0] if self.data.proposals else AbsenceProposal.objects.create(
+            student=self.data.students[1], reason_type="MEDICAL",
+            start_datetime=timezone.now() - timedelta(hours=1), end_datetime=timezone.now() + timedelta(hours=1),
+        )
+        self.assertWithinBudget("teacher-update-proposal", lambda: self.teacher_client.patch(
+            reverse("teacher-update-proposal", args=[proposal.id]), {"status": "APPROVED"}, format="json"
+        ))
+        self.assertEqual(
+            set(AttendanceRecord.objects.filter(student=proposal.student).values_list("status", flat=True)),
+            {"PRESENT"},
+        )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserEndpointBudgets10(UserEndpointBudgets, TestCase):
+    SCALE = 10
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserEndpointBudgets100(UserEndpointBudgets, TestCase):
+    SCALE = 100
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserEndpointBudgets1000(UserEndpointBudgets, TestCase):
+    SCALE = 1000
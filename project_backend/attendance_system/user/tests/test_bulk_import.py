@@ -0,0 +1,95 @@
+# user/tests/test_bulk_import.py
+"""CSV student import (user/bulk_import.py) and its upload view."""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..bulk_import import import_students
+from ..models import Enrollment, Student
+from .test_budgets import FAST_HASHERS, PASSWORD, client_for, seed
+
+HEADER = "username,password,uid,branch\n"
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ImportStudentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(10)     # student0..9 / S00000..S00009 are taken
+
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(2)     # Same map() as the process pool, without spawning
+        self.addCleanup(self.pool.shutdown)
+
+    def run_import(self, rows, header=HEADER, **kwargs):
+        return import_students(io.StringIO(header + rows), pool=self.pool, **kwargs)
+
+    def test_creates_users_and_students(self):
+        report = self.run_import("new1,secret,N00001,CSE\nnew2,secret,N00002,ECE\n")
+        self.assertEqual(report, {"created": 2, "enrolled": 0, "errors": []})
+        student = Student.objects.select_related("user").get(uid="N00002")
+        self.assertEqual((student.user.username, student.branch), ("new2", "ECE"))
+        self.assertTrue(check_password("secret", student.user.password))
+
+    def test_row_errors_are_reported_not_raised(self):
+        rows = (
+            "new1,secret,N00001,CSE\n"
+            "new1,secret,N00002,CSE\n"      # Username repeated in the file
+            "new3,secret,S00003,CSE\n"      # uid already registered
+            "student4,secret,N00004,CSE\n"  # Username already taken
+            "new5,,N00005,CSE\n"            # No password
+        )
+        report = self.run_import(rows)
+        self.assertEqual(report["created"], 1)
+        # File checks first, then the DB lookups of the rows that passed them
+        self.assertEqual([(e["row"], e["errors"]) for e in report["errors"]], [
+            (3, ["duplicate username in file"]),
+            (6, ["password is required"]),
+            (4, ["uid already registered"]),
+            (5, ["username already taken"]),
+        ])
+        self.assertFalse(User.objects.filter(username="new5").exists())
+
+    def test_duplicates_across_chunks(self):
+        report = self.run_import("new1,secret,N00001,CSE\nnew2,secret,N00001,CSE\n", chunk_size=1)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0]["errors"], ["duplicate uid in file"])
+
+    def test_enrolls_with_one_change_seq(self):
+        classroom = self.data.classrooms[1]
+        report = self.run_import("new1,secret,N00001,CSE\nnew2,secret,N00002,CSE\n", classroom=classroom)
+        self.assertEqual(report["enrolled"], 2)
+        seqs = set(Enrollment.objects.filter(classroom=classroom, student__uid__startswith="N").values_list(
+            "change_seq", flat=True
+        ))
+        self.assertEqual(len(seqs), 1)     # One chunk, one stamp
+
+    def test_missing_column(self):
+        with self.assertRaises(ValueError):
+            self.run_import("new1,secret,N00001\n", header="username,password,uid\n")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BulkImportViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(10)
+
+    def post(self, **data):
+        upload = SimpleUploadedFile("students.csv", (HEADER + f"new1,{PASSWORD},N00001,CSE\n").encode(), "text/csv")
+        return client_for(self.data.teacher.user).post(
+            reverse("student-bulk-import"), {"file": upload, **data}, format="multipart"
+        )
+
+    def test_non_integer_classroom_is_rejected(self):
+        response = self.post(classroom_id="abc")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Student.objects.filter(uid="N00001").exists())
+
+    def test_unknown_classroom(self):
+        self.assertEqual(self.post(classroom_id=999999).status_code, 404)
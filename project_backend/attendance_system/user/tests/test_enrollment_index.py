@@ -0,0 +1,75 @@
+# user/tests/test_enrollment_index.py
+"""EnrollmentIndex bitsets and the views that read them."""
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..enrollment_index import EnrollmentIndex, enrollment_index
+from ..models import AbsenceProposal, Enrollment
+from .test_budgets import client_for, seed
+
+
+class EnrollmentIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(20)     # Everyone in classroom 0, student 0 in classrooms 0-2
+
+    def setUp(self):
+        self.index = EnrollmentIndex()
+
+    def test_members_and_membership(self):
+        first, second = self.data.classrooms[:2]
+        self.assertEqual(set(self.index.enrolled_students([first.id])), {s.id for s in self.data.students})
+        self.assertEqual(self.index.enrolled_students([second.id]), [self.data.students[0].id])
+        self.assertEqual(self.index.student_ids(self.index.members([second.id])), [self.data.students[0].id])
+        self.assertTrue(self.index.is_enrolled(self.data.students[0].id, [second.id]))
+        self.assertFalse(self.index.is_enrolled(self.data.students[1].id, [second.id]))
+        self.assertFalse(self.index.is_enrolled(-1, [first.id]))    # Never seen
+
+    @override_settings(ENROLLMENT_INDEX_MAX_AGE=-1)
+    def test_rebuild_on_every_query(self):
+        """A rebuild inside the query still decodes against the bits it masked."""
+        first = self.data.classrooms[0]
+        for _ in range(3):
+            self.assertEqual(set(self.index.enrolled_students([first.id])), {s.id for s in self.data.students})
+
+    def test_add_and_remove_keep_index_current(self):
+        classroom = self.data.classrooms[1]
+        student = self.data.students[5]
+        self.index.members([classroom.id])   # Build
+        self.index.add(student.id, classroom.id)
+        self.assertTrue(self.index.is_enrolled(student.id, [classroom.id]))
+        self.index.remove(student.id, classroom.id)
+        self.assertFalse(self.index.is_enrolled(student.id, [classroom.id]))
+
+    def test_signals_update_shared_index(self):
+        enrollment_index.invalidate()
+        classroom = self.data.classrooms[1]
+        student = self.data.students[7]
+        self.assertFalse(enrollment_index.is_enrolled(student.id, [classroom.id]))
+        enrollment = Enrollment.objects.create(student=student, classroom=classroom)
+        self.assertTrue(enrollment_index.is_enrolled(student.id, [classroom.id]))
+        enrollment.delete()
+        self.assertFalse(enrollment_index.is_enrolled(student.id, [classroom.id]))
+
+    def test_update_proposal_does_not_trust_stale_index(self):
+        """An enrollment removed by another worker is still in this worker's index: the DB decides."""
+        student = self.data.students[3]
+        classroom = self.data.classrooms[0]
+        now = timezone.now()
+        proposal = AbsenceProposal.objects.create(
+            student=student, reason_type="MEDICAL", start_datetime=now, end_datetime=now + timedelta(hours=1),
+        )
+        enrollment_index.invalidate()
+        self.assertTrue(enrollment_index.is_enrolled(student.id, [classroom.id]))
+        Enrollment.objects.filter(student=student).delete()
+        enrollment_index.add(student.id, classroom.id)   # What the stale worker still believes
+
+        response = client_for(self.data.teacher.user).patch(
+            reverse("teacher-update-proposal", args=[proposal.id]), {"status": "APPROVED"}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        proposal.refresh_from_db()
+        self.assertEqual(proposal.status, "PENDING")
@@ -0,0 +1,116 @@
+# user/tests/test_login.py
+"""Login admission and device-bound refresh tokens (user/login.py): binding, rotation and reuse."""
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .. import login
+from .test_budgets import FAST_HASHERS, PASSWORD
+
+DEVICE = "phone-1234"
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class DeviceRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="student", password=make_password(PASSWORD))
+
+    def login(self, **extra):
+        response = APIClient().post(reverse("token_obtain_pair"), {
+            "username": "student", "password": PASSWORD, **extra,
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["refresh"]
+
+    def refresh(self, token, device_id=DEVICE):
+        data = {"refresh": token}
+        if device_id:
+            data["device_id"] = device_id
+        return APIClient().post(reverse("token_refresh"), data, format="json")
+
+    def test_device_token_outlives_plain_refresh(self):
+        token = RefreshToken(self.login(device_id=DEVICE))
+        lifetime = settings.DEVICE_REFRESH_LIFETIME
+        self.assertAlmostEqual(token["exp"] - token["iat"], lifetime.total_seconds(), delta=5)
+        outstanding = OutstandingToken.objects.get(jti=token["jti"])
+        self.assertGreater(outstanding.expires_at, timezone.now() + lifetime - timedelta(minutes=1))
+
+    def test_refresh_rotates(self):
+        first = self.login(device_id=DEVICE)
+        response = self.refresh(first)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotEqual(response.data["refresh"], first)
+        self.assertEqual(self.refresh(response.data["refresh"]).status_code, 200)
+
+    def test_rotated_token_cannot_be_reused(self):
+        first = self.login(device_id=DEVICE)
+        self.assertEqual(self.refresh(first).status_code, 200)
+        self.assertEqual(self.refresh(first).status_code, 401)
+
+    def test_other_device_is_refused(self):
+        first = self.login(device_id=DEVICE)
+        self.assertEqual(self.refresh(first, device_id="another-phone").status_code, 401)
+        self.assertEqual(self.refresh(first, device_id=None).status_code, 401)
+        self.assertEqual(self.refresh(first).status_code, 200)     # Refusals do not burn the token
+
+    def test_plain_token_is_not_rotated(self):
+        plain = self.login()
+        response = self.refresh(plain, device_id=None)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("refresh", response.data)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username="student", password=make_password(PASSWORD))
+
+    def setUp(self):
+        login._admission = None
+        self.addCleanup(setattr, login, "_admission", None)
+
+    def post(self, password):
+        return APIClient().post(reverse("token_obtain_pair"), {
+            "username": "student", "password": password,
+        }, format="json")
+
+    def test_failed_login_reaches_auth_signals(self):
+        failures = []
+        handler = lambda sender, credentials, **kwargs: failures.append(credentials["username"])   # noqa: E731
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+        self.assertEqual(self.post("wrong").status_code, 401)
+        self.assertEqual(failures, ["student"])
+
+    @override_settings(LOGIN_ADMISSION={"CONCURRENT": 1, "WAIT": 0, "RETRY_AFTER": 7})
+    def test_saturated_login_is_refused(self):
+        admission = login.get_admission()
+        admission.acquire()     # A login of another request thread is hashing
+        try:
+            response = self.post(PASSWORD)
+        finally:
+            admission.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(self.post(PASSWORD).status_code, 200)
+
+    def test_slots_share_the_host(self):
+        with mock.patch.object(login.os, "cpu_count", return_value=8):
+            with override_settings(LOGIN_ADMISSION={"PROCESSES": 4}):
+                self.assertEqual(login.login_slots(), 2)
+            with override_settings(LOGIN_ADMISSION={"PROCESSES": 16}):
+                self.assertEqual(login.login_slots(), 1)
+            with override_settings(LOGIN_ADMISSION={}), mock.patch.dict(login.os.environ, {"WEB_CONCURRENCY": "2"}):
+                self.assertEqual(login.login_slots(), 4)
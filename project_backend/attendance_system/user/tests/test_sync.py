@@ -0,0 +1,101 @@
+# user/tests/test_sync.py
+"""change_seq stamping (user/sync.py) and the incremental StudentSyncView."""
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import AbsenceProposal, Enrollment
+from ..sync import current_change_seq, next_change_seq
+from .test_budgets import client_for, seed
+
+
+class ChangeSeqTests(TestCase):
+    def test_numbers_are_consecutive(self):
+        first = next_change_seq()
+        self.assertEqual(next_change_seq(5), first + 5)
+        self.assertEqual(current_change_seq(), first + 5)
+
+    def test_saves_are_stamped(self):
+        data = seed(10)
+        before = current_change_seq()
+        enrollment = Enrollment.objects.create(student=data.students[1], classroom=data.classrooms[1])
+        self.assertEqual(enrollment.change_seq, before + 1)
+        proposal = data.proposals[0]
+        proposal.status = "APPROVED"
+        proposal.save(update_fields=["status"])         # Not listing change_seq: not synced
+        proposal.refresh_from_db()
+        self.assertEqual(proposal.change_seq, 1)
+        proposal.save()
+        self.assertEqual(proposal.change_seq, before + 2)
+
+
+class ChangeSeqTransactionTests(TransactionTestCase):
+    """Outside TestCase's wrapping transaction, to see autocommit."""
+    def test_refused_outside_a_transaction(self):
+        with self.assertRaises(RuntimeError):
+            next_change_seq()
+        with transaction.atomic():
+            self.assertEqual(next_change_seq(), 1)
+        self.assertEqual(current_change_seq(), 1)
+
+    def test_rolled_back_with_the_rows(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                next_change_seq()
+                1 / 0
+        self.assertEqual(current_change_seq(), 0)
+
+
+class StudentSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(10)
+        cls.student = cls.data.students[1]
+        next_change_seq()   # Seeded rows carry change_seq=1 without taking it from the counter
+
+    def setUp(self):
+        self.client = client_for(self.student.user)
+
+    def sync(self, since=None):
+        params = {} if since is None else {"since": since}
+        response = self.client.get(reverse("student-sync"), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_full_then_incremental(self):
+        full = self.sync()
+        self.assertTrue(full["full"])
+        self.assertEqual(len(full["enrollments"]), 1)
+        self.assertEqual(len(full["proposals"]), 1)
+        self.assertEqual(self.sync(full["cursor"])["attendance"], [])
+
+        now = timezone.now()
+        proposal = AbsenceProposal.objects.create(
+            student=self.student, reason_type="MEDICAL", start_datetime=now, end_datetime=now + timedelta(hours=1),
+        )
+        AbsenceProposal.objects.create(         # Another student's change is not returned
+            student=self.data.students[2], reason_type="MEDICAL", start_datetime=now, end_datetime=now,
+        )
+        changes = self.sync(full["cursor"])
+        self.assertFalse(changes["full"])
+        self.assertEqual([row["id"] for row in changes["proposals"]], [proposal.id])
+        self.assertEqual(changes["enrollments"], [])
+        self.assertGreater(changes["cursor"], full["cursor"])
+        self.assertEqual(self.sync(changes["cursor"])["proposals"], [])
+
+    def test_deletions_leave_tombstones(self):
+        cursor = self.sync()["cursor"]
+        proposal = AbsenceProposal.objects.get(student=self.student)
+        proposal_id = proposal.id
+        proposal.delete()
+        Enrollment.objects.filter(student=self.student).delete()
+        deleted = self.sync(cursor)["deleted"]
+        self.assertEqual(deleted["proposals"], [proposal_id])
+        self.assertEqual(deleted["enrollments"], [self.data.classrooms[0].id])
+
+    def test_bad_cursor(self):
+        response = self.client.get(reverse("student-sync"), {"since": "abc"})
+        self.assertEqual(response.status_code, 400)
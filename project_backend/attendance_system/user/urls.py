@@ -1,23 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 
 from .views import (
     CreateAbsenceProposalView,
     StudentAbsenceProposalListView,
     StudentClassroomSearchAPIView,
     StudentRegisterView,
+    BulkStudentImportView,
     TeacherPendingProposalsView,
     TeacherRegisterView,
     EnrollmentCreateView,
     StudentEnrollmentListView,
     StudentAttendanceListView,
+    StudentSyncView,
     TeacherClassroomViewSet,
     ProfileView,
     TeacherUpdateProposalView,
+    LoginView,
+    LoginRefreshView,
 )
 from .views import ClassroomSearchView
 
@@ -44,10 +44,11 @@ urlpatterns = [
     # Registration
     path('register/student/', StudentRegisterView.as_view(), name='student-register'),
     path('register/teacher/', TeacherRegisterView.as_view(), name='teacher-register'),
+    path('register/students/bulk/', BulkStudentImportView.as_view(), name='student-bulk-import'),
 
     # JWT Login + Refresh
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
+    path('login/refresh/', LoginRefreshView.as_view(), name='token_refresh'),
 
     # Student enrollment & attendance
     path('student/enroll/', EnrollmentCreateView.as_view(), name='student-enroll'),
@@ -55,6 +56,7 @@ urlpatterns = [
     path('student/attendance/', StudentAttendanceListView.as_view(), name='student-attendance'),
     path('student/search-classroom/', ClassroomSearchView.as_view(), name='student-search-classroom'),
     path('student/classrooms/', StudentClassroomSearchAPIView.as_view(), name='student-classroom-search'),
+    path('student/sync/', StudentSyncView.as_view(), name='student-sync'),
 
 
     # Profile (read-only)
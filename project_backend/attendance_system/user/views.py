@@ -1,7 +1,7 @@
 from rest_framework import generics, viewsets, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import AbsenceProposal, Student, Teacher, Classroom, Enrollment, AttendanceRecord
+from .models import AbsenceProposal, Student, Teacher, Classroom, Enrollment, AttendanceRecord, SyncTombstone
 from .serializer import (
     AbsenceProposalSerializer,
     StudentSerializer,
@@ -10,14 +10,50 @@ from .serializer import (
     EnrollmentSerializer,
     AttendanceRecordSerializer
 )
-from .permission import IsStudent, IsTeacher
+from .permission import IsStudent, IsTeacher, IsTeacherOrAdmin
+from .enrollment_index import enrollment_index
+from .sync import current_change_seq, next_change_seq
+from .projections import attendance_rows, classroom_rows, proposal_rows
+from .login import AdmittedTokenObtainPairSerializer, DeviceTokenRefreshSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.db import transaction
+from django.db.models import Q
+from attendance_session.storage import records_for_student, rewrite_bitmap_window, storage_mode, writes_bitmap
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from rest_framework.parsers import MultiPartParser
+import io
 
 
 
+def records_in_window(student, start_dt, end_dt):
+    """
+    Attendance records of the lectures a student had between start_dt and end_dt.
+    Lectures are matched by their AttendanceSession start time; records written
+    before sessions were persisted fall back to their own timestamp.
+    """
+    return AttendanceRecord.objects.filter(
+        Q(session__started_at__gte=start_dt, session__started_at__lte=end_dt)
+        | Q(session__isnull=True, timestamp__gte=start_dt, timestamp__lte=end_dt),
+        student=student,
+    )
+
+
+# ------------------------------
+# Login
+# ------------------------------
+class LoginView(TokenObtainPairView):
+    """JWT login; the password check waits for an admission slot (503 + Retry-After when saturated)."""
+    serializer_class = AdmittedTokenObtainPairSerializer
+
+
+class LoginRefreshView(TokenRefreshView):
+    """JWT refresh; device-bound refresh tokens need their device_id and are rotated."""
+    serializer_class = DeviceTokenRefreshSerializer
+
+
 # ------------------------------
 # Registration Views
 # ------------------------------
@@ -32,6 +68,43 @@ class TeacherRegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 
+class BulkStudentImportView(APIView):
+    """
+    Teacher/admin uploads a CSV (username,password,uid,branch[,auth_key]) to register many students.
+    Optional classroom_id enrolls every created student in that classroom.
+    Returns counts plus a per-row error report.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrAdmin]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        from .bulk_import import import_students
+
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "CSV file is required (field 'file')."}, status=status.HTTP_400_BAD_REQUEST)
+
+        classroom = None
+        classroom_id = request.data.get("classroom_id")
+        if classroom_id:
+            try:
+                classroom_id = int(classroom_id)
+            except ValueError:
+                return Response({"error": "classroom_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            classroom = Classroom.objects.filter(id=classroom_id).first()
+            if not classroom:
+                return Response({"error": "Classroom not found"}, status=status.HTTP_404_NOT_FOUND)
+            if not request.user.is_staff and classroom.teacher.user_id != request.user.id:
+                return Response({"error": "Not your classroom"}, status=status.HTTP_403_FORBIDDEN)
+
+        stream = io.TextIOWrapper(upload.open("rb"), encoding="utf-8-sig", newline="")
+        try:
+            report = import_students(stream, classroom=classroom)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
 # ------------------------------
 # Student Views
 # ------------------------------
@@ -52,6 +125,9 @@ class StudentEnrollmentListView(generics.ListAPIView):
         student = Student.objects.get(user=self.request.user)
         return Classroom.objects.filter(enrollments__student=student)
 
+    def list(self, request, *args, **kwargs):
+        return Response(classroom_rows(self.get_queryset()))
+
 
 class StudentAttendanceListView(generics.ListAPIView):
     serializer_class = AttendanceRecordSerializer
@@ -64,6 +140,16 @@ class StudentAttendanceListView(generics.ListAPIView):
             return AttendanceRecord.objects.filter(student=student, classroom_id=classroom_id)
         return AttendanceRecord.objects.filter(student=student)
 
+    def list(self, request, *args, **kwargs):
+        if storage_mode() != "bitmap":
+            return Response(attendance_rows(self.get_queryset()))
+
+        # Packed storage: lectures without rows are decoded from their status vectors
+        student = Student.objects.get(user=request.user)
+        records = list(self.get_queryset()) + records_for_student(student, request.query_params.get("classroom_id"))
+        records.sort(key=lambda r: (r.date, r.timestamp))
+        return Response(self.get_serializer(records, many=True).data)
+
 
 class ClassroomSearchView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsStudent]
@@ -78,16 +164,15 @@ class ClassroomSearchView(APIView):
         if code.lower() == "all":
             # Return all classrooms
             classrooms = Classroom.objects.all()
-            serializer = ClassroomSerializer(classrooms, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(classroom_rows(classrooms), status=status.HTTP_200_OK)
 
         # Partial or exact case-insensitive search
         classrooms = Classroom.objects.filter(code__icontains=code)
-        if not classrooms.exists():
+        rows = classroom_rows(classrooms)
+        if not rows:
             return Response({"error": "No classrooms found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = ClassroomSerializer(classrooms, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(rows, status=status.HTTP_200_OK)
     
     
 class StudentClassroomSearchAPIView(APIView):
@@ -103,8 +188,7 @@ class StudentClassroomSearchAPIView(APIView):
             return Response({"error": "Please provide a 'code' query parameter."}, status=status.HTTP_400_BAD_REQUEST)
 
         classrooms = Classroom.objects.filter(code__icontains=code_query)  # only active classrooms
-        serializer = ClassroomSerializer(classrooms, many=True)
-        return Response(serializer.data)
+        return Response(classroom_rows(classrooms))
     
     
 # ------------------------------
@@ -116,7 +200,10 @@ class TeacherClassroomViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         teacher = Teacher.objects.get(user=self.request.user)
-        return Classroom.objects.filter(teacher=teacher)
+        return Classroom.objects.filter(teacher=teacher).select_related("teacher__user")   # teacher_name
+
+    def list(self, request, *args, **kwargs):
+        return Response(classroom_rows(self.get_queryset()))
 
     def perform_create(self, serializer):
         teacher = Teacher.objects.get(user=self.request.user)
@@ -160,17 +247,17 @@ class CreateAbsenceProposalView(APIView):
         # Create proposal with student from auth
         serializer = AbsenceProposalSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            proposal = serializer.save(student=student)  # assign student here
-
-            # Update related AttendanceRecords to PENDING
             start_dt = serializer.validated_data['start_datetime']
             end_dt = serializer.validated_data['end_datetime']
 
-            AttendanceRecord.objects.filter(
-                student=student,
-                timestamp__gte=start_dt,
-                timestamp__lte=end_dt
-            ).update(status="PENDING")
+            # Change numbers commit with the rows they stamp (see user/sync.py)
+            with transaction.atomic():
+                proposal = serializer.save(student=student)  # assign student here
+
+                # Update related AttendanceRecords to PENDING
+                records_in_window(student, start_dt, end_dt).update(status="PENDING", change_seq=next_change_seq())
+                if writes_bitmap():
+                    rewrite_bitmap_window(student, start_dt, end_dt, "PENDING")
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
@@ -192,10 +279,51 @@ class StudentAbsenceProposalListView(APIView):
             return Response({"error": "Student profile not found."}, status=status.HTTP_400_BAD_REQUEST)
 
         proposals = AbsenceProposal.objects.filter(student=student).order_by('-timestamp')
-        serializer = AbsenceProposalSerializer(proposals, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(proposal_rows(proposals), status=status.HTTP_200_OK)
     
     
+
+class StudentSyncView(APIView):
+    """
+    Incremental refresh of the student app: GET ?since=<cursor>.
+    Returns enrollments (as classrooms), attendance records and absence proposals
+    changed after the cursor, ids deleted since then, and the cursor to send next time.
+    Without `since` (or since=0) everything is returned.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStudent]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            return Response({"error": "since must be an integer cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        student = Student.objects.get(user=request.user)
+        cursor = current_change_seq()
+        window = {"change_seq__gt": since, "change_seq__lte": cursor} if since else {"change_seq__lte": cursor}
+
+        classrooms = Classroom.objects.filter(
+            id__in=Enrollment.objects.filter(student=student, **window).values("classroom_id")
+        )
+        records = AttendanceRecord.objects.filter(student=student, **window)
+        proposals = AbsenceProposal.objects.filter(student=student, **window)
+
+        deleted = {"enrollments": [], "attendance": [], "proposals": []}
+        if since:
+            for collection, object_id in SyncTombstone.objects.filter(student=student, **window).values_list(
+                "collection", "object_id"
+            ):
+                deleted[collection].append(object_id)
+
+        return Response({
+            "cursor": cursor,
+            "full": not since,
+            "enrollments": classroom_rows(classrooms),
+            "attendance": attendance_rows(records),
+            "proposals": proposal_rows(proposals),
+            "deleted": deleted,
+        }, status=status.HTTP_200_OK)
+
             
 class TeacherPendingProposalsView(generics.ListAPIView):
     """
@@ -211,13 +339,19 @@ class TeacherPendingProposalsView(generics.ListAPIView):
             return AbsenceProposal.objects.none()
 
         # Get classrooms taught by this teacher
-        classrooms = Classroom.objects.filter(teacher=teacher)
+        classroom_ids = list(Classroom.objects.filter(teacher=teacher).values_list("id", flat=True))
+
+        # Students of those classrooms come from the enrollment bitsets, no join needed
+        student_ids = enrollment_index.enrolled_students(classroom_ids)
 
-        # Return pending proposals from those classrooms
+        # Return pending proposals from those students
         return AbsenceProposal.objects.filter(
-            student__enrollments__classroom__in=classrooms,
+            student_id__in=student_ids,
             status="PENDING"
-        ).distinct()
+        )
+
+    def list(self, request, *args, **kwargs):
+        return Response(proposal_rows(self.get_queryset(), request))
         
         
 
@@ -226,7 +360,7 @@ class TeacherUpdateProposalView(generics.UpdateAPIView):
     """
     Teacher can approve or reject a student absence proposal.
     """
-    queryset = AbsenceProposal.objects.all()
+    queryset = AbsenceProposal.objects.select_related("student__user")   # Used by the window update and the response
     serializer_class = AbsenceProposalSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'  # pass proposal id in URL
@@ -237,30 +371,26 @@ class TeacherUpdateProposalView(generics.UpdateAPIView):
         if not teacher:
             return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
 
-        # Ensure teacher owns the classroom(s) of the student
-        student_classrooms = [enrollment.classroom for enrollment in proposal.student.enrollments.all()]
-        if not any(c.teacher == teacher for c in student_classrooms):
+        # Ensure teacher owns the classroom(s) of the student. Checked in the DB, not the enrollment
+        # index: the index may still list an enrollment another worker has removed
+        if not Enrollment.objects.filter(student_id=proposal.student_id, classroom__teacher=teacher).exists():
             return Response({"detail": "Not authorized for this student"}, status=status.HTTP_403_FORBIDDEN)
 
         action = request.data.get("status")
         if action not in ["APPROVED", "REJECTED"]:
             return Response({"detail": "Invalid action, must be APPROVED or REJECTED"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update proposal status
-        proposal.status = action
-        proposal.save()
-
-        # Update attendance records in the exact time range using timestamp
-        records = AttendanceRecord.objects.filter(
-            student=proposal.student,
-            timestamp__gte=proposal.start_datetime,
-            timestamp__lte=proposal.end_datetime
-        )
-
-        if action == "APPROVED":
-            records.update(status="PRESENT")
-        else:
-            records.update(status="ABSENT")
+        new_status = "PRESENT" if action == "APPROVED" else "ABSENT"
+        with transaction.atomic():
+            # Update proposal status
+            proposal.status = action
+            proposal.save()
+
+            # Update attendance records of the lectures held in the proposal window
+            records = records_in_window(proposal.student, proposal.start_datetime, proposal.end_datetime)
+            records.update(status=new_status, change_seq=next_change_seq())
+            if writes_bitmap():
+                rewrite_bitmap_window(proposal.student, proposal.start_datetime, proposal.end_datetime, new_status)
 
         serializer = self.get_serializer(proposal)
         return Response(serializer.data, status=status.HTTP_200_OK)